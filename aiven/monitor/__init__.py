@@ -1,9 +1,36 @@
 import abc
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime, timezone
-from typing import Optional, Coroutine, Callable
+from typing import Optional, Coroutine, Callable, Hashable, Type, TypeVar
 
+T = TypeVar("T")
 
+
+def slots(cls: Type[T]) -> Type[T]:
+    """
+    Recreate a dataclass with `__slots__` for its fields, so that its instances, of
+    which many are created (eg: one result per probe), have no `__dict__`. Applied
+    on top of `@dataclass`, as `dataclass(slots=True)` requires Python 3.10.
+
+    Subclasses that are not slotted themselves get a `__dict__` again, as usual.
+    """
+    inherited = {
+        name for base in cls.__mro__[1:] for name in getattr(base, "__slots__", ())
+    }
+    namespace = dict(cls.__dict__)
+    namespace["__slots__"] = tuple(
+        f.name for f in fields(cls) if f.name not in inherited
+    )
+    # defaults are kept by the fields and the generated __init__, class attributes of
+    # the same names would conflict with the slots
+    for f in fields(cls):
+        namespace.pop(f.name, None)
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@slots
 @dataclass
 class CheckResult:
     timestamp: float = field(
@@ -11,6 +38,27 @@ class CheckResult:
     )
     error: Optional[str] = field(default=None)
 
+    @property
+    def failed(self) -> bool:
+        """
+        Whether the checked target should be considered unavailable.
+        """
+        return self.error is not None
+
+    def error_kind(self) -> Optional[str]:
+        """
+        Kind of failure of the checked target, used to break errors down in rollups
+        and reports; None if the result did not fail.
+        """
+        return "error" if self.error is not None else None
+
+    def state_key(self) -> Hashable:
+        """
+        Key identifying the observed state of the checked target; consecutive results
+        with the same key describe an unchanged state.
+        """
+        return (self.error is not None,)
+
 
 @dataclass
 class Check:
@@ -23,3 +71,17 @@ class Check:
         :return:
         """
         raise NotImplementedError
+
+    @abc.abstractmethod
+    async def probe(self) -> CheckResult:
+        """
+        Perform the check once.
+
+        :return: The check result
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """
+        Release any resources held by the check.
+        """
@@ -0,0 +1,98 @@
+import logging
+from typing import Dict, Hashable, Optional
+
+from aiven.monitor import CheckResult
+
+logger = logging.getLogger(__name__)
+
+
+class _ProbeState:
+    __slots__ = ("key", "count", "retries")
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        # consecutive results with this state, and consecutive re-probes
+        self.count = 0
+        self.retries = 0
+
+
+class AdaptiveInterval:
+    """
+    Decide when a check is probed next, based on the state of its recent results (see
+    `CheckResult.state_key`).
+
+    A failed result whose state is not confirmed yet is re-probed after
+    `retry_interval` seconds, until the same state has been observed on `retries`
+    re-probes. At most `retries` re-probes are made in a row, so that a check
+    flapping between states falls back to its interval. Checks whose state has not
+    changed for `stable_after` successful results are probed `stable_factor` times
+    less often, until their state changes.
+    """
+
+    def __init__(
+        self,
+        retry_interval: Optional[float] = None,
+        retries: int = 2,
+        stable_after: Optional[int] = None,
+        stable_factor: float = 2.0,
+    ):
+        """
+        :param retry_interval: interval (seconds) of re-probes of unconfirmed failures,
+            capped at the interval of each check; None to disable re-probes
+        :param retries: number of re-probes confirming a failure
+        :param stable_after: number of consecutive successful results with the same
+            state after which a check is considered stable, None to never slow down
+        :param stable_factor: factor applied to the interval of stable checks
+        """
+        if retry_interval is not None and retry_interval <= 0:
+            raise ValueError(f"Invalid retry interval: {retry_interval}")
+        if retries < 1:
+            raise ValueError(f"Invalid number of retries: {retries}")
+        if stable_after is not None and stable_after < 1:
+            raise ValueError(f"Invalid number of stable results: {stable_after}")
+        if stable_factor < 1:
+            raise ValueError(f"Invalid stable interval factor: {stable_factor}")
+        self.retry_interval = retry_interval
+        self.retries = retries
+        self.stable_after = stable_after
+        self.stable_factor = stable_factor
+        self._states: Dict[int, _ProbeState] = {}
+
+    def observe(self, check_id: int, interval: float, result: CheckResult) -> float:
+        """
+        Record a result of a check.
+
+        :param interval: configured interval (seconds) of the check
+        :return: The time (seconds) until the check is probed next
+        """
+        key = result.state_key()
+        state = self._states.get(check_id)
+        if state is None:
+            state = self._states[check_id] = _ProbeState(key)
+        elif state.key != key:
+            state.key = key
+            state.count = 0
+        state.count += 1
+
+        if result.failed:
+            if (
+                self.retry_interval is not None
+                and state.count <= self.retries
+                and state.retries < self.retries
+            ):
+                state.retries += 1
+                return min(self.retry_interval, interval)
+            if state.retries:
+                logger.debug("Failure of check=%d confirmed: %s", check_id, key)
+        state.retries = 0
+
+        if (
+            not result.failed
+            and self.stable_after is not None
+            and state.count >= self.stable_after
+        ):
+            return interval * self.stable_factor
+        return interval
+
+    def forget(self, check_id: int) -> None:
+        self._states.pop(check_id, None)
@@ -0,0 +1,180 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiven.monitor import CheckResult
+
+# index of the bucket of values at or below the minimum value of a sketch, lower than
+# the index of any other bucket (bucket 0 holds values just below 1.0)
+ZERO_BUCKET = -(2 ** 31)
+
+
+@dataclass
+class LatencySketch:
+    """
+    Mergeable quantile sketch with bounded relative error.
+
+    Values are counted in logarithmically sized buckets so that any quantile is
+    estimated within `relative_accuracy` of the true value. Two sketches with the
+    same accuracy are merged by adding their bucket counts, which makes them
+    suitable to combine across windows, workers and nodes.
+    """
+
+    relative_accuracy: float = field(default=0.01)
+    min_value: float = field(default=1e-6)
+    buckets: Dict[int, int] = field(default_factory=dict)
+    count: int = field(default=0)
+
+    def __post_init__(self):
+        self._gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+    def add(self, value: float) -> None:
+        index = (
+            math.ceil(math.log(value) / self._log_gamma)
+            if value > self.min_value
+            else ZERO_BUCKET
+        )
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+
+    def merge(self, other: "LatencySketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+        if index == ZERO_BUCKET:
+            return 0.0
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {str(index): count for index, count in self.buckets.items()}
+
+    @classmethod
+    def from_dict(
+        cls, buckets: Dict[str, int], relative_accuracy: float = 0.01
+    ) -> "LatencySketch":
+        sketch = cls(relative_accuracy=relative_accuracy)
+        for index, count in buckets.items():
+            sketch.buckets[int(index)] = int(count)
+            sketch.count += int(count)
+        return sketch
+
+
+@dataclass
+class Rollup:
+    check_id: int
+    window_start: float
+    window: int
+    count: int = field(default=0)
+    errors: int = field(default=0)
+    latency_sum: float = field(default=0.0)
+    latency_min: Optional[float] = field(default=None)
+    latency_max: Optional[float] = field(default=None)
+    sketch: LatencySketch = field(default_factory=LatencySketch)
+    error_kinds: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, result: CheckResult, include_dns: bool = True) -> None:
+        """
+        :param include_dns: count time spent resolving the host name, if reported by
+            the result, in its latency
+        """
+        self.count += 1
+        if result.failed:
+            self.errors += 1
+            kind = result.error_kind() or "error"
+            self.error_kinds[kind] = self.error_kinds.get(kind, 0) + 1
+
+        latency = getattr(result, "elapsed", None)
+        if latency is not None:
+            if not include_dns:
+                latency -= getattr(result, "dns", None) or 0.0
+            self.latency_sum += latency
+            self.latency_min = (
+                latency if self.latency_min is None else min(self.latency_min, latency)
+            )
+            self.latency_max = (
+                latency if self.latency_max is None else max(self.latency_max, latency)
+            )
+            self.sketch.add(latency)
+
+    def merge(self, other: "Rollup") -> None:
+        self.count += other.count
+        self.errors += other.errors
+        self.latency_sum += other.latency_sum
+        for name, fn in (("latency_min", min), ("latency_max", max)):
+            values = [
+                v for v in (getattr(self, name), getattr(other, name)) if v is not None
+            ]
+            setattr(self, name, fn(values) if values else None)
+        self.sketch.merge(other.sketch)
+        for kind, count in other.error_kinds.items():
+            self.error_kinds[kind] = self.error_kinds.get(kind, 0) + count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            check_id=self.check_id,
+            window_start=self.window_start,
+            window=self.window,
+            count=self.count,
+            errors=self.errors,
+            latency_sum=self.latency_sum,
+            latency_min=self.latency_min,
+            latency_max=self.latency_max,
+            sketch=self.sketch.to_dict(),
+            error_kinds=self.error_kinds,
+        )
+
+    @classmethod
+    def from_dict(cls, value: Dict[str, Any]) -> "Rollup":
+        value = dict(value)
+        value["sketch"] = LatencySketch.from_dict(value.get("sketch") or {})
+        return cls(**value)
+
+
+class Aggregator:
+    """
+    Per check rolling aggregates over fixed, wall clock aligned windows.
+    """
+
+    def __init__(self, window: int = 60, include_dns: bool = True):
+        """
+        :param window: window size in seconds
+        :param include_dns: count time spent resolving host names in latencies
+        """
+        if window <= 0:
+            raise ValueError(f"Invalid rollup window: {window}")
+        self.window = window
+        self.include_dns = include_dns
+        self._rollups: Dict[Tuple[int, float], Rollup] = {}
+
+    def record(self, check_id: int, result: CheckResult) -> None:
+        window_start = result.timestamp - result.timestamp % self.window
+        key = (check_id, window_start)
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            rollup = self._rollups[key] = Rollup(
+                check_id=check_id, window_start=window_start, window=self.window
+            )
+        rollup.add(result, self.include_dns)
+
+    def flush(self, now: Optional[float] = None) -> List[Rollup]:
+        """
+        Remove and return rollups for windows that ended before `now`, or all rollups
+        if `now` is not provided.
+        """
+        keys = [
+            key for key in self._rollups if now is None or key[1] + self.window <= now
+        ]
+        return [self._rollups.pop(key) for key in keys]
@@ -0,0 +1,139 @@
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from aiven.monitor import CheckResult, slots
+from aiven.monitor.codec import register_result_type
+
+logger = logging.getLogger(__name__)
+
+
+@slots
+@dataclass
+class Heartbeat(CheckResult):
+    """
+    Summary of consecutive results of a check whose state did not change, published
+    in place of the results themselves. The timestamp and error are those of the
+    most recent result summarised, which is included as `last`.
+    """
+
+    count: int = field(default=0)
+    since: Optional[float] = field(default=None)
+    failing: bool = field(default=False)
+    latency_min: Optional[float] = field(default=None)
+    latency_max: Optional[float] = field(default=None)
+    latency_mean: Optional[float] = field(default=None)
+    last: Optional[Dict[str, Any]] = field(default=None)
+
+    @property
+    def failed(self) -> bool:
+        return self.failing
+
+
+register_result_type(Heartbeat)
+
+
+class _CheckState:
+    def __init__(self, key: Hashable, emitted_at: float):
+        self.key = key
+        self.emitted_at = emitted_at
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.since: Optional[float] = None
+        self.last: Optional[CheckResult] = None
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_min: Optional[float] = None
+        self.latency_max: Optional[float] = None
+
+    def add(self, result: CheckResult) -> None:
+        if self.since is None:
+            self.since = result.timestamp
+        self.count += 1
+        self.last = result
+
+        latency = getattr(result, "elapsed", None)
+        if latency is not None:
+            self.latency_count += 1
+            self.latency_sum += latency
+            if self.latency_min is None or latency < self.latency_min:
+                self.latency_min = latency
+            if self.latency_max is None or latency > self.latency_max:
+                self.latency_max = latency
+
+    def heartbeat(self) -> Heartbeat:
+        return Heartbeat(
+            timestamp=self.last.timestamp,
+            error=self.last.error,
+            count=self.count,
+            since=self.since,
+            failing=self.last.failed,
+            latency_min=self.latency_min,
+            latency_max=self.latency_max,
+            latency_mean=(
+                self.latency_sum / self.latency_count if self.latency_count else None
+            ),
+            last=asdict(self.last),
+        )
+
+
+class ChangeFilter:
+    """
+    Decide which results of a check are published: a result is published as is when
+    its state (see `CheckResult.state_key`) differs from the previous result of the
+    same check. Results with an unchanged state are folded into a `Heartbeat`,
+    published at most every `heartbeat_interval` seconds and before the next state
+    change, so that the edges of an outage are never lost.
+    """
+
+    def __init__(self, heartbeat_interval: float = 300.0):
+        """
+        :param heartbeat_interval: maximum time (seconds) between two events
+            published for a check whose state does not change
+        """
+        if heartbeat_interval <= 0:
+            raise ValueError(f"Invalid heartbeat interval: {heartbeat_interval}")
+        self.heartbeat_interval = heartbeat_interval
+        self._states: Dict[int, _CheckState] = {}
+
+    def observe(self, check_id: int, result: CheckResult) -> List[CheckResult]:
+        """
+        Record a result of a check.
+
+        :return: The results to publish, in order, possibly none
+        """
+        key = result.state_key()
+        state = self._states.get(check_id)
+        if state is None or state.key != key:
+            published: List[CheckResult] = []
+            if state is not None and state.count:
+                published.append(state.heartbeat())
+            if state is not None:
+                logger.info(
+                    "State of check=%d changed from %s to %s", check_id, state.key, key
+                )
+            self._states[check_id] = _CheckState(key, result.timestamp)
+            published.append(result)
+            return published
+
+        state.add(result)
+        if result.timestamp - state.emitted_at >= self.heartbeat_interval:
+            heartbeat = state.heartbeat()
+            state.emitted_at = result.timestamp
+            state.reset()
+            return [heartbeat]
+        return []
+
+    def flush(self) -> List[Tuple[int, Heartbeat]]:
+        """
+        Summarise results folded since the last event of each check, eg: on shutdown.
+        """
+        heartbeats = []
+        for check_id, state in self._states.items():
+            if state.count:
+                heartbeats.append((check_id, state.heartbeat()))
+                state.emitted_at = state.last.timestamp
+                state.reset()
+        return heartbeats
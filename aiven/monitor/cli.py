@@ -1,14 +1,31 @@
 import asyncio
+import functools
 import logging
-from typing import List
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+)
 
-import aiohttp
 import click
-from cafeteria.asyncio.commons import handle_signals
 
 from aiven.monitor import Check
-from aiven.monitor.http.check import HTTPCheck
-from aiven.monitor.manager import CheckManager
+
+# subsystems (aiohttp, aiokafka, asyncpg) are only imported by the commands using
+# them, so that short lived invocations start fast
+if TYPE_CHECKING:  # pragma: no cover
+    from aiven.monitor.maintenance import Maintenance
+    from aiven.monitor.manager import CheckManager
+    from aiven.monitor.replay import Replay
+    from aiven.monitor.report import CheckReport, Report
 
 
 logging.basicConfig(format="%(levelname)s %(name)s - %(message)s")
@@ -16,9 +33,135 @@ logging.root.setLevel(logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+EVENT_LOOPS = ("asyncio", "uvloop")
+
+# methods supported by aiohttp (ClientRequest.ALL_METHODS)
+HTTP_METHODS = (
+    "CONNECT",
+    "DELETE",
+    "GET",
+    "HEAD",
+    "OPTIONS",
+    "PATCH",
+    "POST",
+    "PUT",
+    "TRACE",
+)
+
+
+def use_event_loop(name: str = "asyncio") -> None:
+    """
+    Select the event loop implementation used by the commands of this process.
+    """
+    if name == "uvloop":
+        try:
+            import uvloop
+        except ImportError:
+            raise click.UsageError(
+                "uvloop is not installed, install the uvloop extra to use it"
+            )
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    elif name != "asyncio":
+        raise click.BadParameter(f"Unknown event loop: {name}")
+
+
+def init_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Retrieve the event loop of this process, stopped gracefully on SIGINT/SIGTERM.
+    """
+    from cafeteria.asyncio.commons import handle_signals
+
+    loop = asyncio.get_event_loop()
+    handle_signals(loop)
+    return loop
+
+
 @click.group()
-def monitor():
-    pass
+@click.option(
+    "--loop",
+    "loop_name",
+    default="asyncio",
+    envvar="AIVEN_MONITOR_LOOP",
+    type=click.Choice(EVENT_LOOPS),
+    help="Event loop implementation, uvloop requires the uvloop extra",
+)
+@click.pass_context
+def monitor(ctx, loop_name):
+    use_event_loop(loop_name)
+    ctx.obj = dict(loop=loop_name)
+
+
+def sink_options(f: Callable) -> Callable:
+    """
+    Options configuring how consumed events are written to the database.
+    """
+    options = [
+        click.option(
+            "--sink-batch-size",
+            default=500,
+            type=click.IntRange(min=1),
+            help="Maximum number of events written to the database in one batch",
+        ),
+        click.option(
+            "--sink-batch-timeout",
+            default=250,
+            type=click.IntRange(min=0),
+            help="Maximum time (ms) an event is buffered before being written",
+        ),
+        click.option(
+            "--sink-max-pending",
+            default=4,
+            type=click.IntRange(min=1),
+            help="Maximum number of fetches buffered per partition before the "
+            "partition is paused",
+        ),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
+
+def metrics_options(f: Callable) -> Callable:
+    """
+    Options configuring the self-instrumentation metrics endpoint.
+    """
+    options = [
+        click.option(
+            "--metrics-port",
+            required=False,
+            type=click.IntRange(min=1, max=65535),
+            help="Serve OpenMetrics/Prometheus metrics on this port at /metrics, "
+            "worker processes use consecutive ports [default: disabled]",
+        ),
+        click.option(
+            "--metrics-host",
+            default="0.0.0.0",
+            type=str,
+            help="Address to serve metrics on",
+        ),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
+
+@asynccontextmanager
+async def serve_metrics(
+    manager: "CheckManager", host: str, port: Optional[int]
+) -> AsyncGenerator[None, None]:
+    """
+    Serve metrics of the manager for as long as the context is active, if a port is
+    provided.
+    """
+    if port is None:
+        yield
+        return
+
+    from aiven.monitor import metrics
+
+    manager.register_metrics()
+    async with metrics.serve(host, port):
+        yield
 
 
 @monitor.command()
@@ -26,7 +169,7 @@ def monitor():
     "-m",
     "--method",
     default="GET",
-    type=click.Choice(aiohttp.ClientRequest.ALL_METHODS),
+    type=click.Choice(HTTP_METHODS),
     help="HTTP method to use for check",
 )
 @click.option(
@@ -36,6 +179,12 @@ def monitor():
     type=str,
     help="Python regex to use to verify content",
 )
+@click.option(
+    "--max-body-size",
+    default=1048576,
+    type=click.IntRange(min=1),
+    help="Maximum number of bytes read from the response body to verify content",
+)
 @click.option("-t", "--timeout", default=2.0, type=float, help="Check Timeout")
 @click.option("-i", "--interval", default=30.0, type=float, help="Check Interval")
 @click.option(
@@ -50,11 +199,229 @@ def monitor():
     default=True,
     help="Verify TLS certificate if https is used",
 )
+@click.option(
+    "--max-in-flight",
+    default=1000,
+    type=click.IntRange(min=1),
+    help="Maximum number of checks in flight at any given time",
+)
+@click.option(
+    "--jitter",
+    required=False,
+    type=click.FloatRange(min=0),
+    help="Maximum random delay (seconds) applied to the first run of each check "
+    "[default: check interval]",
+)
+@click.option(
+    "--retry-interval",
+    required=False,
+    type=click.FloatRange(min=0.1),
+    help="Re-probe failed checks after this time (seconds) until the failure is "
+    "confirmed [default: disabled]",
+)
+@click.option(
+    "--retries",
+    default=2,
+    type=click.IntRange(min=1),
+    help="Number of re-probes confirming a failure, and maximum number of re-probes "
+    "in a row",
+)
+@click.option(
+    "--stable-after",
+    required=False,
+    type=click.IntRange(min=1),
+    help="Probe checks less often once this many consecutive results succeeded "
+    "with the same state [default: disabled]",
+)
+@click.option(
+    "--stable-factor",
+    default=2.0,
+    type=click.FloatRange(min=1),
+    help="Factor applied to the interval of stable checks",
+)
+@click.option(
+    "--connection-mode",
+    default="cold",
+    type=click.Choice(["cold", "shared"]),
+    help="Use a new connection per check request (cold) or a connection pool shared "
+    "by all checks (shared)",
+)
+@click.option(
+    "--keep-alive/--no-keep-alive",
+    default=True,
+    help="Reuse connections between requests when using a shared connection pool",
+)
+@click.option(
+    "--connection-limit",
+    default=100,
+    type=click.IntRange(min=0),
+    help="Maximum number of connections in the shared connection pool (0 for no limit)",
+)
+@click.option(
+    "--connection-limit-per-host",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Maximum number of connections per host in the shared connection pool "
+    "(0 for no limit)",
+)
+@click.option(
+    "--host-rate",
+    default=0.0,
+    type=click.FloatRange(min=0),
+    help="Maximum number of requests per second to each host, shared by all checks "
+    "and split evenly between workers (0 for no limit)",
+)
+@click.option(
+    "--host-burst",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of requests to a host allowed at once above --host-rate",
+)
+@sink_options
+@click.option(
+    "--consume/--no-consume",
+    default=True,
+    help="Consume and persist events in this process",
+)
+@click.option(
+    "--event-format",
+    default="json",
+    type=click.Choice(["json", "binary"]),
+    help="Format used to publish events, consumers accept either format",
+)
+@click.option(
+    "--rollup-window",
+    default=60,
+    type=click.IntRange(min=0),
+    help="Size (seconds) of the windows results are aggregated over (0 to disable)",
+)
+@click.option(
+    "--latency-includes-dns/--latency-excludes-dns",
+    default=True,
+    help="Count time spent resolving host names in rollup latencies, it is always "
+    "reported separately in events",
+)
+@click.option(
+    "--publish-mode",
+    default="all",
+    type=click.Choice(["all", "changes"]),
+    help="Publish every result (all), or only results whose state changed (changes) "
+    "with periodic heartbeats summarising unchanged results",
+)
+@click.option(
+    "--heartbeat-interval",
+    default=300.0,
+    type=click.FloatRange(min=1),
+    help="Maximum time (seconds) between events of a check whose state does not "
+    "change, when publishing changes only",
+)
+@click.option(
+    "--spool-dir",
+    required=False,
+    type=click.Path(file_okay=False, writable=True),
+    help="Directory to spool events in before they are delivered to kafka, so that "
+    "events survive kafka outages and restarts",
+)
+@click.option(
+    "--spool-max-size",
+    default=1024,
+    type=click.IntRange(min=1),
+    help="Maximum size (MiB) of the spool, the oldest events are dropped beyond it",
+)
+@metrics_options
+@click.option(
+    "--cluster/--no-cluster",
+    default=False,
+    help="Run a share of all enabled http checks registered in the database, split "
+    "across every node started with --cluster; checks provided are registered first",
+)
+@click.option(
+    "--node-name",
+    required=False,
+    help="Unique name of this node in the cluster [default: hostname and pid]",
+)
+@click.option(
+    "--shards",
+    "cluster_shards",
+    default=256,
+    type=click.IntRange(min=1),
+    help="Number of shards checks are split into across the cluster, only used when "
+    "the cluster is first started",
+)
+@click.option(
+    "--lease-ttl",
+    default=30.0,
+    type=click.FloatRange(min=1),
+    help="Time (seconds) after which the checks of a node that stopped responding "
+    "are taken over by other nodes",
+)
+@click.option(
+    "-w",
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of worker processes to shard checks across",
+)
 @click.option(
     "--debug/--no-debug", default=False, help="Enable or disable debugging",
 )
-@click.argument("url", required=True, nargs=-1)
-def http(method, regex, timeout, interval, header, verify_ssl, debug, url):
+@click.option(
+    "-c",
+    "--config",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON or YAML file containing check configurations, options provided via "
+    "the command line are used as defaults",
+)
+@click.argument("url", required=False, nargs=-1)
+@click.pass_obj
+def http(
+    obj,
+    method,
+    regex,
+    max_body_size,
+    timeout,
+    interval,
+    header,
+    verify_ssl,
+    max_in_flight,
+    jitter,
+    retry_interval,
+    retries,
+    stable_after,
+    stable_factor,
+    connection_mode,
+    keep_alive,
+    connection_limit,
+    connection_limit_per_host,
+    host_rate,
+    host_burst,
+    sink_batch_size,
+    sink_batch_timeout,
+    sink_max_pending,
+    consume,
+    event_format,
+    rollup_window,
+    latency_includes_dns,
+    publish_mode,
+    heartbeat_interval,
+    spool_dir,
+    spool_max_size,
+    metrics_port,
+    metrics_host,
+    cluster,
+    node_name,
+    cluster_shards,
+    lease_ttl,
+    workers,
+    debug,
+    config,
+    url,
+):
+    from aiven.monitor.config import load_check_configs
+    from aiven.monitor.http.check import HTTPCheck
+    from aiven.monitor.workers import Supervisor, shard_checks
+
     if debug:
         logging.root.setLevel(logging.DEBUG)
 
@@ -66,35 +433,599 @@ def http(method, regex, timeout, interval, header, verify_ssl, debug, url):
             raise click.BadParameter("Headers should be of the form 'Key: Value'")
         headers[k.strip()] = v.strip()
 
-    loop = asyncio.get_event_loop()
-    handle_signals(loop)
+    defaults = dict(
+        method=method,
+        regex=regex,
+        max_body_size=max_body_size,
+        timeout=timeout,
+        headers=headers,
+        verify_ssl=verify_ssl,
+        interval=interval,
+    )
+    configs = [dict(url=u) for u in url]
+    if config:
+        configs.extend(load_check_configs(config))
+
+    if not configs and not cluster:
+        raise click.UsageError("At least one url or a configuration file is required")
+
+    try:
+        checks = [HTTPCheck(**{**defaults, **c}) for c in configs]
+    except (TypeError, ValueError) as e:
+        raise click.BadParameter(f"Invalid check configuration: {e}")
+
+    manager_factory = functools.partial(
+        create_manager,
+        connection_mode=connection_mode,
+        keep_alive=keep_alive,
+        connection_limit=connection_limit,
+        connection_limit_per_host=connection_limit_per_host,
+        host_rate=host_rate / workers,
+        host_burst=host_burst,
+        max_in_flight=max_in_flight,
+        max_jitter=interval if jitter is None else jitter,
+        retry_interval=retry_interval,
+        retries=retries,
+        stable_after=stable_after,
+        stable_factor=stable_factor,
+        sink_batch_size=sink_batch_size,
+        sink_batch_timeout=sink_batch_timeout,
+        sink_max_pending=sink_max_pending,
+        event_format=event_format,
+        rollup_window=rollup_window,
+        latency_includes_dns=latency_includes_dns,
+        publish_mode=publish_mode,
+        heartbeat_interval=heartbeat_interval,
+        spool_dir=spool_dir,
+        spool_max_size=spool_max_size,
+    )
 
-    checks = [
-        HTTPCheck(
-            url=u,
-            method=method,
-            regex=regex,
-            timeout=timeout,
-            headers=headers,
-            verify_ssl=verify_ssl,
-            interval=interval,
+    cluster_options = None
+    if cluster:
+        cluster_options = dict(
+            node=node_name,
+            shards=cluster_shards,
+            lease_ttl=lease_ttl,
+            heartbeat_interval=lease_ttl / 6,
         )
-        for u in url
-    ]
 
-    loop.run_until_complete(run("http", checks))
+    if workers == 1:
+        run_worker(
+            "http",
+            checks,
+            manager_factory,
+            consume=consume,
+            metrics_host=metrics_host,
+            metrics_port=metrics_port,
+            cluster=cluster_options,
+            loop=obj["loop"],
+        )
+        return
+
+    # events are consumed by the first worker only, so that consumers started with
+    # no group id do not persist duplicate events
+    if cluster:
+        # each worker is a node of the cluster, checks are registered by the first
+        shards = [checks] + [[] for _ in range(workers - 1)]
+    else:
+        shards = shard_checks(checks, workers)
+    Supervisor(
+        [
+            functools.partial(
+                run_worker,
+                "http",
+                shard,
+                functools.partial(
+                    manager_factory,
+                    spool_dir=spool_dir and os.path.join(spool_dir, f"worker-{index}"),
+                ),
+                consume=consume and index == 0,
+                debug=debug,
+                metrics_host=metrics_host,
+                metrics_port=metrics_port and metrics_port + index,
+                cluster=cluster_options
+                and dict(cluster_options, node=node_name and f"{node_name}-{index}"),
+                loop=obj["loop"],
+            )
+            for index, shard in enumerate(shards)
+        ]
+    ).run()
+
+
+def create_manager(
+    connection_mode: str = "cold",
+    keep_alive: bool = True,
+    connection_limit: int = 100,
+    connection_limit_per_host: int = 0,
+    host_rate: float = 0.0,
+    host_burst: int = 1,
+    max_in_flight: int = 1000,
+    max_jitter: float = 0.0,
+    retry_interval: Optional[float] = None,
+    retries: int = 2,
+    stable_after: Optional[int] = None,
+    stable_factor: float = 2.0,
+    sink_batch_size: int = 500,
+    sink_batch_timeout: int = 250,
+    sink_max_pending: int = 4,
+    event_format: str = "json",
+    rollup_window: int = 60,
+    latency_includes_dns: bool = True,
+    publish_mode: str = "all",
+    heartbeat_interval: float = 300.0,
+    spool_dir: Optional[str] = None,
+    spool_max_size: int = 1024,
+) -> "CheckManager":
+    from aiven.monitor.adaptive import AdaptiveInterval
+    from aiven.monitor.http.check import trace_config
+    from aiven.monitor.manager import CheckManager
+    from aiven.monitor.scheduler import Scheduler
+    from aiven.monitor.spool import Spool
+    from aiven.service.http import HTTPManager
+    from aiven.service.ratelimit import HostRateLimiter
+
+    http_manager = None
+    if connection_mode == "shared":
+        http_manager = HTTPManager(
+            limit=connection_limit,
+            limit_per_host=connection_limit_per_host,
+            keep_alive=keep_alive,
+            trace_configs=[trace_config],
+        )
+
+    return CheckManager(
+        http=http_manager,
+        scheduler=Scheduler(max_in_flight=max_in_flight, max_jitter=max_jitter),
+        sink_batch_size=sink_batch_size,
+        sink_batch_timeout=sink_batch_timeout,
+        sink_max_pending=sink_max_pending,
+        event_format=event_format,
+        rollup_window=rollup_window or None,
+        latency_includes_dns=latency_includes_dns,
+        publish_mode=publish_mode,
+        heartbeat_interval=heartbeat_interval,
+        spool=(
+            Spool(spool_dir, max_size=spool_max_size * 1048576) if spool_dir else None
+        ),
+        adaptive=(
+            AdaptiveInterval(
+                retry_interval=retry_interval,
+                retries=retries,
+                stable_after=stable_after,
+                stable_factor=stable_factor,
+            )
+            if retry_interval is not None or stable_after is not None
+            else None
+        ),
+        rate_limiter=(
+            HostRateLimiter(rate=host_rate, burst=host_burst) if host_rate else None
+        ),
+    )
+
+
+def run_worker(
+    check_type: str,
+    checks: List[Check],
+    manager_factory: Callable[[], "CheckManager"],
+    consume: bool = True,
+    debug: bool = False,
+    metrics_host: str = "0.0.0.0",
+    metrics_port: Optional[int] = None,
+    cluster: Optional[Dict[str, Any]] = None,
+    loop: str = "asyncio",
+) -> None:
+    """
+    Run checks and optionally the event consumer on a new event loop until the
+    process receives SIGINT or SIGTERM.
+
+    :param cluster: options of the `ClusterCoordinator` to run checks with, if
+        checks are to be run as part of a cluster
+    :param loop: event loop implementation, worker processes do not inherit the
+        selection of their parent
+    """
+    if debug:
+        logging.root.setLevel(logging.DEBUG)
+
+    use_event_loop(loop)
+    init_event_loop().run_until_complete(
+        run(
+            check_type,
+            checks,
+            manager_factory(),
+            consume,
+            metrics_host=metrics_host,
+            metrics_port=metrics_port,
+            cluster=cluster,
+        )
+    )
+
+
+def create_http_check(config: Dict[str, Any]) -> Check:
+    from aiven.monitor.http.check import HTTPCheck
+
+    return HTTPCheck(**config)
+
 
+CHECK_FACTORIES: Dict[str, Callable[[Dict[str, Any]], Check]] = {
+    "http": create_http_check,
+}
+
+
+async def run(
+    check_type: str,
+    checks: List[Check],
+    manager: "CheckManager",
+    consume: bool = True,
+    metrics_host: str = "0.0.0.0",
+    metrics_port: Optional[int] = None,
+    cluster: Optional[Dict[str, Any]] = None,
+):
+    from aiven.monitor.cluster import ClusterCoordinator
 
-async def run(check_type: str, checks: List[Check]):
     logger.info("Initialising checks manager")
-    manager = CheckManager()
-    # TODO: allow consumer and producer to be started independently
-    consumer_task = asyncio.create_task(manager.consume_events())
-    check_tasks = [manager.monitor(check_type, check) for check in checks]
+    async with manager, serve_metrics(manager, metrics_host, metrics_port):
+        tasks = []
+        if consume:
+            tasks.append(asyncio.create_task(manager.consume_events()))
+            if manager.aggregator is not None:
+                tasks.append(asyncio.create_task(manager.consume_rollups()))
+        coordinator = None
+        try:
+            if cluster is None:
+                await manager.monitor_many(check_type, checks)
+            else:
+                if checks:
+                    await manager.register(check_type, checks)
+                coordinator = ClusterCoordinator(
+                    manager, check_type, CHECK_FACTORIES[check_type], **cluster
+                )
+                tasks.append(asyncio.create_task(coordinator.run()))
+            await asyncio.gather(
+                manager.scheduler.start(), *tasks, return_exceptions=True
+            )
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if coordinator is not None:
+                await coordinator.close()
+
+
+@monitor.command()
+@sink_options
+@click.option(
+    "--rollups/--no-rollups",
+    default=True,
+    help="Consume and persist rollups in addition to events",
+)
+@metrics_options
+@click.option(
+    "--debug/--no-debug", default=False, help="Enable or disable debugging",
+)
+def consume(
+    sink_batch_size,
+    sink_batch_timeout,
+    sink_max_pending,
+    rollups,
+    metrics_port,
+    metrics_host,
+    debug,
+):
+    """
+    Consume and persist events published by checks run elsewhere.
+    """
+    from aiven.monitor.manager import CheckManager
+
+    if debug:
+        logging.root.setLevel(logging.DEBUG)
+
+    loop = init_event_loop()
+    manager = CheckManager(
+        sink_batch_size=sink_batch_size,
+        sink_batch_timeout=sink_batch_timeout,
+        sink_max_pending=sink_max_pending,
+        rollup_window=None,
+    )
+    loop.run_until_complete(
+        run_consumers(
+            manager, rollups, metrics_host=metrics_host, metrics_port=metrics_port
+        )
+    )
+
+
+async def run_consumers(
+    manager: "CheckManager",
+    rollups: bool = True,
+    metrics_host: str = "0.0.0.0",
+    metrics_port: Optional[int] = None,
+):
+    logger.info("Initialising consumers")
+    async with manager, serve_metrics(manager, metrics_host, metrics_port):
+        tasks = [manager.consume_events()]
+        if rollups:
+            tasks.append(manager.consume_rollups())
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            pass
+
+
+@monitor.command()
+@click.option(
+    "--partitions-ahead",
+    default=7,
+    type=click.IntRange(min=0),
+    help="Number of days events partitions are created in advance",
+)
+@click.option(
+    "--retention",
+    default=14.0,
+    type=click.FloatRange(min=1),
+    help="Time (days) raw events are kept, older partitions are rolled up and dropped",
+)
+@click.option(
+    "--rollup-retention",
+    default=90.0,
+    type=click.FloatRange(min=1),
+    help="Time (days) per-minute rollups are kept before being merged into hourly "
+    "rollups",
+)
+@click.option(
+    "--every",
+    required=False,
+    type=click.FloatRange(min=60),
+    help="Run maintenance every given number of seconds instead of once",
+)
+@click.option(
+    "--debug/--no-debug", default=False, help="Enable or disable debugging",
+)
+def maintain(partitions_ahead, retention, rollup_retention, every, debug):
+    """
+    Create events partitions ahead of time, roll expired events up and drop their
+    partitions, and downsample old rollups.
+    """
+    from aiven.monitor.maintenance import Maintenance
+    from aiven.service.postgres import PostgresManager
+
+    if debug:
+        logging.root.setLevel(logging.DEBUG)
+
+    loop = init_event_loop()
+    maintenance = Maintenance(
+        PostgresManager(),
+        partitions_ahead=partitions_ahead,
+        retention=retention,
+        rollup_retention=rollup_retention,
+    )
+    loop.run_until_complete(run_maintenance(maintenance, every))
+
+
+async def run_maintenance(maintenance: "Maintenance", every: Optional[float] = None):
     try:
-        await asyncio.gather(*check_tasks, consumer_task, return_exceptions=True)
+        while True:
+            try:
+                await maintenance.run()
+            except RuntimeError as e:
+                if every is None:
+                    raise click.ClickException(str(e))
+                logger.error("Maintenance failed: %s", e)
+            if every is None:
+                break
+            await asyncio.sleep(every)
     except asyncio.CancelledError:
         pass
+    finally:
+        await maintenance.postgres.close()
+
+
+@monitor.command()
+@click.option(
+    "--since",
+    required=False,
+    type=click.DateTime(),
+    help="Start of the report window (UTC) [default: --hours before --until]",
+)
+@click.option(
+    "--until",
+    required=False,
+    type=click.DateTime(),
+    help="End of the report window (UTC) [default: now]",
+)
+@click.option(
+    "--hours",
+    default=24.0,
+    type=click.FloatRange(min=0),
+    help="Duration (hours) of the report window when --since is not provided",
+)
+@click.option(
+    "--check",
+    "check_ids",
+    type=int,
+    multiple=True,
+    help="Identifier of a check to report on, can be repeated [default: all checks]",
+)
+@click.option(
+    "-p",
+    "--percentile",
+    "percentiles",
+    type=click.FloatRange(min=0, max=100),
+    multiple=True,
+    default=[50, 90, 99],
+    help="Latency percentile to report, can be repeated",
+)
+@click.option(
+    "--format",
+    "output_format",
+    default="table",
+    type=click.Choice(["table", "json"]),
+    help="Output format, json writes one document per check and line",
+)
+@click.option(
+    "--debug/--no-debug", default=False, help="Enable or disable debugging",
+)
+def report(since, until, hours, check_ids, percentiles, output_format, debug):
+    """
+    Report availability, latency percentiles and errors of checks over a window.
+    """
+    from aiven.monitor.report import Report
+    from aiven.service.postgres import PostgresManager
+
+    if debug:
+        logging.root.setLevel(logging.DEBUG)
+
+    until = (until or datetime.utcnow()).replace(tzinfo=timezone.utc)
+    since = (
+        since.replace(tzinfo=timezone.utc)
+        if since is not None
+        else until - timedelta(hours=hours)
+    )
+    try:
+        check_report = Report(
+            PostgresManager(), since, until, check_ids=list(check_ids) or None
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    loop = init_event_loop()
+    loop.run_until_complete(print_report(check_report, percentiles, output_format))
+
+
+def format_report(report: "CheckReport", percentiles: Sequence[float]) -> str:
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value * 1000:.1f}"
+
+    availability = report.availability
+    errors = ", ".join(
+        f"{kind}={count}"
+        for kind, count in sorted(report.error_kinds.items(), key=lambda k: -k[1])
+    )
+    return "\t".join(
+        [
+            str(report.check_id),
+            str(report.count),
+            "-" if availability is None else f"{availability * 100:.3f}%",
+            ms(report.latency_mean),
+            *(ms(report.sketch.quantile(p / 100)) for p in percentiles),
+            errors or "-",
+            report.label,
+        ]
+    )
+
+
+async def print_report(
+    report: "Report", percentiles: Sequence[float], output_format: str = "table"
+):
+    import ujson
+
+    if output_format == "table":
+        click.echo(
+            "\t".join(
+                [
+                    "check",
+                    "count",
+                    "availability",
+                    "mean (ms)",
+                    *(f"p{p:g} (ms)" for p in percentiles),
+                    "errors",
+                    "target",
+                ]
+            )
+        )
+    try:
+        async for check_report in report.checks():
+            if output_format == "json":
+                click.echo(ujson.dumps(check_report.to_dict(percentiles)))
+            else:
+                click.echo(format_report(check_report, percentiles))
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    finally:
+        await report.postgres.close()
+
+
+@monitor.command()
+@click.option(
+    "--topic", default="check.events", help="Topic events are replayed from",
+)
+@click.option(
+    "--from-offset",
+    required=False,
+    type=click.IntRange(min=0),
+    help="Offset to start from in every partition [default: earliest]",
+)
+@click.option(
+    "--to-offset",
+    required=False,
+    type=click.IntRange(min=0),
+    help="Offset to stop at (exclusive) in every partition [default: latest]",
+)
+@click.option(
+    "--since",
+    required=False,
+    type=click.DateTime(),
+    help="Replay records published at or after this time (UTC)",
+)
+@click.option(
+    "--until",
+    required=False,
+    type=click.DateTime(),
+    help="Replay records published before this time (UTC)",
+)
+@click.option(
+    "--batch-size",
+    default=10000,
+    type=click.IntRange(min=1),
+    help="Maximum number of events written to the database at once",
+)
+@click.option(
+    "--writers",
+    required=False,
+    type=click.IntRange(min=1),
+    help="Number of batches written concurrently [default: postgres pool size]",
+)
+@click.option(
+    "--debug/--no-debug", default=False, help="Enable or disable debugging",
+)
+def replay(topic, from_offset, to_offset, since, until, batch_size, writers, debug):
+    """
+    Bulk load a range of events from kafka into the database. Events already written
+    are skipped, so a range can safely be replayed more than once.
+    """
+    from aiven.monitor.replay import Replay
+    from aiven.service.kafka import KafkaManager
+    from aiven.service.postgres import PostgresManager
+
+    if debug:
+        logging.root.setLevel(logging.DEBUG)
+
+    try:
+        event_replay = Replay(
+            KafkaManager(),
+            PostgresManager(),
+            topic=topic,
+            start_offset=from_offset,
+            end_offset=to_offset,
+            since=since.replace(tzinfo=timezone.utc) if since else None,
+            until=until.replace(tzinfo=timezone.utc) if until else None,
+            batch_size=batch_size,
+            writers=writers,
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    loop = init_event_loop()
+    loop.run_until_complete(run_replay(event_replay))
+
+
+async def run_replay(event_replay: "Replay"):
+    try:
+        progress = await event_replay.run()
+        click.echo(f"Replay complete: {progress}")
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    except asyncio.CancelledError:
+        click.echo(f"Replay interrupted: {event_replay.progress}", err=True)
+    finally:
+        await event_replay.postgres.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,384 @@
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from aiven.monitor import Check
+from aiven.monitor.manager import CheckManager
+
+logger = logging.getLogger(__name__)
+
+# fractional part of the golden ratio, spreads check offsets evenly over an interval
+_GOLDEN_RATIO = 0.6180339887498949
+
+
+def shard_owner(nodes: Iterable[str], shard: int) -> Optional[str]:
+    """
+    Map a shard to one of the nodes using rendezvous hashing, so that every node
+    computes the same assignment and only the shards of a node joining or leaving
+    move.
+
+    :return: The name of the node owning the shard, None if there are no nodes
+    """
+
+    def weight(node: str) -> bytes:
+        return hashlib.blake2b(f"{node}/{shard}".encode(), digest_size=8).digest()
+
+    return max(nodes, key=weight, default=None)
+
+
+def first_tick_delay(
+    check_id: int, interval: float, now: float, resume_from: Optional[float] = None
+) -> float:
+    """
+    Delay (seconds) before the first run of a check on a node taking it over. Runs
+    are aligned on a wall clock grid offset per check, so that successive owners of
+    a check run it at the same times.
+
+    :param now: current wall clock time (epoch seconds)
+    :param resume_from: time the previous owner stopped running the check, if a run
+        was due since then it is run immediately
+    """
+    offset = check_id * _GOLDEN_RATIO % 1.0 * interval
+    last = now - (now - offset) % interval
+    if resume_from is not None and last >= resume_from:
+        return 0.0
+    return last + interval - now
+
+
+class ClusterCoordinator:
+    """
+    Run a share of the enabled checks of a type registered in `public.checks`,
+    alongside any number of other nodes.
+
+    Checks are split into a fixed number of shards (check id modulo the number of
+    shards), assigned to live nodes with rendezvous hashing and leased in
+    `public.shards`, so that each shard is run by at most one node. Nodes heartbeat
+    every `heartbeat_interval` seconds; when a node joins or leaves, the shards that
+    move are released by their owner once it stopped running their checks, and
+    claimed by their new owner. Shards of a node that died are claimed once their
+    lease expires.
+
+    A shard released records when its checks were stopped, and its new owner runs
+    immediately any check that was due since, then follows the same wall clock grid
+    (see `first_tick_delay`), so that no tick is run twice or skipped. This assumes
+    node clocks are synchronised. Ticks due between the last lease renewal of a
+    node that died and its lease expiry may be run twice.
+    """
+
+    def __init__(
+        self,
+        manager: CheckManager,
+        check_type: str,
+        check_factory: Callable[[Dict[str, Any]], Check],
+        node: Optional[str] = None,
+        shards: int = 256,
+        lease_ttl: float = 30.0,
+        heartbeat_interval: float = 5.0,
+    ):
+        """
+        :param manager: manager used to schedule the checks of the shards owned
+        :param check_factory: callable creating a check from its configuration
+        :param node: unique name of this node, defaults to hostname and pid
+        :param shards: number of shards checks are split into, only used when
+            initialising the shards table; all nodes use the existing shards
+        :param lease_ttl: time (seconds) a shard stays leased to a node that stopped
+            renewing it, and after which a node that stopped heartbeating is
+            considered gone
+        :param heartbeat_interval: interval (seconds) at which this node heartbeats,
+            renews its leases and picks up checks added or disabled
+        """
+        if shards <= 0:
+            raise ValueError(f"Invalid number of shards: {shards}")
+        if heartbeat_interval * 2 > lease_ttl:
+            raise ValueError("Leases must last at least two heartbeat intervals")
+        self.manager = manager
+        self.check_type = check_type
+        self.check_factory = check_factory
+        self.node = node or f"{socket.gethostname()}-{os.getpid()}"
+        self.shards = shards
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self._owned: Set[int] = set()
+        self._check_shards: Dict[int, int] = {}
+        self._intervals: Dict[int, float] = {}
+        self._invalid: Set[int] = set()
+        self._deadline: Optional[float] = None
+        self._initialised = False
+
+    @property
+    def owned(self) -> Set[int]:
+        return set(self._owned)
+
+    async def _execute(self, query: str, *args) -> List:
+        rows = await self.manager.postgres.execute(query, *args)
+        if rows is None:
+            raise RuntimeError("Cluster query failed, see previous errors")
+        return rows
+
+    async def init(self) -> None:
+        await self._execute(
+            """
+            INSERT INTO public.shards (shard)
+                SELECT generate_series(0, $1::INTEGER - 1)
+            ON CONFLICT DO NOTHING
+            """,
+            self.shards,
+        )
+        rows = await self._execute("SELECT count(*) AS shards FROM public.shards")
+        if rows[0]["shards"] != self.shards:
+            logger.warning(
+                "Using the %d existing shards instead of %d",
+                rows[0]["shards"],
+                self.shards,
+            )
+            self.shards = rows[0]["shards"]
+        self._initialised = True
+
+    async def _heartbeat(self) -> List[str]:
+        rows = await self._execute(
+            """
+            WITH heartbeat AS (
+                INSERT INTO public.nodes (name) VALUES ($1)
+                ON CONFLICT (name) DO UPDATE SET heartbeat_at = now()
+            )
+            SELECT name FROM public.nodes
+                WHERE name = $1
+                    OR heartbeat_at > now() - $2::DOUBLE PRECISION * INTERVAL '1 s'
+            """,
+            self.node,
+            self.lease_ttl,
+        )
+        return sorted({row["name"] for row in rows} | {self.node})
+
+    async def _stop(
+        self, shards: Set[int], released_at: Optional[float] = None
+    ) -> None:
+        """
+        Stop running the checks of shards.
+
+        :param released_at: time (epoch seconds) the shards are released at, runs
+            due before it on the grid of each check are run by this node, the others
+            are left to the next owner
+        """
+        check_ids = [c for c, s in self._check_shards.items() if s in shards]
+        dues = None
+        if released_at is not None:
+            loop = asyncio.get_event_loop()
+            offset = loop.time() - time.time()
+            dues = {}
+            for check_id in check_ids:
+                interval = self._intervals[check_id]
+                # half an interval before the first run due from then on, so that
+                # runs slightly off the grid are still attributed to the right node
+                dues[check_id] = (
+                    released_at
+                    + offset
+                    + first_tick_delay(check_id, interval, released_at)
+                    - interval / 2
+                )
+        await self.manager.unschedule_many(check_ids, dues)
+        for check_id in check_ids:
+            del self._check_shards[check_id]
+            del self._intervals[check_id]
+        self._owned -= shards
+
+    async def _release(self, shards: Set[int]) -> None:
+        released_at = time.time()
+        await self._stop(shards, released_at)
+        await self._execute(
+            """
+            UPDATE public.shards
+            SET node = NULL, expires_at = NULL, released_at = $3
+            WHERE shard = ANY($2::INTEGER[]) AND node = $1
+            """,
+            self.node,
+            sorted(shards),
+            datetime.fromtimestamp(released_at, tz=timezone.utc),
+        )
+        logger.info("Released %d shard(s): %s", len(shards), sorted(shards))
+
+    async def _claim(self, shards: Set[int]) -> Dict[int, Optional[float]]:
+        """
+        Acquire or renew leases of shards.
+
+        :return: The time the previous owner of each shard leased stopped running
+            its checks, if known, keyed by shard
+        """
+        rows = await self._execute(
+            """
+            UPDATE public.shards s
+            SET node = $1,
+                expires_at = now() + $3::DOUBLE PRECISION * INTERVAL '1 s',
+                released_at = NULL
+            FROM (
+                SELECT shard, node, expires_at, released_at
+                    FROM public.shards
+                    WHERE shard = ANY($2::INTEGER[])
+                FOR UPDATE
+            ) previous
+            WHERE s.shard = previous.shard
+                AND (
+                    previous.node IS NULL
+                    OR previous.node = $1
+                    OR previous.expires_at < now()
+                )
+            RETURNING s.shard,
+                COALESCE(
+                    previous.released_at,
+                    previous.expires_at - $3::DOUBLE PRECISION * INTERVAL '1 s'
+                ) AS resume_from
+            """,
+            self.node,
+            sorted(shards),
+            self.lease_ttl,
+        )
+        return {
+            row["shard"]: row["resume_from"] and row["resume_from"].timestamp()
+            for row in rows
+        }
+
+    async def _sync_checks(self, resume_from: Dict[int, Optional[float]]) -> None:
+        """
+        Schedule enabled checks of the shards owned that are not yet scheduled, and
+        stop checks that were disabled.
+        """
+        rows = await self._execute(
+            """
+            SELECT id FROM public.checks
+                WHERE type = $1
+                    AND enabled
+                    AND config_hash IS NOT NULL
+                    AND id % $2 = ANY($3::INTEGER[])
+            """,
+            self.check_type,
+            self.shards,
+            sorted(self._owned),
+        )
+        check_ids = {row["id"] for row in rows}
+
+        removed = [c for c in self._check_shards if c not in check_ids]
+        if removed:
+            logger.info("Stopping %d disabled check(s)", len(removed))
+            await self.manager.unschedule_many(removed)
+            for check_id in removed:
+                del self._check_shards[check_id]
+                del self._intervals[check_id]
+
+        added = sorted(check_ids - self._check_shards.keys() - self._invalid)
+        if not added:
+            return
+        rows = await self._execute(
+            "SELECT id, config FROM public.checks WHERE id = ANY($1::INTEGER[])", added
+        )
+
+        ids, checks, delays = [], [], []
+        now = time.time()
+        for row in rows:
+            try:
+                check = self.check_factory(row["config"])
+            except (TypeError, ValueError) as e:
+                logger.error("Invalid configuration of check=%d: %s", row["id"], e)
+                self._invalid.add(row["id"])
+                continue
+            ids.append(row["id"])
+            checks.append(check)
+            delays.append(
+                first_tick_delay(
+                    row["id"],
+                    check.interval,
+                    now,
+                    resume_from.get(row["id"] % self.shards),
+                )
+            )
+            self._check_shards[row["id"]] = row["id"] % self.shards
+            self._intervals[row["id"]] = check.interval
+
+        logger.info("Scheduling %d check(s)", len(checks))
+        await self.manager.schedule_many(self.check_type, ids, checks, delays)
+
+    async def sync(self) -> bool:
+        """
+        Heartbeat, release shards assigned to other nodes, claim shards assigned to
+        this node, and (un)schedule checks accordingly.
+
+        :return: Whether some shards assigned to this node are still leased to
+            another node
+        """
+        if not self._initialised:
+            await self.init()
+
+        started = asyncio.get_event_loop().time()
+        nodes = await self._heartbeat()
+        assigned = {s for s in range(self.shards) if shard_owner(nodes, s) == self.node}
+
+        released = self._owned - assigned
+        if released:
+            await self._release(released)
+
+        claimed = await self._claim(assigned) if assigned else {}
+        self._deadline = started + self.lease_ttl
+
+        lost = self._owned - claimed.keys()
+        if lost:
+            logger.warning("Leases of %d shard(s) were lost", len(lost))
+            await self._stop(lost)
+
+        acquired = {s: t for s, t in claimed.items() if s not in self._owned}
+        if acquired:
+            logger.info(
+                "Acquired %d shard(s) out of %d, with %d node(s)",
+                len(acquired),
+                self.shards,
+                len(nodes),
+            )
+        self._owned.update(claimed)
+        await self._sync_checks(acquired)
+        return len(claimed) < len(assigned)
+
+    async def run(self) -> None:
+        """
+        Take part in running checks until cancelled.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            pending = False
+            try:
+                # bounded, so that leases are known to be lost before they expire
+                pending = await asyncio.wait_for(
+                    self.sync(), timeout=self.lease_ttl - self.heartbeat_interval
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Failed to synchronise with the cluster: %s", e)
+                if self._deadline is not None and loop.time() >= self._deadline:
+                    # another node may have claimed the shards by now
+                    logger.error(
+                        "Leases expired, stopping %d shard(s)", len(self._owned)
+                    )
+                    await self._stop(set(self._owned))
+
+            # shards assigned to this node are picked up as soon as they are released
+            await asyncio.sleep(
+                min(1.0, self.heartbeat_interval)
+                if pending
+                else self.heartbeat_interval
+            )
+
+    async def close(self) -> None:
+        """
+        Stop running checks and leave the cluster, handing shards over to the other
+        nodes immediately.
+        """
+        try:
+            if self._owned:
+                await self._release(set(self._owned))
+            await self._execute("DELETE FROM public.nodes WHERE name = $1", self.node)
+        except Exception as e:
+            logger.warning("Failed to leave the cluster: %s", e)
+            await self._stop(set(self._owned))
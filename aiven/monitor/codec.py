@@ -0,0 +1,200 @@
+import dataclasses
+import importlib
+import struct
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+import ujson
+
+from aiven.monitor import CheckResult
+
+# binary events start with a magic byte that can never start a json document
+BINARY_MAGIC = 0xA7
+BINARY_VERSION = 1
+
+# magic, version, schema id, check id, presence bitmask
+_HEADER = struct.Struct("!BBIqQ")
+_LENGTH = struct.Struct("!I")
+
+_FORMATS = {float: "d", int: "q", bool: "?"}
+
+
+def _base_type(tp: Any) -> Any:
+    """
+    Resolve `Optional[T]` to `T`, leaving any other type untouched.
+    """
+    if getattr(tp, "__origin__", None) is Union:
+        args = [a for a in tp.__args__ if a is not type(None)]  # noqa: E721
+        if len(args) == 1:
+            return args[0]
+    return tp
+
+
+def result_type_name(cls: Type[CheckResult]) -> str:
+    """
+    Name identifying a result class in events.
+    """
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class ResultSchema:
+    """
+    Fixed binary layout derived from the fields of a `CheckResult` dataclass.
+
+    Numeric and boolean fields are packed in a single struct, followed by length
+    prefixed utf-8 strings for `str` fields and json for any other field. A bitmask
+    in the header records which fields are not None. The schema id is derived from
+    field names and types, so any change to a result class yields a new schema.
+    """
+
+    def __init__(self, cls: Type[CheckResult]):
+        self.cls = cls
+        self.type_name = result_type_name(cls)
+        fields = dataclasses.fields(cls)
+        if len(fields) > 64:
+            raise ValueError(f"Too many fields for binary encoding: {cls.__name__}")
+
+        self.names: List[str] = [f.name for f in fields]
+        self.fixed: List[Tuple[int, str, Callable]] = []
+        self.variable: List[Tuple[int, str, bool]] = []
+        formats = []
+        for index, f in enumerate(fields):
+            tp = _base_type(f.type)
+            if tp in _FORMATS:
+                formats.append(_FORMATS[tp])
+                self.fixed.append((index, f.name, tp))
+            else:
+                self.variable.append((index, f.name, tp is str))
+
+        self.struct = struct.Struct("!" + "".join(formats))
+        spec = ",".join(f"{f.name}:{_base_type(f.type)}" for f in fields)
+        self.id = zlib.crc32(f"{self.type_name}/{spec}".encode())
+
+    def encode(self, check_id: int, result: CheckResult) -> bytes:
+        values = [getattr(result, name) for name in self.names]
+        mask = 0
+        for index, value in enumerate(values):
+            if value is not None:
+                mask |= 1 << index
+
+        parts = [
+            _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, self.id, check_id, mask),
+            self.struct.pack(
+                *(tp() if values[i] is None else values[i] for i, _, tp in self.fixed)
+            ),
+        ]
+        for index, _, is_str in self.variable:
+            value = values[index]
+            if value is None:
+                continue
+            data = (value if is_str else ujson.dumps(value)).encode("utf-8")
+            parts.append(_LENGTH.pack(len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+    def decode(self, mask: int, data: bytes, offset: int = 0) -> Dict[str, Any]:
+        result = dict.fromkeys(self.names)
+        values = self.struct.unpack_from(data, offset)
+        for (index, name, _), value in zip(self.fixed, values):
+            if mask >> index & 1:
+                result[name] = value
+
+        offset += self.struct.size
+        for index, name, is_str in self.variable:
+            if not mask >> index & 1:
+                continue
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            text = data[offset : offset + length].decode("utf-8")
+            offset += length
+            result[name] = text if is_str else ujson.loads(text)
+        return result
+
+
+_schemas_by_type: Dict[Type[CheckResult], ResultSchema] = {}
+_schemas_by_id: Dict[int, ResultSchema] = {}
+
+# modules registering the result types published by built-in checks on import; they
+# are imported on demand, as consumers do not import the checks themselves
+BUILTIN_RESULT_MODULES = ("aiven.monitor.changes", "aiven.monitor.http.check")
+
+
+def register_result_type(cls: Type[CheckResult]) -> ResultSchema:
+    """
+    Register a result class for binary encoding. Consumers can only decode binary
+    events of registered result classes.
+    """
+    schema = _schemas_by_type.get(cls)
+    if schema is None:
+        schema = ResultSchema(cls)
+        _schemas_by_type[cls] = schema
+        _schemas_by_id[schema.id] = schema
+    return schema
+
+
+def _schema(schema_id: int) -> Optional[ResultSchema]:
+    schema = _schemas_by_id.get(schema_id)
+    if schema is None:
+        for module in BUILTIN_RESULT_MODULES:
+            importlib.import_module(module)
+        schema = _schemas_by_id.get(schema_id)
+    return schema
+
+
+def encode_event(check_id: int, result: CheckResult, binary: bool = False) -> bytes:
+    """
+    Encode a check event.
+
+    :param check_id: check id corresponding to config in database
+    :param result: check result to encode
+    :param binary: use the compact binary format instead of json
+    """
+    if binary:
+        return register_result_type(type(result)).encode(check_id, result)
+    value = {
+        "check_id": check_id,
+        "type": result_type_name(type(result)),
+        "result": dataclasses.asdict(result),
+    }
+    return ujson.dumps(value).encode("utf-8")
+
+
+def decode_event(value: bytes) -> Tuple[int, Dict[str, Any]]:
+    """
+    Decode a check event, detecting whether it was encoded as json or binary.
+
+    :return: The check id and the result as a dictionary
+    :raises ValueError: if the event cannot be decoded
+    """
+    check_id, _, result = decode_typed_event(value)
+    return check_id, result
+
+
+def decode_typed_event(value: bytes) -> Tuple[int, Optional[str], Dict[str, Any]]:
+    """
+    Decode a check event along with the type of its result, see `decode_event`.
+
+    :return: The check id, the name of the result type (see `result_type_name`),
+        None for json events published without it, and the result as a dictionary
+    :raises ValueError: if the event cannot be decoded
+    """
+    if not value or value[0] != BINARY_MAGIC:
+        event = ujson.loads(value.decode("utf-8"))
+        return event["check_id"], event.get("type"), event["result"]
+
+    try:
+        _, version, schema_id, check_id, mask = _HEADER.unpack_from(value, 0)
+    except struct.error as e:
+        raise ValueError(f"Invalid binary event: {e}")
+
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary event version: {version}")
+
+    schema = _schema(schema_id)
+    if schema is None:
+        raise ValueError(f"Unknown binary event schema: {schema_id}")
+
+    try:
+        return check_id, schema.type_name, schema.decode(mask, value, _HEADER.size)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid binary event: {e}")
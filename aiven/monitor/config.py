@@ -0,0 +1,37 @@
+import logging
+import os
+from typing import Any, Dict, List
+
+import ujson
+
+logger = logging.getLogger(__name__)
+
+
+def load_check_configs(path: str) -> List[Dict[str, Any]]:
+    """
+    Load check configurations from a JSON or YAML file. The file is expected to
+    contain either a list of check configurations or a mapping with a `checks` key
+    containing such a list. YAML files (.yaml, .yml) require PyYAML to be installed.
+
+    :param path: Path to the configuration file
+    :return: A list of check configurations
+    """
+    _, ext = os.path.splitext(path)
+    with open(path, "r") as f:
+        if ext.lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("PyYAML is required to load YAML configuration")
+            data = yaml.safe_load(f)
+        else:
+            data = ujson.load(f)
+
+    if isinstance(data, dict):
+        data = data.get("checks")
+
+    if not isinstance(data, list) or not all(isinstance(c, dict) for c in data):
+        raise ValueError(f"Invalid check configuration file: {path}")
+
+    logger.debug("Loaded %d check configuration(s) from %s", len(data), path)
+    return data
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import asyncpg
+from aiokafka import ConsumerRecord
+
+from aiven.monitor.changes import Heartbeat
+from aiven.monitor.codec import decode_typed_event, result_type_name
+from aiven.service.postgres import PostgresManager
+
+logger = logging.getLogger(__name__)
+
+# timestamp, check id, source partition and offset, typed fields of the result (see
+# `RESULT_COLUMNS`), kind of error, whether the event is a heartbeat and the fields of
+# the result without a column (null fields omitted)
+EventRecord = Tuple[
+    datetime,
+    int,
+    Optional[int],
+    Optional[int],
+    Optional[int],
+    Optional[float],
+    Optional[bool],
+    Optional[bool],
+    Optional[str],
+    bool,
+    Optional[Dict],
+]
+
+# fields of results stored in typed columns of `public.events`
+RESULT_COLUMNS = ("status", "elapsed", "connected", "content_verified")
+
+# columns events are written to, in the order of `EventRecord`; the kind of error is
+# written as its code (see `EventWriter`); events already consumed from the same
+# partition and offset are skipped (see `CheckManager.consume_events`)
+EVENT_COLUMNS = (
+    "timestamp",
+    "check_id",
+    "source_partition",
+    "source_offset",
+    *RESULT_COLUMNS,
+    "error_code",
+    "heartbeat",
+    "extra",
+)
+EVENT_CONFLICT = "(source_partition, source_offset, timestamp) DO NOTHING"
+
+HEARTBEAT_TYPE = result_type_name(Heartbeat)
+
+_TYPED_FIELDS = frozenset(RESULT_COLUMNS)
+_ERROR_KIND = EVENT_COLUMNS.index("error_code")
+
+# errors of records that can never be written, eg: events of deleted checks
+_REJECTED = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError)
+
+
+def error_kind(result: Dict[str, Any], heartbeat: bool = False) -> Optional[str]:
+    """
+    Kind of failure of a decoded result, as `CheckResult.error_kind` of the result
+    types published by checks. Heartbeats fail with the kind of failure of the last
+    result they summarise.
+    """
+    if heartbeat:
+        if not result.get("failing"):
+            return None
+        return error_kind(result.get("last") or {}) or "error"
+    if result.get("error") is not None:
+        return result.get("error_type") or "error"
+    status = result.get("status") or 0
+    if status >= 500:
+        return f"http_{status}"
+    if result.get("connected") is False:
+        return "not_connected"
+    return None
+
+
+def event_record(
+    timestamp: datetime,
+    check_id: int,
+    result: Dict[str, Any],
+    partition: Optional[int] = None,
+    offset: Optional[int] = None,
+    heartbeat: bool = False,
+) -> EventRecord:
+    """
+    Split a decoded result (without its timestamp) into a record of `EVENT_COLUMNS`.
+    Events without a source partition and offset never conflict.
+
+    :param heartbeat: whether the result is a `Heartbeat`
+    """
+    extra = {
+        k: v for k, v in result.items() if v is not None and k not in _TYPED_FIELDS
+    }
+    return (
+        timestamp,
+        check_id,
+        partition,
+        offset,
+        result.get("status"),
+        result.get("elapsed"),
+        result.get("connected"),
+        result.get("content_verified"),
+        error_kind(result, heartbeat),
+        heartbeat,
+        extra or None,
+    )
+
+
+def decode_event_record(msg: ConsumerRecord) -> Optional[EventRecord]:
+    """
+    Decode an event message into a record of `EVENT_COLUMNS`, None if it is malformed.
+    Events without a result timestamp are timestamped with the message timestamp, so
+    that consuming a message again yields the same record.
+    """
+    try:
+        check_id, result_type, result = decode_typed_event(msg.value)
+        if result_type is not None:
+            heartbeat = result_type == HEARTBEAT_TYPE
+        else:
+            # json events published before result types were recorded
+            heartbeat = "failing" in result
+        timestamp = result.pop("timestamp", None)
+        record = event_record(
+            datetime.fromtimestamp(
+                timestamp if timestamp is not None else msg.timestamp / 1000,
+                tz=timezone.utc,
+            ),
+            check_id,
+            result,
+            msg.partition,
+            msg.offset,
+            heartbeat,
+        )
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(
+            "Skipping malformed message topic=%s partition=%d offset=%d: %s",
+            msg.topic,
+            msg.partition,
+            msg.offset,
+            e,
+        )
+        return None
+    logger.debug("Consumed message topic=%s check=%d", msg.topic, check_id)
+    return record
+
+
+class EventWriter:
+    """
+    Write event records into `public.events` using binary COPY. Kinds of errors are
+    stored as codes of `public.error_codes`, registered as they are first seen and
+    cached for the lifetime of the writer. Daily partitions are created as events of
+    a day are first written, as only the partitions of the next few days exist ahead.
+
+    Records that can never be written (eg: events of deleted checks) are logged and
+    skipped, so that a batch including them is not retried forever; the batch is
+    split until they are isolated.
+    """
+
+    def __init__(self, postgres: PostgresManager):
+        self.postgres = postgres
+        self._codes: Dict[str, int] = {}
+        self._days: Set[date] = set()
+        self._partitions_lock: Optional[asyncio.Lock] = None
+
+    async def error_codes(self, kinds: Iterable[Optional[str]]) -> bool:
+        """
+        Register the codes of any `kinds` not seen before.
+
+        :return: Whether the codes of all kinds are known
+        """
+        missing = {kind for kind in kinds if kind is not None} - self._codes.keys()
+        if not missing:
+            return True
+        # updating existing rows makes them part of the returned rows
+        rows = await self.postgres.execute(
+            """
+                INSERT INTO public.error_codes (kind) SELECT unnest($1::TEXT[])
+                ON CONFLICT (kind) DO UPDATE SET kind = EXCLUDED.kind
+                RETURNING code, kind
+            """,
+            sorted(missing),
+        )
+        if rows is None:
+            return False
+        self._codes.update((row["kind"], row["code"]) for row in rows)
+        return True
+
+    async def partitions(self, records: List[EventRecord]) -> bool:
+        """
+        Create the partitions of any days of `records` not seen before.
+
+        :return: Whether the partitions of all days exist
+        """
+        days = {record[0].date() for record in records} - self._days
+        if not days:
+            return True
+        if self._partitions_lock is None:
+            self._partitions_lock = asyncio.Lock()
+        async with self._partitions_lock:
+            days -= self._days
+            if days:
+                rows = await self.postgres.execute(
+                    "SELECT public.create_events_partitions($1, $2) AS name",
+                    min(days),
+                    max(days),
+                )
+                if rows is None:
+                    return False
+                if rows:
+                    logger.info("Created partition(s): %s", [r["name"] for r in rows])
+                self._days.update(days)
+        return True
+
+    async def write(
+        self, records: List[EventRecord], rejected: Optional[List[Tuple]] = None
+    ) -> Optional[int]:
+        """
+        :param rejected: list the rows of rejected records are appended to, if any
+        :return: Number of records written, records already written and rejected
+            records excluded, or None if the records could not be written
+        """
+        if not await self.partitions(records):
+            return None
+        if not await self.error_codes(r[_ERROR_KIND] for r in records):
+            return None
+        # records without an error are written as is, with a null code
+        codes, i = self._codes, _ERROR_KIND
+        rows = [
+            r if r[i] is None else (*r[:i], codes[r[i]], *r[i + 1 :]) for r in records
+        ]
+        return await self._copy(rows, [] if rejected is None else rejected)
+
+    async def _copy(self, rows: List[Tuple], rejected: List[Tuple]) -> Optional[int]:
+        try:
+            status = await self.postgres.copy_records(
+                "events",
+                records=rows,
+                columns=EVENT_COLUMNS,
+                on_conflict=EVENT_CONFLICT,
+                reraise=_REJECTED,
+            )
+        except asyncpg.CheckViolationError as e:
+            # no partition for the row, eg: dropped since its day was first seen
+            logger.warning(e)
+            self._days.clear()
+            return None
+        except _REJECTED as e:
+            if len(rows) == 1:
+                logger.error("Rejected event %s: %s", rows[0], e)
+                rejected.append(rows[0])
+                return 0
+            # halves written before a failure are skipped as duplicates on retry
+            written = 0
+            for half in (rows[: len(rows) // 2], rows[len(rows) // 2 :]):
+                count = await self._copy(half, rejected)
+                if count is None:
+                    return None
+                written += count
+            return written
+        return None if status is None else int(status.split()[-1])
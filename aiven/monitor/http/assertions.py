@@ -0,0 +1,305 @@
+import codecs
+import functools
+import operator
+import re
+from typing import Any, Callable, Dict, List, Mapping, Optional, Pattern, Sequence, Set
+
+import ujson
+
+_MISSING = object()
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_pattern(regex: str) -> Pattern:
+    """
+    Compile a regex once for all checks using it.
+    """
+    return re.compile(regex)
+
+
+class PatternSet:
+    """
+    Regexes searched for in a single scan of a text.
+
+    Regexes without groups or flags are combined into one alternation, whose
+    matches tell which regex matched. A regex is only searched on its own if it
+    uses groups or flags, or if the combined scan matched other regexes, one of
+    which may overlap a match of this one.
+    """
+
+    def __init__(self, regexes: Sequence[str]):
+        self.regexes = tuple(regexes)
+        self._separate: List[int] = []
+        combined = []
+        for index, regex in enumerate(self.regexes):
+            pattern = compile_pattern(regex)
+            if pattern.groups == 0 and pattern.flags == re.UNICODE:
+                combined.append(f"(?P<_{index}>{regex})")
+            else:
+                self._separate.append(index)
+        self._combined = compile_pattern("|".join(combined)) if combined else None
+
+    def search(self, text: str, found: Set[int]) -> None:
+        """
+        Add the indices of the regexes matching `text` to `found`.
+        """
+        if self._combined is not None:
+            start = None
+            for match in self._combined.finditer(text):
+                found.add(int(match.lastgroup[1:]))
+                if start is None:
+                    start = match.start()
+                if len(found) == len(self.regexes):
+                    return
+            if start is not None:
+                # matches of the remaining regexes may overlap those found
+                for index, regex in enumerate(self.regexes):
+                    if index not in found and index not in self._separate:
+                        if compile_pattern(regex).search(text, start):
+                            found.add(index)
+        for index in self._separate:
+            if index not in found and compile_pattern(self.regexes[index]).search(text):
+                found.add(index)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_patterns(regexes: Sequence[str]) -> PatternSet:
+    """
+    Build the pattern set of regexes, shared by all checks using the same regexes.
+    """
+    return PatternSet(regexes)
+
+
+def _matches(value: Any, regex: str) -> bool:
+    return isinstance(value, str) and compile_pattern(regex).search(value) is not None
+
+
+def _contains(value: Any, expected: Any) -> bool:
+    return isinstance(value, (str, list, dict)) and expected in value
+
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "equals": operator.eq,
+    "not_equals": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "matches": _matches,
+    "contains": _contains,
+}
+
+
+def _resolve(document: Any, path: str) -> Any:
+    """
+    Resolve a dotted path (eg: `data.items.0.id`) in a json document.
+
+    :return: The value at the path, `_MISSING` if there is none
+    """
+    value = document
+    for key in path.split("."):
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.lstrip("-").isdigit():
+            try:
+                value = value[int(key)]
+            except IndexError:
+                return _MISSING
+        else:
+            return _MISSING
+    return value
+
+
+class JSONPredicate:
+    """
+    Predicate on the value at a dotted path of a json body, eg:
+    `{"path": "status", "equals": "ok"}`. A value must exist at the path, unless
+    `exists` is false. All operators provided must hold.
+    """
+
+    def __init__(self, path: str, exists: bool = True, **operators: Any):
+        unknown = set(operators) - set(_OPERATORS)
+        if unknown:
+            raise ValueError(f"Unknown json operators: {', '.join(sorted(unknown))}")
+        if "matches" in operators:
+            compile_pattern(operators["matches"])
+        self.path = path
+        self.exists = exists
+        self.operators = operators
+
+    @property
+    def name(self) -> str:
+        return f"json:{self.path}"
+
+    def evaluate(self, document: Any) -> bool:
+        value = _resolve(document, self.path)
+        if value is _MISSING:
+            return not self.exists
+        if not self.exists:
+            return False
+        try:
+            return all(
+                _OPERATORS[name](value, expected)
+                for name, expected in self.operators.items()
+            )
+        except TypeError:
+            return False
+
+
+class Assertions:
+    """
+    Assertions on http responses, configured per check (`HTTPCheck.assertions`):
+
+    - `regex`: regexes that must all match the body
+    - `headers`: response headers that must be present, mapped to a regex their
+      value must match, or None
+    - `json`: predicates on fields of a json body (see `JSONPredicate`)
+    - `max_response_time`: maximum time (seconds) to receive the response, including
+      the body read to verify it
+
+    Body assertions are evaluated in one pass over the body (see `BodyScan`).
+    """
+
+    KEYS = ("regex", "headers", "json", "max_response_time")
+
+    def __init__(
+        self,
+        regexes: Sequence[str] = (),
+        headers: Optional[Mapping[str, Optional[str]]] = None,
+        json: Sequence[Mapping[str, Any]] = (),
+        max_response_time: Optional[float] = None,
+    ):
+        try:
+            self.patterns = compile_patterns(tuple(regexes))
+            for regex in (headers or {}).values():
+                if regex is not None:
+                    compile_pattern(regex)
+            self.predicates = [JSONPredicate(**predicate) for predicate in json]
+        except re.error as e:
+            raise ValueError(f"Invalid regex: {e}")
+        except TypeError as e:
+            raise ValueError(f"Invalid json predicate: {e}")
+        if max_response_time is not None and max_response_time <= 0:
+            raise ValueError(f"Invalid max response time: {max_response_time}")
+        self.headers = dict(headers or {})
+        self.max_response_time = max_response_time
+
+    @classmethod
+    def from_config(
+        cls, config: Mapping[str, Any], regex: Optional[str] = None
+    ) -> Optional["Assertions"]:
+        """
+        :param regex: single regex configured on the check, added to the regexes
+        :return: The assertions configured, None if there are none
+        """
+        unknown = set(config) - set(cls.KEYS)
+        if unknown:
+            raise ValueError(f"Unknown assertions: {', '.join(sorted(unknown))}")
+        regexes = config.get("regex") or []
+        if isinstance(regexes, str):
+            regexes = [regexes]
+        if regex:
+            regexes = [regex, *regexes]
+        # configured values are validated even if they would not assert anything
+        if not (regexes or any(key in config for key in cls.KEYS[1:])):
+            return None
+        return cls(
+            regexes=regexes,
+            headers=config.get("headers"),
+            json=config.get("json") or (),
+            max_response_time=config.get("max_response_time"),
+        )
+
+    @property
+    def inspects_body(self) -> bool:
+        return bool(self.patterns.regexes or self.predicates)
+
+    def check_headers(self, headers: Mapping[str, str]) -> List[str]:
+        """
+        :return: The header assertions that failed
+        """
+        failed = []
+        for name, regex in self.headers.items():
+            value = headers.get(name)
+            if value is None or (
+                regex is not None and not compile_pattern(regex).search(value)
+            ):
+                failed.append(f"header:{name}")
+        return failed
+
+    def check_response_time(self, elapsed: float) -> List[str]:
+        if self.max_response_time is not None and elapsed > self.max_response_time:
+            return ["max_response_time"]
+        return []
+
+    def scan(
+        self, charset: Optional[str] = None, match_window: int = 4096
+    ) -> "BodyScan":
+        return BodyScan(self, charset, match_window)
+
+
+class BodyScan:
+    """
+    Evaluation of body assertions over a body fed in chunks. Regex matches spanning
+    chunk boundaries are found as long as they are not longer than `match_window`
+    characters. Json predicates are evaluated once the whole body is read.
+    """
+
+    def __init__(
+        self,
+        assertions: Assertions,
+        charset: Optional[str] = None,
+        match_window: int = 4096,
+    ):
+        self.assertions = assertions
+        self.match_window = match_window
+        self.found: Set[int] = set()
+        self._chunks: Optional[List[bytes]] = [] if assertions.predicates else None
+        self._tail = ""
+        try:
+            decoder = codecs.getincrementaldecoder(charset or "utf-8")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")
+        self._decoder = decoder(errors="replace")
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether the rest of the body cannot change the outcome of the assertions.
+        """
+        return self._chunks is None and len(self.found) == len(
+            self.assertions.patterns.regexes
+        )
+
+    def feed(self, chunk: bytes, final: bool = False) -> None:
+        if self._chunks is not None:
+            self._chunks.append(chunk)
+        if len(self.found) < len(self.assertions.patterns.regexes):
+            text = self._tail + self._decoder.decode(chunk, final=final)
+            self.assertions.patterns.search(text, self.found)
+            self._tail = text[-self.match_window :] if self.match_window > 0 else ""
+
+    def failures(self, truncated: bool = False) -> List[str]:
+        """
+        :param truncated: whether the body was not read in full, json predicates
+            fail if so
+        :return: The body assertions that failed
+        """
+        failed = [
+            f"regex:{regex}"
+            for index, regex in enumerate(self.assertions.patterns.regexes)
+            if index not in self.found
+        ]
+        if self.assertions.predicates:
+            document = _MISSING
+            if not truncated:
+                try:
+                    document = ujson.loads(b"".join(self._chunks).decode("utf-8"))
+                except ValueError:
+                    pass
+            failed.extend(
+                predicate.name
+                for predicate in self.assertions.predicates
+                if document is _MISSING or not predicate.evaluate(document)
+            )
+        return failed
@@ -1,41 +1,158 @@
 import asyncio
+import hashlib
 import logging
-import re
 import socket
+import urllib.parse
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, Union, Coroutine, Callable
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Union,
+)
 
 import aiohttp
 
-from aiven.monitor import Check, CheckResult
+from aiven.monitor import Check, CheckResult, slots
+from aiven.monitor.codec import register_result_type
+from aiven.monitor.http.assertions import Assertions
+from aiven.service.dns import shared_resolver
+from aiven.service.ratelimit import HostRateLimiter
 
 
 logger = logging.getLogger(__name__)
 
 
+@slots
 @dataclass
 class HTTPCheckResult(CheckResult):
     status: Optional[int] = field(default=None)
     connected: bool = field(default=False)
     content_verified: bool = field(default=False)
     elapsed: float = field(default=None)
+    bytes_read: int = field(default=0)
+    body_truncated: bool = field(default=False)
+    error_type: Optional[str] = field(default=None)
+    # content verification reused from a previous probe, the response was either not
+    # modified (304) or had an identical body
+    content_cached: bool = field(default=False)
+    # phase durations in seconds, None if the phase did not occur (eg: reused connection)
+    queued: Optional[float] = field(default=None)
+    dns: Optional[float] = field(default=None)
+    connect: Optional[float] = field(default=None)
+    ttfb: Optional[float] = field(default=None)
+    transfer: Optional[float] = field(default=None)
+    # time (seconds) waited for the per host rate limit before the request was made
+    throttled: Optional[float] = field(default=None)
+    # names of the assertions that failed (eg: regex:<regex>, header:<name>,
+    # json:<path>, max_response_time), None if no assertion was evaluated
+    failed_assertions: Optional[List[str]] = field(default=None)
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or not self.connected or (self.status or 0) >= 500
+
+    def error_kind(self) -> Optional[str]:
+        if self.error is not None:
+            return self.error_type or "error"
+        if (self.status or 0) >= 500:
+            return f"http_{self.status}"
+        if not self.connected:
+            return "not_connected"
+        return None
+
+    def state_key(self) -> Hashable:
+        return (
+            self.status,
+            self.connected,
+            self.content_verified,
+            self.error_type,
+            tuple(self.failed_assertions or ()),
+        )
+
+
+register_result_type(HTTPCheckResult)
+
+
+def _now() -> float:
+    return asyncio.get_event_loop().time()
 
 
 async def on_request_start(_, trace_config_ctx, __):
-    trace_config_ctx.start = asyncio.get_event_loop().time()
+    trace_config_ctx.start = trace_config_ctx.ready = _now()
+
+
+async def on_connection_queued_start(_, trace_config_ctx, __):
+    trace_config_ctx.queued_start = _now()
+
+
+async def on_connection_queued_end(_, trace_config_ctx, __):
+    check_result: HTTPCheckResult = trace_config_ctx.trace_request_ctx.get(
+        "check_result"
+    )
+    if check_result:
+        check_result.queued = _now() - trace_config_ctx.queued_start
+
+
+async def on_connection_create_start(_, trace_config_ctx, __):
+    trace_config_ctx.connection_start = _now()
+
+
+async def on_connection_create_end(_, trace_config_ctx, __):
+    trace_config_ctx.ready = _now()
+    check_result: HTTPCheckResult = trace_config_ctx.trace_request_ctx.get(
+        "check_result"
+    )
+    if check_result:
+        # includes tcp and tls setup, dns resolution is reported separately
+        check_result.connect = (
+            trace_config_ctx.ready
+            - trace_config_ctx.connection_start
+            - (check_result.dns or 0.0)
+        )
+
+
+async def on_connection_reuseconn(_, trace_config_ctx, __):
+    trace_config_ctx.ready = _now()
+
+
+async def on_dns_resolvehost_start(_, trace_config_ctx, __):
+    trace_config_ctx.dns_start = _now()
+
+
+async def on_dns_resolvehost_end(_, trace_config_ctx, __):
+    check_result: HTTPCheckResult = trace_config_ctx.trace_request_ctx.get(
+        "check_result"
+    )
+    if check_result:
+        check_result.dns = _now() - trace_config_ctx.dns_start
 
 
 async def on_request_end(_, trace_config_ctx, __):
+    now = _now()
+    trace_config_ctx.trace_request_ctx["response_start"] = now
     check_result: HTTPCheckResult = trace_config_ctx.trace_request_ctx.get(
         "check_result"
     )
     if check_result:
-        check_result.elapsed = asyncio.get_event_loop().time() - trace_config_ctx.start
+        check_result.elapsed = now - trace_config_ctx.start
+        check_result.ttfb = now - trace_config_ctx.ready
 
 
 # Trace configuration to make use of aiohttp's event tracing
 trace_config = aiohttp.TraceConfig()
 trace_config.on_request_start.append(on_request_start)
+trace_config.on_connection_queued_start.append(on_connection_queued_start)
+trace_config.on_connection_queued_end.append(on_connection_queued_end)
+trace_config.on_connection_create_start.append(on_connection_create_start)
+trace_config.on_connection_create_end.append(on_connection_create_end)
+trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
 trace_config.on_request_end.append(on_request_end)
 
 
@@ -48,53 +165,259 @@ class HTTPCheck(Check):
     headers: Dict[str, Any] = field(default_factory=dict)
     verify_ssl: bool = field(default=True)
     interval: Union[int, float] = field(default=30.0)
+    max_body_size: int = field(default=1048576)
+    match_window: int = field(default=4096)
+    chunk_size: int = field(default=65536)
+    conditional: bool = field(default=True)
+    fingerprint_body: bool = field(default=False)
+    assertions: Dict[str, Any] = field(default_factory=dict)
 
     def __post_init__(self):
         self.method = self.method.upper().strip()
         if self.method not in aiohttp.ClientRequest.ALL_METHODS:
             raise ValueError(f"Unsupported http method specified: {self.method}")
+        if self.max_body_size <= 0 or self.chunk_size <= 0:
+            raise ValueError("Body and chunk sizes must be positive integers")
+        # compiled patterns are shared with other checks using the same regexes
+        self._assertions = Assertions.from_config(self.assertions, self.regex)
+        self._host = urllib.parse.urlsplit(self.url).hostname or ""
+        self._session: Optional[aiohttp.ClientSession] = None
+        # state of the last content verification, see `HTTPCheck.conditional`
+        self._validators: Dict[str, str] = {}
+        self._header_failures: List[str] = []
+        self._body_failures: Optional[List[str]] = None
+        self._fingerprint: Optional[bytes] = None
 
-    async def start(self, callback: Callable[[CheckResult], Coroutine]) -> None:
-        pattern = re.compile(self.regex) if self.regex else None
+    @property
+    def host(self) -> str:
+        """
+        Host requests of this check are sent to.
+        """
+        return self._host
+
+    def _cold_session(self) -> aiohttp.ClientSession:
+        """
+        Create a session dedicated to this check, that sets up a new connection for
+        every request made.
+        """
         connector = aiohttp.TCPConnector(
             limit=1,
-            verify_ssl=self.verify_ssl,
             enable_cleanup_closed=True,
             force_close=True,
+            resolver=shared_resolver(),
+            use_dns_cache=False,
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    async def probe(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        rate_limiter: Optional[HostRateLimiter] = None,
+    ) -> HTTPCheckResult:
+        """
+        Perform a single request against the configured url.
+
+        :param session: Session to use for the request. If not provided, a session
+            dedicated to this check is used.
+        :param rate_limiter: Limiter of the rate of requests to the host of the url,
+            shared with other checks. The request waits for it if provided.
+        :return: The check result
+
+        Assertions (`regex` and `assertions`) are evaluated on the response, and the
+        ones that failed are recorded in the result. The content is verified if none
+        failed.
+
+        If `conditional` is set and body assertions are configured, validators (ETag,
+        Last-Modified) of the last response are sent with the request, and the last
+        verification result is reused if the response is not modified. With
+        `fingerprint_body` also set, it is reused if the body is identical to the last
+        one as well.
+        """
+        if session is None:
+            if self._session is None or self._session.closed:
+                self._session = self._cold_session()
+            session = self._session
+
+        assertions = self._assertions
+        conditional = (
+            assertions is not None and assertions.inspects_body and self.conditional
         )
-        async with aiohttp.ClientSession(
-            connector=connector,
-            headers=self.headers,
-            timeout=aiohttp.ClientTimeout(total=self.timeout),
-            trace_configs=[trace_config],
-        ) as session:
-            while True:
-                logger.info("Starting check for url %s", self.url)
-                result = HTTPCheckResult()
-                try:
-                    async with session.request(
-                        method=self.method,
-                        url=self.url,
-                        trace_request_ctx={"check_result": result},
-                    ) as resp:
-                        result.connected = True
-                        result.status = resp.status
-                        if pattern:
-                            result.content_verified = bool(
-                                pattern.search(await resp.text())
+        headers = self.headers
+        if conditional and self._validators and self._body_failures is not None:
+            headers = {**self.headers, **self._validators}
+
+        throttled = None
+        if rate_limiter is not None and rate_limiter.enabled:
+            throttled = await rate_limiter.acquire(self._host)
+
+        logger.info("Starting check for url %s", self.url)
+        result = HTTPCheckResult(throttled=throttled)
+        trace_request_ctx = {"check_result": result}
+        start = _now()
+        try:
+            async with session.request(
+                method=self.method,
+                url=self.url,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                ssl=None if self.verify_ssl else False,
+                trace_request_ctx=trace_request_ctx,
+            ) as resp:
+                result.connected = True
+                result.status = resp.status
+                if assertions is None:
+                    return result
+
+                if (
+                    conditional
+                    and resp.status == 304
+                    and self._body_failures is not None
+                ):
+                    # the representation is unchanged, headers included
+                    failures = self._header_failures + self._body_failures
+                    result.content_cached = True
+                else:
+                    header_failures = assertions.check_headers(resp.headers)
+                    failures = header_failures[:]
+                    if assertions.inspects_body:
+                        failures += await self._verify_content(resp, assertions, result)
+                        if "response_start" in trace_request_ctx:
+                            result.transfer = (
+                                _now() - trace_request_ctx["response_start"]
                             )
-                except aiohttp.ServerDisconnectedError as e:
-                    result.connected = True
-                    result.error = e.message
-                except (
-                    aiohttp.ClientConnectionError,
-                    aiohttp.ClientConnectorError,
-                    socket.gaierror,
-                ) as e:
-                    result.error = str(e)
-                except asyncio.CancelledError:
+                    if conditional:
+                        self._header_failures = header_failures
+                        self._validators = self._response_validators(resp)
+                failures += assertions.check_response_time(_now() - start)
+                result.failed_assertions = failures
+                result.content_verified = not failures
+        except aiohttp.ServerDisconnectedError as e:
+            result.connected = True
+            result.error = e.message
+            result.error_type = type(e).__name__
+        except (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientConnectorError,
+            socket.gaierror,
+        ) as e:
+            result.error = str(e)
+            result.error_type = type(e).__name__
+        except asyncio.TimeoutError:
+            result.error = f"Timed out after {self.timeout}s: {self.method} {self.url}"
+            result.error_type = "TimeoutError"
+        except aiohttp.ClientError as e:
+            # eg: truncated or malformed responses, too many redirects
+            result.error = str(e) or type(e).__name__
+            result.error_type = type(e).__name__
+        return result
+
+    @staticmethod
+    def _response_validators(resp: aiohttp.ClientResponse) -> Dict[str, str]:
+        validators = {}
+        if resp.status == 200:
+            if "ETag" in resp.headers:
+                validators["If-None-Match"] = resp.headers["ETag"]
+            if "Last-Modified" in resp.headers:
+                validators["If-Modified-Since"] = resp.headers["Last-Modified"]
+        return validators
+
+    async def _verify_content(
+        self,
+        resp: aiohttp.ClientResponse,
+        assertions: Assertions,
+        result: HTTPCheckResult,
+    ) -> List[str]:
+        """
+        Stream the response body and evaluate body assertions in a single scan,
+        stopping as soon as their outcome is known or `max_body_size` bytes have been
+        read (see `BodyScan`).
+
+        If `conditional` and `fingerprint_body` are set, the body is read in full (up
+        to `max_body_size`) to fingerprint it instead. When a fingerprint of the
+        previous body is available, the scan is deferred until the body is read, and
+        skipped if the fingerprints match.
+
+        :return: The body assertions that failed
+        """
+        scan = assertions.scan(resp.charset, self.match_window)
+        fingerprint = (
+            hashlib.blake2b(digest_size=16)
+            if self.conditional and self.fingerprint_body
+            else None
+        )
+        deferred: Optional[List[bytes]] = (
+            [] if fingerprint is not None and self._fingerprint is not None else None
+        )
+        while result.bytes_read < self.max_body_size:
+            chunk = await resp.content.read(
+                min(self.chunk_size, self.max_body_size - result.bytes_read)
+            )
+            final = not chunk
+            result.bytes_read += len(chunk)
+            if fingerprint is not None:
+                fingerprint.update(chunk)
+            if deferred is not None:
+                deferred.append(chunk)
+            elif not scan.complete:
+                scan.feed(chunk, final=final)
+                if scan.complete and fingerprint is None:
                     break
+            if final:
+                break
+        result.body_truncated = not resp.content.at_eof()
+
+        if fingerprint is None:
+            failures = scan.failures(result.body_truncated)
+        else:
+            # bodies larger than max_body_size cannot be fingerprinted
+            digest = None if result.body_truncated else fingerprint.digest()
+            if deferred is not None and digest is not None and digest == self._fingerprint:
+                failures = list(self._body_failures or [])
+                result.content_cached = True
+            else:
+                if deferred is not None:
+                    scan.feed(b"".join(deferred), final=True)
+                failures = scan.failures(result.body_truncated)
+            self._fingerprint = digest
+        if self.conditional:
+            self._body_failures = failures
+        return failures[:]
+
+    async def start(
+        self,
+        callback: Callable[[CheckResult], Coroutine],
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> None:
+        """
+        Start check and trigger a callback when a check result is available.
+
+        :param callback: Callback to trigger when a result is available
+        :param session: Shared session to use for requests. If not provided, a
+            session is created for this check and a new connection is established for
+            every request.
+        """
+        if session is None:
+            async with self._cold_session() as session:
+                await self._run(callback, session)
+        else:
+            await self._run(callback, session)
+
+    async def _run(
+        self,
+        callback: Callable[[CheckResult], Coroutine],
+        session: aiohttp.ClientSession,
+    ) -> None:
+        while True:
+            try:
+                result = await self.probe(session)
+            except asyncio.CancelledError:
+                break
 
-                logger.debug("Triggering callback for check (%s)", self.url)
-                await callback(result)
-                await asyncio.sleep(self.interval)
+            logger.debug("Triggering callback for check (%s)", self.url)
+            await callback(result)
+            await asyncio.sleep(self.interval)
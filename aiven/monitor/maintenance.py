@@ -0,0 +1,259 @@
+import logging
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from aiven.monitor.aggregate import ZERO_BUCKET, LatencySketch
+from aiven.service.postgres import PostgresManager
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_NAME = re.compile(r"^events_(\d{8})$")
+
+
+class Maintenance:
+    """
+    Periodic upkeep of the time partitioned `public.events` table (see migrations).
+
+    Daily partitions are created ahead of time. Once all events of a partition are
+    older than the raw retention period, they are rolled up into `raw_window` second
+    rollups and the partition is dropped, in a single transaction. Rollups older than
+    the rollup retention period are merged into `downsampled_window` second rollups.
+
+    Rollups of a window already written by checkers are kept as is, rolling up events
+    only fills windows that are missing, e.g. when checks ran without rollups.
+    Heartbeats (see `aiven.monitor.changes`) are not rolled up, only the rollups
+    computed from every result account for the results they summarise.
+    """
+
+    def __init__(
+        self,
+        postgres: PostgresManager,
+        partitions_ahead: int = 7,
+        retention: Optional[float] = 14.0,
+        rollup_retention: Optional[float] = 90.0,
+        raw_window: int = 60,
+        downsampled_window: int = 3600,
+    ):
+        """
+        :param partitions_ahead: number of days partitions are created in advance
+        :param retention: time (days) raw events are kept, None to keep them forever
+        :param rollup_retention: time (days) `raw_window` rollups are kept before being
+            merged into `downsampled_window` rollups, None to never merge them
+        :param raw_window: duration (seconds) of the windows events are rolled into
+        :param downsampled_window: duration (seconds) of the windows old rollups are
+            merged into, a multiple of `raw_window`
+        """
+        if partitions_ahead < 0:
+            raise ValueError(f"Invalid number of partitions: {partitions_ahead}")
+        if raw_window <= 0 or downsampled_window % raw_window:
+            raise ValueError("Downsampled windows must be a multiple of raw windows")
+        self.postgres = postgres
+        self.partitions_ahead = partitions_ahead
+        self.retention = retention
+        self.rollup_retention = rollup_retention
+        self.raw_window = raw_window
+        self.downsampled_window = downsampled_window
+
+    @staticmethod
+    def _today() -> date:
+        return datetime.now(tz=timezone.utc).date()
+
+    async def create_partitions(self, since: Optional[date] = None) -> List[str]:
+        """
+        Create the missing daily partitions from `since` (today by default) up to
+        `partitions_ahead` days from now.
+
+        :return: The names of the partitions created
+        """
+        today = self._today()
+        rows = await self.postgres.execute(
+            "SELECT public.create_events_partitions($1, $2) AS name",
+            since or today,
+            today + timedelta(days=self.partitions_ahead),
+        )
+        if rows is None:
+            raise RuntimeError("Failed to create events partitions")
+        created = [row["name"] for row in rows]
+        if created:
+            logger.info("Created %d partition(s): %s", len(created), created)
+        return created
+
+    async def partitions(self) -> List[Tuple[str, date]]:
+        """
+        :return: The daily partitions of the events table, by day, oldest first
+        """
+        rows = await self.postgres.execute(
+            """
+            SELECT c.relname AS name FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'public.events'::REGCLASS
+            """
+        )
+        if rows is None:
+            raise RuntimeError("Failed to list events partitions")
+        partitions = []
+        for row in rows:
+            match = _PARTITION_NAME.match(row["name"])
+            if match:
+                partitions.append(
+                    (row["name"], datetime.strptime(match.group(1), "%Y%m%d").date())
+                )
+        return sorted(partitions, key=lambda p: p[1])
+
+    async def drop_expired_partitions(self) -> List[str]:
+        """
+        Roll up the events of the partitions older than the retention period into
+        rollups, and drop the partitions.
+
+        :return: The names of the partitions dropped
+        """
+        if self.retention is None:
+            return []
+        horizon = datetime.now(tz=timezone.utc) - timedelta(days=self.retention)
+        sketch = LatencySketch()
+
+        dropped = []
+        for name, day in await self.partitions():
+            start = datetime.combine(day, time(), tzinfo=timezone.utc)
+            end = start + timedelta(days=1)
+            if end > horizon:
+                break
+
+            done = False
+            async with self.postgres.connection() as connection:
+                async with connection.transaction():
+                    status = await connection.execute(
+                        """
+                        WITH e AS (
+                            SELECT check_id,
+                                to_timestamp(
+                                    floor(extract(EPOCH FROM timestamp) / $3::INTEGER)
+                                        * $3::INTEGER
+                                ) AS window_start,
+                                failed, error_kind, latency
+                            FROM public.event_outcomes
+                            WHERE timestamp >= $1::TIMESTAMPTZ
+                                AND timestamp < $2::TIMESTAMPTZ
+                                AND check_id IS NOT NULL
+                        ), buckets AS (
+                            SELECT check_id, window_start,
+                                CASE WHEN latency > $5::FLOAT8
+                                    THEN ceil(ln(latency) / $4::FLOAT8)::INTEGER
+                                    ELSE $6::INTEGER
+                                END AS bucket,
+                                count(*) AS n
+                            FROM e WHERE latency IS NOT NULL
+                            GROUP BY 1, 2, 3
+                        ), sketches AS (
+                            SELECT check_id, window_start,
+                                jsonb_object_agg(bucket::TEXT, n) AS sketch
+                            FROM buckets GROUP BY 1, 2
+                        ), kinds AS (
+                            SELECT check_id, window_start,
+                                jsonb_object_agg(error_kind, n) AS error_kinds
+                            FROM (
+                                SELECT check_id, window_start, error_kind, count(*) AS n
+                                FROM e WHERE failed
+                                GROUP BY 1, 2, 3
+                            ) k
+                            GROUP BY 1, 2
+                        )
+                        INSERT INTO public.rollups (
+                            check_id, window_start, window_seconds, count, errors,
+                            latency_sum, latency_min, latency_max, sketch, error_kinds
+                        )
+                            SELECT e.check_id, e.window_start, $3::INTEGER, count(*),
+                                count(*) FILTER (WHERE failed),
+                                COALESCE(sum(latency), 0), min(latency), max(latency),
+                                COALESCE(s.sketch, '{}'::JSONB),
+                                COALESCE(k.error_kinds, '{}'::JSONB)
+                            FROM e
+                                LEFT JOIN sketches s USING (check_id, window_start)
+                                LEFT JOIN kinds k USING (check_id, window_start)
+                            GROUP BY e.check_id, e.window_start, s.sketch, k.error_kinds
+                        ON CONFLICT (check_id, window_seconds, window_start) DO NOTHING
+                        """,
+                        start,
+                        end,
+                        self.raw_window,
+                        sketch._log_gamma,
+                        sketch.min_value,
+                        ZERO_BUCKET,
+                    )
+                    await connection.execute(f'DROP TABLE public."{name}"')
+                    done = True
+            if not done:
+                raise RuntimeError(f"Failed to roll up and drop partition {name}")
+            logger.info("Dropped partition %s, rolled up (%s)", name, status)
+            dropped.append(name)
+        return dropped
+
+    async def downsample_rollups(self) -> Optional[str]:
+        """
+        Merge `raw_window` rollups older than the rollup retention period into
+        `downsampled_window` rollups.
+
+        :return: The status of the merge, None if there is nothing to merge
+        """
+        if self.rollup_retention is None:
+            return None
+        horizon = datetime.now(tz=timezone.utc) - timedelta(days=self.rollup_retention)
+        # whole downsampled windows only, so that they are merged in a single pass
+        horizon = datetime.fromtimestamp(
+            horizon.timestamp() // self.downsampled_window * self.downsampled_window,
+            tz=timezone.utc,
+        )
+        rows = await self.postgres.execute(
+            """
+            WITH moved AS (
+                DELETE FROM public.rollups
+                    WHERE window_seconds = $1::INTEGER AND window_start < $3::TIMESTAMPTZ
+                RETURNING *
+            ), merged AS (
+                INSERT INTO public.rollups AS r (
+                    check_id, window_start, window_seconds, count, errors,
+                    latency_sum, latency_min, latency_max, sketch, error_kinds
+                )
+                    SELECT check_id,
+                        to_timestamp(
+                            floor(extract(EPOCH FROM window_start) / $2::INTEGER)
+                                * $2::INTEGER
+                        ),
+                        $2::INTEGER, sum(count), sum(errors), sum(latency_sum),
+                        min(latency_min), max(latency_max),
+                        public.merge_counts_agg(sketch),
+                        public.merge_counts_agg(error_kinds)
+                    FROM moved GROUP BY 1, 2
+                ON CONFLICT (check_id, window_seconds, window_start) DO UPDATE SET
+                    count = r.count + EXCLUDED.count,
+                    errors = r.errors + EXCLUDED.errors,
+                    latency_sum = r.latency_sum + EXCLUDED.latency_sum,
+                    latency_min = LEAST(r.latency_min, EXCLUDED.latency_min),
+                    latency_max = GREATEST(r.latency_max, EXCLUDED.latency_max),
+                    sketch = public.merge_counts(r.sketch, EXCLUDED.sketch),
+                    error_kinds = public.merge_counts(r.error_kinds, EXCLUDED.error_kinds)
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM moved) AS moved,
+                (SELECT count(*) FROM merged) AS merged
+            """,
+            self.raw_window,
+            self.downsampled_window,
+            horizon,
+        )
+        if rows is None:
+            raise RuntimeError("Failed to downsample rollups")
+        if not rows[0]["moved"]:
+            return None
+        status = f"merged {rows[0]['moved']} rollup(s) into {rows[0]['merged']}"
+        logger.info("Downsampled rollups older than %s, %s", horizon, status)
+        return status
+
+    async def run(self) -> None:
+        """
+        Run all maintenance tasks once.
+        """
+        await self.create_partitions()
+        await self.drop_expired_partitions()
+        await self.downsample_rollups()
@@ -1,89 +1,730 @@
+import asyncio
 import functools
 import logging
+import time
+from contextlib import AsyncExitStack
 from dataclasses import asdict
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import ujson
-from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer, ConsumerRecord
 
 from aiven.monitor import Check, CheckResult
+from aiven.monitor.adaptive import AdaptiveInterval
+from aiven.monitor.aggregate import Aggregator, Rollup
+from aiven.monitor.changes import ChangeFilter
+from aiven.monitor import metrics
+from aiven.monitor.codec import encode_event
+from aiven.monitor.events import EventRecord, EventWriter, decode_event_record
+from aiven.monitor.pipeline import PartitionedConsumer
+from aiven.monitor.scheduler import Scheduler
+from aiven.monitor.spool import Spool
+from aiven.service.dns import CachingResolver, shared_resolver
+from aiven.service.http import HTTPManager
 from aiven.service.kafka import KafkaManager
 from aiven.service.postgres import PostgresManager
+from aiven.service.ratelimit import HostRateLimiter
 
 logger = logging.getLogger(__name__)
 
+# kinds of spooled records, see `Spool`
+SPOOL_EVENT = 0
+SPOOL_ROLLUP = 1
+
 
 class CheckManager:
     def __init__(
         self,
         kafka: Optional[KafkaManager] = None,
         postgres: Optional[PostgresManager] = None,
+        http: Optional[HTTPManager] = None,
+        scheduler: Optional[Scheduler] = None,
         topic: str = "check.events",
+        sink_batch_size: int = 500,
+        sink_batch_timeout: int = 250,
+        sink_max_pending: int = 4,
+        event_format: str = "json",
+        rollup_topic: str = "check.rollups",
+        rollup_window: Optional[int] = 60,
+        spool: Optional[Spool] = None,
+        spool_flush_timeout: float = 5.0,
+        publish_mode: str = "all",
+        heartbeat_interval: float = 300.0,
+        latency_includes_dns: bool = True,
+        adaptive: Optional[AdaptiveInterval] = None,
+        rate_limiter: Optional[HostRateLimiter] = None,
     ):
+        """
+        :param http: http manager providing a shared session for http checks; if not
+            provided, each http check uses its own cold connections
+        :param scheduler: scheduler used to drive checks
+        :param sink_batch_size: maximum number of events written to the database at once
+        :param sink_batch_timeout: maximum time (ms) an event is buffered before writing
+        :param sink_max_pending: maximum number of fetches buffered per partition
+            before the partition is paused
+        :param event_format: format used to publish events (json or binary), events of
+            either format are consumed regardless of this setting
+        :param rollup_window: size (seconds) of the windows results are aggregated
+            over before being published to `rollup_topic`, None to disable rollups
+        :param spool: local spool events are appended to before being delivered to
+            kafka in the background, so that checks are not held up by a slow or
+            unavailable broker; if not provided, events are sent directly
+        :param spool_flush_timeout: maximum time (seconds) spent delivering spooled
+            events on close, any remaining events are delivered on the next start
+        :param publish_mode: publish every result (all) or only results whose state
+            changed (changes), folding the others into periodic heartbeats; rollups
+            are computed from every result regardless
+        :param heartbeat_interval: maximum time (seconds) between two events of a
+            check whose state does not change, when publishing changes only
+        :param latency_includes_dns: count time spent resolving host names in the
+            latencies aggregated in rollups; it is reported separately in events
+        :param adaptive: policy adapting the interval of each check to its results,
+            if not provided checks are probed at their configured interval
+        :param rate_limiter: limiter of the rate of requests of http checks to each
+            host, shared by all checks of this manager
+        """
         self.kafka = kafka or KafkaManager()
         self.postgres = postgres or PostgresManager()
+        self.events = EventWriter(self.postgres)
+        self.http = http
+        self.scheduler = scheduler or Scheduler()
         self.topic = topic
+        self.sink_batch_size = sink_batch_size
+        self.sink_batch_timeout = sink_batch_timeout
+        self.sink_max_pending = sink_max_pending
+        if event_format not in ("json", "binary"):
+            raise ValueError(f"Unsupported event format: {event_format}")
+        self.event_format = event_format
+        self.rollup_topic = rollup_topic
+        self.rollup_window = rollup_window
+        self.aggregator = (
+            Aggregator(rollup_window, include_dns=latency_includes_dns)
+            if rollup_window
+            else None
+        )
+        self._rollup_job: Optional[int] = None
+        if publish_mode not in ("all", "changes"):
+            raise ValueError(f"Unsupported publish mode: {publish_mode}")
+        self.publish_mode = publish_mode
+        self.changes = (
+            ChangeFilter(heartbeat_interval) if publish_mode == "changes" else None
+        )
+        self.adaptive = adaptive
+        self.rate_limiter = rate_limiter
+        self.spool = spool
+        self.spool_flush_timeout = spool_flush_timeout
+        self._spool_task: Optional[asyncio.Task] = None
+        self._spool_ready = asyncio.Event()
+        self._producer: Optional[AIOKafkaProducer] = None
+        self._producer_lock = asyncio.Lock()
+        self._exit_stack = AsyncExitStack()
+        self._checks: Dict[int, Check] = {}
+        self._jobs: Dict[int, int] = {}
+        # delay reserved for the next run of each throttled check, see `_throttle`
+        self._throttled: Dict[int, float] = {}
+        self._consumers: List[PartitionedConsumer] = []
+
+    async def __aenter__(self) -> "CheckManager":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    async def producer(self) -> AIOKafkaProducer:
+        """
+        Retrieve the producer shared by all checks run by this manager, starting it
+        if required. The producer is flushed and stopped when the manager is closed.
+        """
+        if self._producer is None:
+            async with self._producer_lock:
+                if self._producer is None:
+                    self._producer = await self._exit_stack.enter_async_context(
+                        self.kafka.producer()
+                    )
+        return self._producer
+
+    async def close(self) -> None:
+        """
+        Flush any pending events and release resources held by this manager.
+        """
+        logger.debug("Closing checks manager")
+        await self.scheduler.close()
+        for check in self._checks.values():
+            await check.close()
+        self._checks = {}
+        self._jobs = {}
+        self._throttled = {}
+        self._rollup_job = None
+        if self.changes is not None:
+            try:
+                for check_id, heartbeat in self.changes.flush():
+                    await self._send_event(check_id, heartbeat)
+            except Exception as e:
+                logger.warning("Failed to publish pending heartbeats: %s", e)
+        try:
+            await self.publish_rollups(final=True)
+        except Exception as e:
+            logger.warning("Failed to publish pending rollups: %s", e)
+        if self.spool is not None:
+            await self._close_spool()
+        try:
+            await self._exit_stack.aclose()
+        finally:
+            self._producer = None
+            if self.http is not None:
+                await self.http.close()
+            await self.postgres.close()
+
+    @staticmethod
+    def _on_publish_done(check_id: int, future: asyncio.Future) -> None:
+        metrics.PRODUCER_PENDING.dec()
+        if not future.cancelled() and future.exception() is not None:
+            metrics.PUBLISH_ERRORS.inc()
+            logger.error(
+                "Failed to publish event for check=%d: %s", check_id, future.exception()
+            )
 
     async def publish_event(self, check_id: int, result: CheckResult) -> None:
         """
-        Publish a check event/result.
+        Publish a check event/result. Events are keyed by check id and enqueued on the
+        shared producer; delivery happens in batches as configured on `KafkaManager`.
+        If a spool is configured, events are appended to the spool instead and
+        delivered in the background, see `CheckManager.drain_spool`. When publishing
+        changes only, the result may be folded into a later heartbeat instead.
 
         :param check_id: check id corresponding to config in database
         :param result: check result object to publish
         :return:
         """
+        if self.changes is None:
+            await self._send_event(check_id, result)
+        else:
+            published = self.changes.observe(check_id, result)
+            if not published:
+                logger.debug("Folding unchanged result for check=%d", check_id)
+            for event in published:
+                await self._send_event(check_id, event)
+        if self.aggregator is not None:
+            self.aggregator.record(check_id, result)
+
+    async def _send_event(self, check_id: int, result: CheckResult) -> None:
         logger.info("Publishing event for check=%d", check_id)
-        async with self.kafka.producer() as producer:  # type: AIOKafkaProducer
-            value = {"check_id": check_id, "result": asdict(result)}
-            await producer.send(
-                topic=self.topic, value=ujson.dumps(value).encode("utf-8")
+        start = time.perf_counter()
+        try:
+            value = encode_event(check_id, result, binary=self.event_format == "binary")
+            if self.spool is not None:
+                self.spool.append(check_id, value, SPOOL_EVENT)
+                self._start_spool_drain()
+                self._spool_ready.set()
+            else:
+                producer = await self.producer()
+                future = await producer.send(
+                    topic=self.topic, key=str(check_id).encode("utf-8"), value=value
+                )
+                metrics.PRODUCER_PENDING.inc()
+                future.add_done_callback(
+                    functools.partial(self._on_publish_done, check_id)
+                )
+        except Exception:
+            metrics.PUBLISH_ERRORS.inc()
+            raise
+        metrics.PUBLISH_LATENCY.observe(time.perf_counter() - start)
+
+    async def _deliver_spooled(self) -> int:
+        """
+        Deliver a batch of spooled events, committing the spool once every event of
+        the batch is acknowledged.
+
+        :return: The number of events delivered
+        """
+        records, cursor = self.spool.read(self.sink_batch_size)
+        if records:
+            producer = await self.producer()
+            metrics.PRODUCER_PENDING.inc(len(records))
+            try:
+                futures = [
+                    await producer.send(
+                        topic=self.rollup_topic if kind == SPOOL_ROLLUP else self.topic,
+                        key=str(check_id).encode("utf-8"),
+                        value=value,
+                    )
+                    for kind, check_id, value in records
+                ]
+                await asyncio.gather(*futures)
+            finally:
+                metrics.PRODUCER_PENDING.dec(len(records))
+            logger.debug("Delivered %d spooled event(s)", len(records))
+        self.spool.commit(cursor)
+        return len(records)
+
+    async def drain_spool(
+        self, retry_delay: float = 1.0, max_retry_delay: float = 30.0
+    ) -> None:
+        """
+        Deliver spooled events until cancelled. Delivery is retried with exponential
+        backoff while kafka is unavailable; events are delivered at least once.
+        """
+        delay = retry_delay
+        while True:
+            try:
+                delivered = await self._deliver_spooled()
+            except Exception as e:
+                logger.warning(
+                    "Failed to deliver spooled events, retrying in %.1fs: %s", delay, e
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_retry_delay)
+                continue
+
+            delay = retry_delay
+            if not delivered:
+                self._spool_ready.clear()
+                await self._spool_ready.wait()
+
+    def _start_spool_drain(self) -> None:
+        if self._spool_task is None:
+            self._spool_task = asyncio.ensure_future(self.drain_spool())
+
+    async def _close_spool(self) -> None:
+        if self._spool_task is not None:
+            self._spool_task.cancel()
+            await asyncio.gather(self._spool_task, return_exceptions=True)
+            self._spool_task = None
+
+        async def flush():
+            while await self._deliver_spooled():
+                pass
+
+        try:
+            await asyncio.wait_for(flush(), timeout=self.spool_flush_timeout)
+        except Exception as e:
+            logger.warning(
+                "Spooled events left undelivered, will retry on next start: %r", e
             )
+        self.spool.close()
 
-    async def consume_events(self) -> None:
+    def register_metrics(self, registry: Optional[metrics.Registry] = None) -> None:
         """
-        Consume events produced by any checks.
+        Register metrics exposing the state of this manager's scheduler, consumers
+        and connection pools. Values are only computed when metrics are collected.
+        """
+        stats = self.scheduler.stats
+        for name, documentation, metric_type, attribute in (
+            ("scheduler_jobs", "Scheduled jobs", metrics.Gauge, "jobs"),
+            ("probes_in_flight", "Probes in flight", metrics.Gauge, "in_flight"),
+            ("scheduler_ticks", "Scheduled ticks started", metrics.Counter, "ticks"),
+            ("scheduler_late_ticks", "Ticks started late", metrics.Counter, "late"),
+            ("scheduler_missed_ticks", "Ticks skipped", metrics.Counter, "missed"),
+            ("scheduler_errors", "Jobs that failed", metrics.Counter, "errors"),
+        ):
+            metric_type(
+                f"aiven_monitor_{name}",
+                documentation,
+                callback=functools.partial(getattr, stats, attribute),
+                registry=registry,
+            )
+
+        metrics.Gauge(
+            "aiven_monitor_consumer_lag",
+            "Records not yet written to the database per partition",
+            labelnames=("topic", "partition"),
+            callback=lambda: {
+                (tp.topic, str(tp.partition)): lag
+                for consumer in self._consumers
+                for tp, lag in consumer.lag().items()
+            },
+            registry=registry,
+        )
+
+        def pool_connections() -> Dict[Tuple[str, ...], int]:
+            pool = self.postgres.pool_stats()
+            return {
+                ("in_use",): pool["size"] - pool["idle"],
+                ("idle",): pool["idle"],
+                ("max",): pool["max"],
+            }
+
+        metrics.Gauge(
+            "aiven_monitor_postgres_pool_connections",
+            "Postgres pool connections by state",
+            labelnames=("state",),
+            callback=pool_connections,
+            registry=registry,
+        )
+
+        resolver = self.http.resolver if self.http else shared_resolver()
+        if isinstance(resolver, CachingResolver):
+            metrics.Counter(
+                "aiven_monitor_dns_lookups",
+                "Host name lookups answered from cache (hit), resolved (miss) or "
+                "waiting for a resolution in flight (coalesced)",
+                labelnames=("result",),
+                callback=lambda: {
+                    ("hit",): resolver.stats.hits,
+                    ("miss",): resolver.stats.misses,
+                    ("coalesced",): resolver.stats.coalesced,
+                },
+                registry=registry,
+            )
+            metrics.Counter(
+                "aiven_monitor_dns_refreshes",
+                "Cached hosts resolved again ahead of expiry",
+                callback=lambda: resolver.stats.refreshes,
+                registry=registry,
+            )
+            metrics.Counter(
+                "aiven_monitor_dns_errors",
+                "Host name resolutions that failed",
+                callback=lambda: resolver.stats.errors,
+                registry=registry,
+            )
+            metrics.Gauge(
+                "aiven_monitor_dns_cache_hosts",
+                "Hosts in the dns cache",
+                callback=lambda: resolver.size,
+                registry=registry,
+            )
+
+        limiter = self.rate_limiter
+        if limiter is not None:
+            metrics.Counter(
+                "aiven_monitor_rate_limited_requests",
+                "Requests delayed by the per host rate limit",
+                callback=lambda: limiter.stats.throttled,
+                registry=registry,
+            )
+            metrics.Counter(
+                "aiven_monitor_rate_limited_seconds",
+                "Time requests were delayed by the per host rate limit",
+                callback=lambda: limiter.stats.waited,
+                registry=registry,
+            )
+
+        if self.spool is not None:
+            metrics.Gauge(
+                "aiven_monitor_spool_bytes",
+                "Size of events spooled and not yet delivered",
+                callback=lambda: self.spool.size,
+                registry=registry,
+            )
+        self.postgres.on_query = metrics.observe_query
+
+    async def _write_events(self, records: List[EventRecord]) -> bool:
+        if await self.events.write(records) is None:
+            logger.error("Failed to write batch of %d event(s)", len(records))
+            return False
+        logger.info("Consumed %d event(s)", len(records))
+        return True
+
+    async def _consume(
+        self,
+        topic: str,
+        decode: Callable[[ConsumerRecord], Optional[Any]],
+        write: Callable[[List[Any]], Awaitable[bool]],
+    ) -> None:
+        """
+        Consume a topic with one pipeline per assigned partition, see
+        `aiven.monitor.pipeline.PartitionedConsumer`. Each pipeline writes decoded
+        records in batches of up to `sink_batch_size` records or every
+        `sink_batch_timeout` milliseconds, whichever comes first. Consumer offsets
+        are only committed once a batch has been written.
         """
         async with self.kafka.consumer(
-            self.topic
+            enable_auto_commit=False
         ) as consumer:  # type: AIOKafkaConsumer
-            async for msg in consumer:
-                value = ujson.loads(msg.value.decode("utf-8"))
-                check_id = value.get("check_id")
-                result = value.get("result")
-                timestamp = result.pop(
-                    "timestamp", datetime.now(tz=timezone.utc).timestamp()
+            pipelines = PartitionedConsumer(
+                consumer,
+                decode,
+                write,
+                batch_size=self.sink_batch_size,
+                batch_timeout=self.sink_batch_timeout / 1000,
+                max_pending=self.sink_max_pending,
+                commit_offsets=self.kafka.group_id is not None,
+            )
+            consumer.subscribe([topic], listener=pipelines)
+            self._consumers.append(pipelines)
+            try:
+                await pipelines.run()
+            finally:
+                self._consumers.remove(pipelines)
+
+    async def consume_events(self) -> None:
+        """
+        Consume events produced by any checks. Events are written to the database in
+        batches, see `CheckManager._consume`. Events redelivered after a failure are
+        only written once.
+        """
+        await self._consume(self.topic, decode_event_record, self._write_events)
+
+    @staticmethod
+    def _decode_rollup(msg: ConsumerRecord) -> Optional[Rollup]:
+        try:
+            return Rollup.from_dict(ujson.loads(msg.value.decode("utf-8")))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(
+                "Skipping malformed rollup topic=%s partition=%d offset=%d: %s",
+                msg.topic,
+                msg.partition,
+                msg.offset,
+                e,
+            )
+            return None
+
+    async def _write_rollups(self, rollups: List[Rollup]) -> bool:
+        # rows affected more than once by a single upsert are rejected, merge first
+        merged: Dict[Tuple[int, int, float], Rollup] = {}
+        for rollup in rollups:
+            key = (rollup.check_id, rollup.window, rollup.window_start)
+            if key in merged:
+                merged[key].merge(rollup)
+            else:
+                merged[key] = rollup
+
+        rows = list(merged.values())
+        status = await self.postgres.execute(
+            """
+                INSERT INTO public.rollups AS r (
+                    check_id, window_start, window_seconds, count, errors,
+                    latency_sum, latency_min, latency_max, sketch, error_kinds
                 )
-                logger.debug("Consumed message topic=%s value=%s", msg.topic, value)
-                row = await self.postgres.execute(
-                    """
-                        INSERT INTO public.events (timestamp, check_id, result)
-                            VALUES (to_timestamp($1), $2::INTEGER, $3::JSONB)
-                        RETURNING id
-                    """,
-                    timestamp,
-                    check_id,
-                    result,
+                    SELECT c, to_timestamp(w), s, n, e, ls, lmin, lmax, sk, ek
+                        FROM unnest(
+                            $1::INTEGER[], $2::FLOAT8[], $3::INTEGER[],
+                            $4::BIGINT[], $5::BIGINT[], $6::FLOAT8[],
+                            $7::FLOAT8[], $8::FLOAT8[], $9::JSONB[], $10::JSONB[]
+                        ) AS u(c, w, s, n, e, ls, lmin, lmax, sk, ek)
+                ON CONFLICT (check_id, window_seconds, window_start) DO UPDATE SET
+                    count = r.count + EXCLUDED.count,
+                    errors = r.errors + EXCLUDED.errors,
+                    latency_sum = r.latency_sum + EXCLUDED.latency_sum,
+                    latency_min = LEAST(r.latency_min, EXCLUDED.latency_min),
+                    latency_max = GREATEST(r.latency_max, EXCLUDED.latency_max),
+                    sketch = public.merge_counts(r.sketch, EXCLUDED.sketch),
+                    error_kinds = public.merge_counts(r.error_kinds, EXCLUDED.error_kinds)
+            """,
+            [r.check_id for r in rows],
+            [r.window_start for r in rows],
+            [r.window for r in rows],
+            [r.count for r in rows],
+            [r.errors for r in rows],
+            [r.latency_sum for r in rows],
+            [r.latency_min for r in rows],
+            [r.latency_max for r in rows],
+            [r.sketch.to_dict() for r in rows],
+            [r.error_kinds for r in rows],
+        )
+        if status is None:
+            logger.error("Failed to write batch of %d rollup(s)", len(rows))
+            return False
+        logger.info("Consumed %d rollup(s)", len(rows))
+        return True
+
+    async def consume_rollups(self) -> None:
+        """
+        Consume rollups published by any checks managers, merging them into the
+        `public.rollups` table.
+        """
+        await self._consume(self.rollup_topic, self._decode_rollup, self._write_rollups)
+
+    async def publish_rollups(self, final: bool = False) -> None:
+        """
+        Publish rollups of completed windows, or of all windows if `final` is set. If a
+        spool is configured, rollups are spooled along with events.
+        """
+        if self.aggregator is None:
+            return
+
+        now = None if final else datetime.now(tz=timezone.utc).timestamp()
+        rollups = self.aggregator.flush(now)
+        if not rollups:
+            return
+
+        logger.info("Publishing %d rollup(s)", len(rollups))
+        if self.spool is not None:
+            for rollup in rollups:
+                self.spool.append(
+                    rollup.check_id,
+                    ujson.dumps(rollup.to_dict()).encode("utf-8"),
+                    SPOOL_ROLLUP,
                 )
-                logger.info("Consumed event: %s", row[0]["id"])
+            self._start_spool_drain()
+            self._spool_ready.set()
+            return
 
-    async def monitor(self, check_type: str, check: Check) -> None:
+        producer = await self.producer()
+        for rollup in rollups:
+            await producer.send(
+                topic=self.rollup_topic,
+                key=str(rollup.check_id).encode("utf-8"),
+                value=ujson.dumps(rollup.to_dict()).encode("utf-8"),
+            )
+
+    def _throttle(self, check_id: int, host: str) -> float:
+        delay = self.rate_limiter.reserve(host)
+        self._throttled[check_id] = delay
+        return delay
+
+    async def _tick(self, check_id: int, check: Check, kwargs: Dict) -> None:
+        result = await check.probe(**kwargs)
+        throttled = self._throttled.pop(check_id, None)
+        if throttled is not None:
+            # http check results, the request was throttled by the scheduler
+            result.throttled = throttled
+        logger.debug("Triggering callback for check=%d", check_id)
+        await self.publish_event(check_id, result)
+        if self.adaptive is not None and check_id in self._jobs:
+            interval = self.adaptive.observe(check_id, check.interval, result)
+            self.scheduler.reschedule(self._jobs[check_id], interval)
+
+    async def register(self, check_type: str, checks: List[Check]) -> List[int]:
         """
-        Method to persist a check configuration, retrieve id and start check loop.
+        Persist check configurations in bulk, reusing the ids of any identical
+        configurations already persisted.
 
         :param check_type: The check type to use when inserting to the configuration database
-        :param check: A check instance implementing `aiven.monitor.Check.start` method.
+        :param checks: Checks to register
+        :return: The check ids, in the same order as the checks provided
         """
-        row = await self.postgres.execute(
+        if not checks:
+            return []
+
+        rows = await self.postgres.execute(
             """
-                INSERT INTO public.checks (type, config)
-                    VALUES ($1::TEXT, $2::JSONB)
-                RETURNING id
+                WITH input AS (
+                    SELECT u.idx, u.config, md5(u.config::TEXT) AS config_hash
+                        FROM unnest($2::JSONB[]) WITH ORDINALITY AS u(config, idx)
+                ), registered AS (
+                    -- updating existing rows makes them part of the returned rows,
+                    -- including rows inserted concurrently by another process (eg:
+                    -- nodes of a cluster starting at once) that are not visible to
+                    -- this statement's snapshot
+                    INSERT INTO public.checks (type, config, config_hash)
+                        SELECT DISTINCT ON (config_hash) $1::TEXT, config, config_hash
+                            FROM input
+                    ON CONFLICT (type, config_hash)
+                        DO UPDATE SET config_hash = EXCLUDED.config_hash
+                    RETURNING id, config_hash
+                )
+                SELECT input.idx, registered.id
+                    FROM input
+                    LEFT JOIN registered USING (config_hash)
+                ORDER BY input.idx
             """,
             check_type,
-            asdict(check),
+            [asdict(check) for check in checks],
+        )
+        if (
+            rows is None
+            or len(rows) != len(checks)
+            or any(row["id"] is None for row in rows)
+        ):
+            raise RuntimeError(
+                f"Failed to register {len(checks)} {check_type} check(s)"
+            )
+        logger.info("Registered %d %s check(s)", len(rows), check_type)
+        return [row["id"] for row in rows]
+
+    async def monitor_many(self, check_type: str, checks: List[Check]) -> List[int]:
+        """
+        Method to persist check configurations in bulk and schedule the checks with
+        the manager's scheduler. The scheduler is started if not already running.
+
+        :param check_type: The check type to use when inserting to the configuration database
+        :param checks: Check instances implementing `aiven.monitor.Check.probe` method.
+        :return: The check ids, in the same order as the checks provided
+        """
+        check_ids = await self.register(check_type, checks)
+        await self.schedule_many(check_type, check_ids, checks)
+        return check_ids
+
+    async def schedule_many(
+        self,
+        check_type: str,
+        check_ids: List[int],
+        checks: List[Check],
+        delays: Optional[List[float]] = None,
+    ) -> None:
+        """
+        Schedule registered checks with the manager's scheduler, starting it if not
+        already running. Checks already scheduled are skipped.
+
+        :param check_type: The check type the checks were registered with
+        :param check_ids: The ids the checks were registered with
+        :param checks: Check instances, in the same order as `check_ids`
+        :param delays: Delays (seconds) before the first run of each check, see
+            `Scheduler.schedule`
+        """
+        kwargs = {}
+        if check_type == "http" and self.http is not None:
+            kwargs["session"] = await self.http.session()
+        # requests are throttled before a probe is started, so that probes waiting for
+        # their turn do not hold slots of the scheduler
+        throttled = (
+            check_type == "http"
+            and self.rate_limiter is not None
+            and self.rate_limiter.enabled
         )
-        check_id = row[0]["id"]
 
-        # TODO: Fix typehints to support partial
-        await check.start(callback=functools.partial(self.publish_event, check_id))
+        for index, (check_id, check) in enumerate(zip(check_ids, checks)):
+            if check_id in self._jobs:
+                logger.warning("Check=%d is already scheduled, skipping", check_id)
+                continue
+            self._checks[check_id] = check
+            self._jobs[check_id] = self.scheduler.schedule(
+                functools.partial(self._tick, check_id, check, kwargs),
+                interval=check.interval,
+                delay=delays[index] if delays is not None else None,
+                throttle=(
+                    functools.partial(self._throttle, check_id, check.host)
+                    if throttled
+                    else None
+                ),
+            )
+
+        if self.aggregator is not None and self._rollup_job is None:
+            self._rollup_job = self.scheduler.schedule(
+                self.publish_rollups, interval=min(self.rollup_window, 10)
+            )
+        if self.spool is not None:
+            # deliver events left over from a previous run
+            self._start_spool_drain()
+        self.scheduler.start()
+
+    async def unschedule_many(
+        self, check_ids: List[int], dues: Optional[Dict[int, float]] = None
+    ) -> None:
+        """
+        Stop scheduling checks, waiting for runs already in flight to complete.
+
+        :param check_ids: The ids of the checks to stop
+        :param dues: Time (loop time) by check id, runs of a check due before it are
+            started and none due from then on are, see `Scheduler.cancel_from`
+        """
+        if dues is not None:
+            await self.scheduler.cancel_from(
+                {self._jobs[c]: dues[c] for c in check_ids if c in self._jobs}
+            )
+        job_ids = [self._jobs.pop(c) for c in check_ids if c in self._jobs]
+        for job_id in job_ids:
+            self.scheduler.cancel(job_id)
+        await asyncio.gather(*(self.scheduler.wait(job_id) for job_id in job_ids))
+        for check_id in check_ids:
+            self._throttled.pop(check_id, None)
+            if self.adaptive is not None:
+                self.adaptive.forget(check_id)
+            check = self._checks.pop(check_id, None)
+            if check is not None:
+                await check.close()
+
+    async def monitor(self, check_type: str, check: Check) -> int:
+        """
+        Method to persist a check configuration, retrieve id and schedule the check
+        with the manager's scheduler. See `CheckManager.monitor_many`.
+
+        :param check_type: The check type to use when inserting to the configuration database
+        :param check: A check instance implementing `aiven.monitor.Check.probe` method.
+        :return: The check id
+        """
+        return (await self.monitor_many(check_type, [check]))[0]
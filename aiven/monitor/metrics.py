@@ -0,0 +1,305 @@
+import asyncio
+import bisect
+import logging
+import math
+from contextlib import asynccontextmanager
+from typing import (
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+Labels = Tuple[str, ...]
+Samples = Union[float, Dict[Labels, float]]
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Labels, **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metric:
+    """
+    Base class of all metrics. Samples are either recorded by the instrumented code
+    or, if a `callback` is provided, computed when the metric is collected so that
+    values already maintained elsewhere add no overhead to hot paths.
+    """
+
+    type = "unknown"
+    suffix = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Samples]] = None,
+        registry: Optional["Registry"] = None,
+    ):
+        """
+        :param labelnames: names of the labels values are recorded with
+        :param callback: function returning the current value, or a mapping of label
+            values to value for labelled metrics
+        :param registry: registry to register this metric with, defaults to `REGISTRY`
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: Dict[Labels, float] = {}
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _samples(self) -> Iterable[Tuple[Labels, float]]:
+        if self.callback is None:
+            return list(self._values.items())
+        value = self.callback()
+        if isinstance(value, dict):
+            return value.items()
+        return [((), value)]
+
+    def _header(self) -> List[str]:
+        return [
+            f"# TYPE {self.name} {self.type}",
+            f"# HELP {self.name} {self.documentation}",
+        ]
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self._samples():
+            lines.append(
+                f"{self.name}{self.suffix}{_format_labels(self.labelnames, labels)} "
+                f"{_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+    suffix = "_total"
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self._values[labels] = value
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, labels: Labels = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed buckets. Observing a value costs a binary search over the
+    bucket bounds and two additions; cumulative counts are only computed on render.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: Optional["Registry"] = None,
+    ):
+        super().__init__(name, documentation, labelnames, registry=registry)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, counts in list(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                label_text = _format_labels(
+                    self.labelnames, labels, le=_format_value(float(bound))
+                )
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{label_text} {_format_value(self._sums[labels])}"
+            )
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        """
+        Register a metric, replacing any metric previously registered with the same
+        name.
+        """
+        self._metrics[metric.name] = metric
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning("Failed to collect metric %s: %s", metric.name, e)
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SCHEDULER_LAG = Histogram(
+    "aiven_monitor_scheduler_tick_lag_seconds",
+    "Delay between the due time of a scheduled tick and the start of its job",
+)
+PUBLISH_LATENCY = Histogram(
+    "aiven_monitor_publish_latency_seconds",
+    "Time taken to enqueue a check event for delivery",
+)
+PUBLISH_ERRORS = Counter(
+    "aiven_monitor_publish_errors",
+    "Check events that could not be published",
+)
+PRODUCER_PENDING = Gauge(
+    "aiven_monitor_producer_pending_events",
+    "Check events sent to the producer and not yet acknowledged",
+)
+SINK_BATCH_SIZE = Histogram(
+    "aiven_monitor_sink_batch_size",
+    "Number of records written to the database per batch",
+    labelnames=("topic",),
+    buckets=SIZE_BUCKETS,
+)
+POSTGRES_QUERY_LATENCY = Histogram(
+    "aiven_monitor_postgres_query_seconds",
+    "Duration of postgres queries, including waiting for a pooled connection",
+    labelnames=("operation", "status"),
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "aiven_monitor_event_loop_blocked_seconds",
+    "Cumulative time the event loop was blocked beyond the monitoring interval",
+)
+EVENT_LOOP_LAG = Histogram(
+    "aiven_monitor_event_loop_lag_seconds",
+    "Delay in waking up a task sleeping on the event loop",
+)
+
+
+def observe_query(operation: str, duration: float, ok: bool) -> None:
+    """
+    Record a postgres query, suitable as `PostgresManager.on_query`.
+    """
+    POSTGRES_QUERY_LATENCY.observe(duration, (operation, "ok" if ok else "error"))
+
+
+async def monitor_event_loop(interval: float = 0.1) -> None:
+    """
+    Measure how late the event loop wakes up a sleeping task until cancelled; any
+    delay is time the loop spent running callbacks without yielding.
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - start - interval, 0.0)
+        EVENT_LOOP_LAG.observe(lag)
+        if lag > 0.0:
+            EVENT_LOOP_BLOCKED.inc(lag)
+
+
+@asynccontextmanager
+async def serve(
+    host: str = "0.0.0.0", port: int = 9100, registry: Optional[Registry] = None
+) -> AsyncGenerator[web.AppRunner, None]:
+    """
+    Serve metrics in the OpenMetrics text format at `/metrics` and monitor event loop
+    blocking for as long as the context is active.
+    """
+    registry = REGISTRY if registry is None else registry
+
+    async def handle(_: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode("utf-8"),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    task = asyncio.ensure_future(monitor_event_loop())
+    try:
+        await web.TCPSite(runner, host, port).start()
+        logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+        yield runner
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await runner.cleanup()
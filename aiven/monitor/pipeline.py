@@ -0,0 +1,219 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener, ConsumerRecord
+from aiokafka.structs import TopicPartition
+
+from aiven.monitor.metrics import SINK_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionPipeline:
+    """
+    Sequentially decodes and writes batches of records fetched from a single
+    partition, so records of a partition are written in order.
+    """
+
+    def __init__(
+        self,
+        tp: TopicPartition,
+        decode: Callable[[ConsumerRecord], Optional[Any]],
+        write: Callable[[List[Any]], Awaitable[bool]],
+        batch_size: int,
+        batch_timeout: float,
+        max_pending: int,
+    ):
+        self.tp = tp
+        self.decode = decode
+        self.write = write
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.committable: Optional[int] = None
+        self.committed: Optional[int] = None
+        self.task = asyncio.ensure_future(self.run())
+        self.task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Pipeline for %s failed: %s", self.tp, task.exception())
+
+    async def run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            fetches = [await self.queue.get()]
+            deadline = loop.time() + self.batch_timeout
+            size = len(fetches[0])
+            while size < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    fetches.append(
+                        await asyncio.wait_for(self.queue.get(), timeout=remaining)
+                    )
+                except asyncio.TimeoutError:
+                    break
+                size += len(fetches[-1])
+
+            batch = []
+            for records in fetches:
+                for msg in records:
+                    record = self.decode(msg)
+                    if record is not None:
+                        batch.append(record)
+            SINK_BATCH_SIZE.observe(len(batch), (self.tp.topic,))
+
+            while batch and not await self.write(batch):
+                # retain batch and retry, the queue applies backpressure meanwhile
+                await asyncio.sleep(self.batch_timeout)
+
+            self.committable = fetches[-1][-1].offset + 1
+            for _ in fetches:
+                self.queue.task_done()
+
+
+class PartitionedConsumer(ConsumerRebalanceListener):
+    """
+    Consume with one pipeline per assigned partition. Each pipeline has a bounded
+    queue of pending fetches; partitions whose queue is full are paused until their
+    pipeline catches up. Offsets are committed per partition once written.
+    """
+
+    def __init__(
+        self,
+        consumer: AIOKafkaConsumer,
+        decode: Callable[[ConsumerRecord], Optional[Any]],
+        write: Callable[[List[Any]], Awaitable[bool]],
+        batch_size: int = 500,
+        batch_timeout: float = 0.25,
+        max_pending: int = 4,
+        commit_offsets: bool = True,
+        drain_timeout: float = 10.0,
+    ):
+        """
+        :param batch_size: maximum number of records written at once per partition
+        :param batch_timeout: maximum time (seconds) a record is buffered
+        :param max_pending: maximum number of fetches queued per partition
+        :param commit_offsets: commit offsets of written records, requires the
+            consumer to be part of a consumer group
+        :param drain_timeout: maximum time (seconds) spent writing the records
+            already fetched from revoked partitions; records not written by then are
+            left to the next owner of the partition. It must be shorter than the
+            rebalance timeout of the group
+        """
+        self.consumer = consumer
+        self.decode = decode
+        self.write = write
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.max_pending = max_pending
+        self.commit_offsets = commit_offsets
+        self.drain_timeout = drain_timeout
+        self.pipelines: Dict[TopicPartition, PartitionPipeline] = {}
+        self._paused: Set[TopicPartition] = set()
+
+    def _pipeline(self, tp: TopicPartition) -> PartitionPipeline:
+        pipeline = self.pipelines.get(tp)
+        if pipeline is None:
+            logger.debug("Starting pipeline for %s", tp)
+            pipeline = self.pipelines[tp] = PartitionPipeline(
+                tp,
+                self.decode,
+                self.write,
+                self.batch_size,
+                self.batch_timeout,
+                self.max_pending,
+            )
+        return pipeline
+
+    async def commit(self, pipelines: Optional[List[PartitionPipeline]] = None):
+        offsets = {}
+        for pipeline in pipelines or list(self.pipelines.values()):
+            if pipeline.committable is not None and (
+                pipeline.committable != pipeline.committed
+            ):
+                offsets[pipeline.tp] = pipeline.committable
+        if offsets:
+            if self.commit_offsets:
+                await self.consumer.commit(offsets)
+            for tp, offset in offsets.items():
+                self.pipelines[tp].committed = offset
+
+    async def on_partitions_revoked(self, revoked: Set[TopicPartition]) -> None:
+        pipelines = [self.pipelines[tp] for tp in revoked if tp in self.pipelines]
+        if not pipelines:
+            return
+
+        logger.info("Draining pipelines for revoked partitions: %s", revoked)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(p.queue.join() for p in pipelines)),
+                timeout=self.drain_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Pipelines for revoked partitions not drained within %.1fs, dropping "
+                "records not written yet: %s",
+                self.drain_timeout,
+                revoked,
+            )
+        # only offsets of batches written before the pipelines stopped are committed
+        for pipeline in pipelines:
+            pipeline.task.cancel()
+        await asyncio.gather(*(p.task for p in pipelines), return_exceptions=True)
+        await self.commit(pipelines)
+        for pipeline in pipelines:
+            del self.pipelines[pipeline.tp]
+            self._paused.discard(pipeline.tp)
+
+    async def on_partitions_assigned(self, assigned: Set[TopicPartition]) -> None:
+        logger.info("Assigned partitions: %s", assigned)
+
+    def lag(self) -> Dict[TopicPartition, int]:
+        """
+        Number of records in each assigned partition that have not been written yet,
+        based on the last known high watermark of the partition.
+        """
+        lag = {}
+        for tp, pipeline in list(self.pipelines.items()):
+            highwater = self.consumer.highwater(tp)
+            if highwater is not None and pipeline.committable is not None:
+                lag[tp] = max(highwater - pipeline.committable, 0)
+        return lag
+
+    def _apply_backpressure(self) -> None:
+        for tp, pipeline in self.pipelines.items():
+            if tp not in self._paused and pipeline.queue.full():
+                logger.debug("Pausing %s, %d fetch(es) pending", tp, self.max_pending)
+                self.consumer.pause(tp)
+                self._paused.add(tp)
+            elif tp in self._paused and pipeline.queue.qsize() <= self.max_pending // 2:
+                logger.debug("Resuming %s", tp)
+                self.consumer.resume(tp)
+                self._paused.discard(tp)
+
+    async def run(self) -> None:
+        try:
+            while True:
+                messages = await self.consumer.getmany(
+                    timeout_ms=int(self.batch_timeout * 1000),
+                    max_records=self.batch_size,
+                )
+                for tp, records in messages.items():
+                    if records:
+                        await self._pipeline(tp).queue.put(records)
+                self._apply_backpressure()
+                await self.commit()
+        finally:
+            try:
+                await self.commit()
+            except Exception as e:
+                logger.warning("Failed to commit offsets on shutdown: %s", e)
+            for pipeline in self.pipelines.values():
+                pipeline.task.cancel()
+            await asyncio.gather(
+                *(p.task for p in self.pipelines.values()), return_exceptions=True
+            )
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Dict, List, Optional, Tuple
+
+from aiokafka import AIOKafkaConsumer
+from aiokafka.structs import TopicPartition
+
+from aiven.monitor.events import EventRecord, EventWriter, decode_event_record
+from aiven.service.kafka import KafkaManager
+from aiven.service.postgres import PostgresManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplayProgress:
+    total: int = field(default=0)
+    read: int = field(default=0)
+    written: int = field(default=0)
+    duplicates: int = field(default=0)
+    malformed: int = field(default=0)
+    rejected: int = field(default=0)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        """
+        Records loaded (written, skipped as duplicates or rejected) per second.
+        """
+        elapsed = self.elapsed
+        loaded = self.written + self.duplicates + self.rejected
+        return loaded / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"read {self.read}/{self.total} record(s), wrote {self.written} event(s), "
+            f"skipped {self.duplicates} duplicate(s), {self.malformed} malformed and "
+            f"{self.rejected} rejected record(s) in {self.elapsed:.1f}s ({self.rate:.0f} rows/s)"
+        )
+
+
+class Replay:
+    """
+    Bulk load a range of events from a topic into `public.events`, e.g. to backfill
+    events missed while the sink was down, or to re-ingest events after a schema
+    change.
+
+    All partitions of the topic are read in parallel by a consumer outside of any
+    consumer group, with large fetches. Records are loaded in large batches by
+    concurrent writers, through binary COPY into a staging table. Events already
+    written, by the live consumer or a previous replay, are skipped based on their
+    partition and offset, so that replaying a range more than once is safe.
+    Partitions of days missing from the events table (e.g. dropped by
+    `aiven-monitor maintain`) are created as needed.
+    """
+
+    def __init__(
+        self,
+        kafka: KafkaManager,
+        postgres: PostgresManager,
+        topic: str = "check.events",
+        start_offset: Optional[int] = None,
+        end_offset: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch_size: int = 10000,
+        writers: Optional[int] = None,
+        fetch_max_bytes: int = 52428800,
+        progress_interval: float = 5.0,
+    ):
+        """
+        :param start_offset: offset to start from in every partition (inclusive)
+        :param end_offset: offset to stop at in every partition (exclusive)
+        :param since: replay records timestamped at or after this time, timezone aware
+        :param until: replay records timestamped before this time, timezone aware
+        :param batch_size: number of records written at once
+        :param writers: number of batches written concurrently, the size of the
+            postgres connection pool by default
+        :param fetch_max_bytes: maximum amount of data fetched at once from a broker
+        :param progress_interval: time (seconds) between two progress reports
+        """
+        if start_offset is not None and since is not None:
+            raise ValueError("A replay can start from either an offset or a time")
+        if end_offset is not None and until is not None:
+            raise ValueError("A replay can end at either an offset or a time")
+        if batch_size <= 0:
+            raise ValueError(f"Invalid batch size: {batch_size}")
+        self.kafka = kafka
+        self.postgres = postgres
+        self.events = EventWriter(postgres)
+        self.topic = topic
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        self.since = since
+        self.until = until
+        self.batch_size = batch_size
+        self.writers = writers or postgres.max_size
+        self.fetch_max_bytes = fetch_max_bytes
+        self.progress_interval = progress_interval
+        self.progress = ReplayProgress()
+
+    async def _offsets_for_time(
+        self,
+        consumer: AIOKafkaConsumer,
+        when: datetime,
+        end_offsets: Dict[TopicPartition, int],
+    ) -> Dict[TopicPartition, int]:
+        """
+        :return: The offset of the first record timestamped at or after `when` in
+            every partition, the end offset of partitions without any
+        """
+        timestamp = int(when.timestamp() * 1000)
+        found = await consumer.offsets_for_times({tp: timestamp for tp in end_offsets})
+        return {
+            tp: end_offsets[tp] if found.get(tp) is None else found[tp].offset
+            for tp in end_offsets
+        }
+
+    async def bounds(
+        self, consumer: AIOKafkaConsumer
+    ) -> Dict[TopicPartition, Tuple[int, int]]:
+        """
+        :return: The range of offsets to replay in every partition of the topic,
+            start inclusive and end exclusive
+        """
+        await consumer.topics()
+        partitions = consumer.partitions_for_topic(self.topic)
+        if not partitions:
+            raise RuntimeError(f"Unknown topic: {self.topic}")
+        tps = [TopicPartition(self.topic, p) for p in sorted(partitions)]
+        beginning = await consumer.beginning_offsets(tps)
+        end = await consumer.end_offsets(tps)
+
+        if self.since is not None:
+            starts = await self._offsets_for_time(consumer, self.since, end)
+        else:
+            starts = {tp: self.start_offset or 0 for tp in tps}
+        if self.until is not None:
+            ends = await self._offsets_for_time(consumer, self.until, end)
+        else:
+            ends = {
+                tp: end[tp] if self.end_offset is None else self.end_offset
+                for tp in tps
+            }
+
+        bounds = {}
+        for tp in tps:
+            start = min(max(starts[tp], beginning[tp]), end[tp])
+            bounds[tp] = (start, max(min(ends[tp], end[tp]), start))
+        return bounds
+
+    async def _write(self, queue: asyncio.Queue) -> None:
+        while True:
+            records = await queue.get()
+            try:
+                rejected = []
+                written = await self.events.write(records, rejected)
+                if written is None:
+                    raise RuntimeError(
+                        f"Failed to write batch of {len(records)} event(s)"
+                    )
+                self.progress.written += written
+                self.progress.rejected += len(rejected)
+                self.progress.duplicates += len(records) - written - len(rejected)
+            finally:
+                queue.task_done()
+
+    @staticmethod
+    async def _wait(awaitable: Awaitable, writers: List[asyncio.Future]) -> None:
+        """
+        Wait for `awaitable`, raising the error of any writer failing meanwhile.
+        """
+        future = asyncio.ensure_future(awaitable)
+        done, _ = await asyncio.wait(
+            [future, *writers], return_when=asyncio.FIRST_COMPLETED
+        )
+        if future not in done:
+            future.cancel()
+            for writer in done:
+                writer.result()
+        await future
+
+    def _report(self) -> None:
+        logger.info("Replay progress: %s", self.progress)
+
+    async def run(self) -> ReplayProgress:
+        """
+        Replay the configured range of records.
+
+        :return: The final progress of the replay
+        """
+        async with self.kafka.consumer(
+            group_id=None,
+            enable_auto_commit=False,
+            fetch_max_bytes=self.fetch_max_bytes,
+            max_partition_fetch_bytes=self.fetch_max_bytes,
+        ) as consumer:  # type: AIOKafkaConsumer
+            bounds = await self.bounds(consumer)
+            consumer.assign(list(bounds))
+            pending = set()
+            for tp, (start, end) in bounds.items():
+                if start < end:
+                    consumer.seek(tp, start)
+                    pending.add(tp)
+                else:
+                    consumer.pause(tp)
+            self.progress = ReplayProgress(
+                total=sum(end - start for start, end in bounds.values())
+            )
+            logger.info(
+                "Replaying %d record(s) of %s: %s",
+                self.progress.total,
+                self.topic,
+                {tp.partition: offsets for tp, offsets in bounds.items()},
+            )
+
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.writers)
+            writers = [
+                asyncio.ensure_future(self._write(queue)) for _ in range(self.writers)
+            ]
+            reported = time.perf_counter()
+            batch: List[EventRecord] = []
+            try:
+                while pending:
+                    fetched = await consumer.getmany(
+                        timeout_ms=1000, max_records=self.batch_size
+                    )
+                    for tp, records in fetched.items():
+                        end = bounds[tp][1]
+                        for msg in records:
+                            if msg.offset >= end:
+                                break
+                            self.progress.read += 1
+                            record = decode_event_record(msg)
+                            if record is None:
+                                self.progress.malformed += 1
+                            else:
+                                batch.append(record)
+                    # offsets may be missing (compaction, transaction markers), the
+                    # position tells whether the end of a range has been reached
+                    for tp in list(pending):
+                        if await consumer.position(tp) >= bounds[tp][1]:
+                            consumer.pause(tp)
+                            pending.discard(tp)
+
+                    while len(batch) >= self.batch_size or (batch and not pending):
+                        await self._wait(queue.put(batch[: self.batch_size]), writers)
+                        batch = batch[self.batch_size :]
+                    if time.perf_counter() - reported >= self.progress_interval:
+                        self._report()
+                        reported = time.perf_counter()
+                await self._wait(queue.join(), writers)
+            finally:
+                for writer in writers:
+                    writer.cancel()
+                await asyncio.gather(*writers, return_exceptions=True)
+        self._report()
+        return self.progress
@@ -0,0 +1,195 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence
+
+from aiven.monitor.aggregate import ZERO_BUCKET, LatencySketch
+from aiven.service.postgres import PostgresManager
+
+logger = logging.getLogger(__name__)
+
+# per check totals (part 0), latency sketch buckets (part 1) and error kinds (part 2),
+# ordered by check so that reports are built one check at a time
+_REPORT_QUERY = """
+WITH checks AS (
+    SELECT id, COALESCE(config ->> 'url', type) AS label FROM public.checks
+        WHERE $3::INTEGER[] IS NULL OR id = ANY($3::INTEGER[])
+), r AS (
+    SELECT r.check_id, r.window_start, r.window_seconds, r.count, r.errors,
+        r.latency_sum, r.latency_min, r.latency_max, r.sketch, r.error_kinds
+    FROM public.rollups r JOIN checks c ON c.id = r.check_id
+    WHERE r.window_start >= $1::TIMESTAMPTZ
+        AND r.window_start + r.window_seconds * INTERVAL '1 s' <= $2::TIMESTAMPTZ
+), spans AS (
+    SELECT check_id, min(window_start) AS covered_from,
+        max(window_start + window_seconds * INTERVAL '1 s') AS covered_to
+    FROM r GROUP BY 1
+), e AS (
+    SELECT c.id AS check_id, o.failed, o.error_kind, o.latency
+    FROM checks c
+        LEFT JOIN spans s ON s.check_id = c.id
+        CROSS JOIN LATERAL (
+            SELECT failed, error_kind, latency FROM public.event_outcomes
+                WHERE check_id = c.id
+                    AND timestamp >= $1::TIMESTAMPTZ
+                    AND timestamp < COALESCE(s.covered_from, $2::TIMESTAMPTZ)
+            UNION ALL
+            SELECT failed, error_kind, latency FROM public.event_outcomes
+                WHERE check_id = c.id
+                    AND timestamp >= s.covered_to
+                    AND timestamp < $2::TIMESTAMPTZ
+        ) o
+), totals AS (
+    SELECT check_id, count, errors, latency_sum, latency_min, latency_max FROM r
+    UNION ALL
+    SELECT check_id, 1, failed::INTEGER, COALESCE(latency, 0), latency, latency FROM e
+), buckets AS (
+    SELECT r.check_id, b.key::INTEGER AS bucket, b.value::BIGINT AS n
+        FROM r, jsonb_each_text(r.sketch) b
+    UNION ALL
+    SELECT check_id,
+        CASE WHEN latency > $5::FLOAT8 THEN ceil(ln(latency) / $4::FLOAT8)::INTEGER
+            ELSE $6::INTEGER
+        END,
+        1
+    FROM e WHERE latency IS NOT NULL
+), kinds AS (
+    SELECT r.check_id, k.key AS kind, k.value::BIGINT AS n
+        FROM r, jsonb_each_text(r.error_kinds) k
+    UNION ALL
+    SELECT check_id, error_kind, 1 FROM e WHERE failed
+)
+SELECT c.id AS check_id, 0 AS part, c.label AS key,
+    COALESCE(sum(t.count), 0)::BIGINT AS count,
+    COALESCE(sum(t.errors), 0)::BIGINT AS errors,
+    COALESCE(sum(t.latency_sum), 0) AS latency_sum,
+    min(t.latency_min) AS latency_min,
+    max(t.latency_max) AS latency_max
+FROM checks c LEFT JOIN totals t ON t.check_id = c.id
+GROUP BY c.id, c.label
+UNION ALL
+SELECT check_id, 1, bucket::TEXT, sum(n)::BIGINT, NULL, NULL, NULL, NULL
+FROM buckets GROUP BY check_id, bucket
+UNION ALL
+SELECT check_id, 2, kind, sum(n)::BIGINT, NULL, NULL, NULL, NULL
+FROM kinds GROUP BY check_id, kind
+ORDER BY check_id, part
+"""
+
+
+@dataclass
+class CheckReport:
+    check_id: int
+    label: str
+    count: int = field(default=0)
+    errors: int = field(default=0)
+    latency_sum: float = field(default=0.0)
+    latency_min: Optional[float] = field(default=None)
+    latency_max: Optional[float] = field(default=None)
+    sketch: LatencySketch = field(default_factory=LatencySketch)
+    error_kinds: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def availability(self) -> Optional[float]:
+        """
+        Ratio of results that did not fail, None if there were no results.
+        """
+        return 1 - self.errors / self.count if self.count else None
+
+    @property
+    def latency_mean(self) -> Optional[float]:
+        return self.latency_sum / self.sketch.count if self.sketch.count else None
+
+    def to_dict(self, percentiles: Sequence[float] = (50, 90, 99)) -> Dict[str, Any]:
+        return dict(
+            check_id=self.check_id,
+            label=self.label,
+            count=self.count,
+            errors=self.errors,
+            availability=self.availability,
+            latency_mean=self.latency_mean,
+            latency_min=self.latency_min,
+            latency_max=self.latency_max,
+            latency_percentiles={
+                f"p{p:g}": self.sketch.quantile(p / 100) for p in percentiles
+            },
+            error_kinds=self.error_kinds,
+        )
+
+
+class Report:
+    """
+    Availability, latency percentiles and error breakdown per check over a time
+    window.
+
+    Rollups entirely within the window are used where they exist. For each check,
+    raw events are only read before its first and after its last rollup in the
+    window, e.g. for the current, not yet rolled up, minute or for checks run without
+    rollups; windows with no rollup between them are considered without results.
+    Aggregation happens in the database, and per check results are streamed through
+    a server side cursor, so memory use does not grow with the number of checks.
+    """
+
+    def __init__(
+        self,
+        postgres: PostgresManager,
+        start: datetime,
+        end: datetime,
+        check_ids: Optional[List[int]] = None,
+        prefetch: int = 1000,
+    ):
+        """
+        :param start: start of the window (inclusive), timezone aware
+        :param end: end of the window (exclusive), timezone aware
+        :param check_ids: checks to report on, all checks if None
+        :param prefetch: number of rows fetched from the cursor at once
+        """
+        if start >= end:
+            raise ValueError("The report window must end after it starts")
+        self.postgres = postgres
+        self.start = start
+        self.end = end
+        self.check_ids = check_ids
+        self.prefetch = prefetch
+
+    async def checks(self) -> AsyncGenerator[CheckReport, None]:
+        """
+        Compute the report of each check, ordered by check id.
+        """
+        sketch = LatencySketch()
+        report: Optional[CheckReport] = None
+        complete = False
+        async with self.postgres.connection() as connection:
+            async with connection.transaction(readonly=True):
+                async for row in connection.cursor(
+                    _REPORT_QUERY,
+                    self.start,
+                    self.end,
+                    self.check_ids,
+                    sketch._log_gamma,
+                    sketch.min_value,
+                    ZERO_BUCKET,
+                    prefetch=self.prefetch,
+                ):
+                    if row["part"] == 0:
+                        if report is not None:
+                            yield report
+                        report = CheckReport(
+                            check_id=row["check_id"],
+                            label=row["key"],
+                            count=row["count"],
+                            errors=row["errors"],
+                            latency_sum=row["latency_sum"],
+                            latency_min=row["latency_min"],
+                            latency_max=row["latency_max"],
+                        )
+                    elif row["part"] == 1:
+                        report.sketch.buckets[int(row["key"])] = row["count"]
+                        report.sketch.count += row["count"]
+                    else:
+                        report.error_kinds[row["key"]] = row["count"]
+                complete = True
+        if not complete:
+            raise RuntimeError("Failed to compute report, see previous errors")
+        if report is not None:
+            yield report
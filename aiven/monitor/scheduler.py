@@ -0,0 +1,347 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from aiven.monitor import slots
+from aiven.monitor.metrics import SCHEDULER_LAG
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SchedulerStats:
+    jobs: int = field(default=0)
+    ticks: int = field(default=0)
+    late: int = field(default=0)
+    missed: int = field(default=0)
+    errors: int = field(default=0)
+    in_flight: int = field(default=0)
+    max_lag: float = field(default=0.0)
+
+
+@slots
+@dataclass
+class ScheduledJob:
+    id: int
+    func: Callable[[], Awaitable]
+    interval: float
+    # due time of the next tick not yet started, and of the last tick started
+    due: float = field(default=0.0)
+    started: Optional[float] = field(default=None)
+    # sequence number of the next tick, ticks superseded by `Scheduler.reschedule`
+    # are skipped
+    seq: int = field(default=0)
+    # reserves the job's share of a rate limit, returning the delay until its turn;
+    # the delay reserved for the next tick once reserved
+    throttle: Optional[Callable[[], float]] = field(default=None)
+    throttled: Optional[float] = field(default=None)
+    running: bool = field(default=False)
+    cancelled: bool = field(default=False)
+    # due time from which ticks are cancelled, resolving `cutoff_reached` once the
+    # job is cancelled, see `Scheduler.cancel_from`
+    cutoff: Optional[float] = field(default=None)
+    cutoff_reached: Optional[asyncio.Future] = field(default=None)
+
+
+@slots
+@dataclass(order=True)
+class _Tick:
+    # time from which the tick may start, its due time unless it was throttled
+    start: float
+    seq: int
+    job: ScheduledJob = field(compare=False)
+    due: float = field(compare=False)
+
+
+class Scheduler:
+    """
+    Fixed-rate scheduler driving any number of jobs from a single task.
+
+    Upcoming ticks are kept in a heap ordered by due time, so only probes that are
+    actually in flight are backed by a task. A tick is due exactly `interval` seconds
+    after the previous one regardless of how long the job took to complete, the
+    interval of a job can be changed between ticks (see `Scheduler.reschedule`). Ticks
+    that start later than `late_threshold` seconds after their due time are counted
+    as late; ticks that could not be started at all (the previous run of the job is
+    still in flight or the scheduler fell behind by more than an interval) are
+    counted as missed.
+
+    Jobs can be throttled (eg: by a rate limit shared with other jobs). A throttled
+    tick is put back until its turn comes, rather than waiting while holding one of
+    the `max_in_flight` slots. It keeps its due time, so the following ticks of the
+    job are not delayed, and its lag includes the time it was held back.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 1000,
+        max_jitter: float = 0.0,
+        late_threshold: float = 0.1,
+        report_interval: float = 60.0,
+    ):
+        """
+        :param max_in_flight: maximum number of jobs running concurrently
+        :param max_jitter: upper bound (seconds) of the random delay applied to the
+            first tick of a job, capped at the job's interval
+        :param late_threshold: lag (seconds) after which a tick is considered late
+        :param report_interval: interval (seconds) at which statistics are logged
+        """
+        self.max_in_flight = max_in_flight
+        self.max_jitter = max_jitter
+        self.late_threshold = late_threshold
+        self.report_interval = report_interval
+        self.stats = SchedulerStats()
+        self._heap: List[_Tick] = []
+        self._jobs: Dict[int, ScheduledJob] = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._tasks: Set[asyncio.Task] = set()
+        self._running: Dict[int, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _push(
+        self, due: float, job: ScheduledJob, start: Optional[float] = None
+    ) -> None:
+        if self._past_cutoff(job, due):
+            return
+        job.due = due
+        job.seq = next(self._seq)
+        heapq.heappush(
+            self._heap, _Tick(due if start is None else start, job.seq, job, due)
+        )
+
+    def schedule(
+        self,
+        func: Callable[[], Awaitable],
+        interval: float,
+        delay: Optional[float] = None,
+        throttle: Optional[Callable[[], float]] = None,
+    ) -> int:
+        """
+        Schedule a job to be run every `interval` seconds.
+
+        :param func: Coroutine function to call on every tick
+        :param interval: Interval in seconds between ticks
+        :param delay: Delay in seconds before the first tick, a random delay up to
+            `max_jitter` if not provided
+        :param throttle: Function called once per tick when it is due, returning the
+            delay (seconds) the tick is held back for
+        :return: Identifier of the scheduled job, usable with `Scheduler.cancel`
+        """
+        if interval <= 0:
+            raise ValueError(f"Invalid interval specified: {interval}")
+
+        job = ScheduledJob(
+            id=next(self._ids), func=func, interval=interval, throttle=throttle
+        )
+        self._jobs[job.id] = job
+        self.stats.jobs = len(self._jobs)
+
+        if delay is None:
+            delay = random.uniform(0, min(self.max_jitter, interval))
+        self._push(asyncio.get_event_loop().time() + delay, job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job.id
+
+    def reschedule(self, job_id: int, interval: float) -> None:
+        """
+        Change the interval of a job. The next tick is due `interval` seconds after
+        the last tick started, or immediately if that time has passed.
+
+        :param job_id: Identifier of the job, unknown jobs are ignored
+        :param interval: Interval in seconds between ticks
+        """
+        if interval <= 0:
+            raise ValueError(f"Invalid interval specified: {interval}")
+        job = self._jobs.get(job_id)
+        if job is None or job.interval == interval:
+            return
+        job.interval = interval
+        if job.started is not None:
+            now = asyncio.get_event_loop().time()
+            self._push(max(job.started + interval, now), job)
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def cancel(self, job_id: int) -> None:
+        job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.cancelled = True
+            self.stats.jobs = len(self._jobs)
+            if job.cutoff_reached is not None and not job.cutoff_reached.done():
+                job.cutoff_reached.set_result(None)
+
+    def _past_cutoff(self, job: ScheduledJob, due: float) -> bool:
+        """
+        Cancel `job` if a tick due at `due` is past its cutoff.
+        """
+        if job.cutoff is None or due < job.cutoff:
+            return False
+        self.cancel(job.id)
+        return True
+
+    async def cancel_from(self, dues: Dict[int, float]) -> None:
+        """
+        Cancel jobs such that ticks due before a given time are started and none due
+        from then on are, waiting for ticks that are late to be started first.
+
+        :param dues: Time (loop time) from which ticks are cancelled, by job id
+        """
+        running = self._task is not None and not self._task.done()
+        futures = []
+        for job_id, cutoff in dues.items():
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            job.cutoff = cutoff
+            if not running:
+                self.cancel(job_id)
+            elif not self._past_cutoff(job, job.due):
+                # cancelled by the scheduler loop, once its next tick is past the cutoff
+                job.cutoff_reached = asyncio.get_event_loop().create_future()
+                futures.append(job.cutoff_reached)
+        await asyncio.gather(*futures)
+
+    async def wait(self, job_id: int) -> None:
+        """
+        Wait for the run of a job in flight, if any, to complete.
+        """
+        task = self._running.get(job_id)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    def start(self) -> asyncio.Task:
+        """
+        Start the scheduler if not already running.
+
+        :return: The task running the scheduler loop
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def close(self) -> None:
+        """
+        Stop the scheduler and cancel any jobs in flight.
+        """
+        tasks = list(self._tasks)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _execute(self, job: ScheduledJob) -> None:
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.errors += 1
+            logger.exception("Scheduled job %d failed: %s", job.id, e)
+        finally:
+            self._running.pop(job.id, None)
+            job.running = False
+            self.stats.in_flight -= 1
+            self._semaphore.release()
+
+    def _report(self) -> None:
+        logger.info("Scheduler statistics: %s", self.stats)
+
+    async def _wait(self, timeout: Optional[float]) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self) -> None:
+        """
+        Run the scheduler loop until cancelled.
+        """
+        loop = asyncio.get_event_loop()
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._wakeup = asyncio.Event()
+        next_report = loop.time() + self.report_interval
+        try:
+            await self._run(loop, next_report)
+        finally:
+            # ticks are no longer started, so no tick before a cutoff will be either
+            for job in list(self._jobs.values()):
+                if job.cutoff is not None:
+                    self.cancel(job.id)
+
+    async def _run(self, loop: asyncio.AbstractEventLoop, next_report: float) -> None:
+        while True:
+            now = loop.time()
+            if now >= next_report:
+                self._report()
+                next_report = now + self.report_interval
+
+            if not self._heap:
+                await self._wait(next_report - now)
+                continue
+
+            tick = self._heap[0]
+            if tick.job.cancelled or tick.seq != tick.job.seq:
+                heapq.heappop(self._heap)
+                continue
+
+            if tick.start > now:
+                await self._wait(min(tick.start, next_report) - now)
+                continue
+
+            heapq.heappop(self._heap)
+            job = tick.job
+            due = tick.due
+
+            behind = int((now - due) // job.interval)
+            if behind > 0:
+                # scheduler fell behind by at least one full interval, skip ahead
+                self.stats.missed += behind
+                due += behind * job.interval
+            if self._past_cutoff(job, due):
+                continue
+
+            if job.running:
+                self.stats.missed += 1
+                logger.debug("Skipping tick for job %d, still in flight", job.id)
+                self._push(due + job.interval, job)
+                continue
+
+            if job.throttle is not None and job.throttled is None:
+                job.throttled = job.throttle()
+                if job.throttled > 0:
+                    # held back without moving the job off its grid, the tick is
+                    # late by the time it starts
+                    self._push(due, job, start=now + job.throttled)
+                    continue
+            job.throttled = None
+
+            await self._semaphore.acquire()
+
+            lag = loop.time() - due
+            self.stats.ticks += 1
+            self.stats.max_lag = max(self.stats.max_lag, lag)
+            SCHEDULER_LAG.observe(lag)
+            if lag > self.late_threshold:
+                self.stats.late += 1
+                logger.debug("Late tick for job %d, lag=%.3fs", job.id, lag)
+
+            job.running = True
+            job.started = due
+            self.stats.in_flight += 1
+            task = asyncio.ensure_future(self._execute(job))
+            self._tasks.add(task)
+            self._running[job.id] = task
+            task.add_done_callback(self._tasks.discard)
+
+            self._push(due + job.interval, job)
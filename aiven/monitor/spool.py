@@ -0,0 +1,197 @@
+import logging
+import os
+import struct
+import zlib
+from typing import BinaryIO, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# length, crc32 of payload, kind, key
+_FRAME = struct.Struct("!IIBq")
+_CURSOR = struct.Struct("!QQ")
+
+SEGMENT_SUFFIX = ".seg"
+CHECKPOINT = "checkpoint"
+
+Cursor = Tuple[int, int]
+# kind, key, value
+Record = Tuple[int, int, bytes]
+
+
+class Spool:
+    """
+    Local, append-only spool of keyed records stored in size bounded segment files.
+    Each record has a kind (eg: the topic it is delivered to), defined by the user of
+    the spool.
+
+    Records are appended to the active segment and read back in order from a cursor
+    that is persisted on commit, so records not committed before a restart are
+    replayed. Fully read segments are removed on commit. When the spool exceeds
+    `max_size` bytes, the oldest segments are dropped; the active segment is never
+    dropped, so the spool can exceed `max_size` if it is smaller than `segment_size`.
+    """
+
+    def __init__(
+        self, path: str, segment_size: int = 16777216, max_size: int = 1073741824,
+    ):
+        """
+        :param path: directory to store segments in, created if required
+        :param segment_size: size (bytes) after which a new segment is started
+        :param max_size: maximum total size (bytes) of all segments
+        """
+        self.path = path
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.dropped_segments = 0
+        os.makedirs(path, exist_ok=True)
+
+        self._segments: List[int] = sorted(
+            int(name[: -len(SEGMENT_SUFFIX)])
+            for name in os.listdir(path)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+        self._sizes = {
+            s: os.path.getsize(self._segment_path(s)) for s in self._segments
+        }
+        self._cursor: Cursor = self._load_checkpoint()
+        if self._segments:
+            logger.info(
+                "Replaying %d spool segment(s) from %s", len(self._segments), path
+            )
+
+        self._writer: Optional[BinaryIO] = None
+        self._writer_segment = self._segments[-1] + 1 if self._segments else 0
+        self._reader: Optional[BinaryIO] = None
+        self._reader_segment: Optional[int] = None
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:020d}{SEGMENT_SUFFIX}")
+
+    def _load_checkpoint(self) -> Cursor:
+        try:
+            with open(os.path.join(self.path, CHECKPOINT), "rb") as f:
+                segment, offset = _CURSOR.unpack(f.read(_CURSOR.size))
+        except (OSError, struct.error):
+            segment, offset = 0, 0
+        if self._segments and segment < self._segments[0]:
+            segment, offset = self._segments[0], 0
+        return segment, offset
+
+    @property
+    def size(self) -> int:
+        return sum(self._sizes.values())
+
+    def _roll(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._writer_segment += 1 if self._writer is not None else 0
+        self._writer = open(self._segment_path(self._writer_segment), "ab")
+        self._segments.append(self._writer_segment)
+        self._sizes[self._writer_segment] = 0
+
+    def _enforce_max_size(self) -> None:
+        while len(self._segments) > 1 and self.size > self.max_size:
+            segment = self._segments.pop(0)
+            logger.warning("Spool full, dropping segment %d", segment)
+            self._remove(segment)
+            self.dropped_segments += 1
+            if self._cursor[0] <= segment:
+                self._cursor = (self._segments[0], 0)
+
+    def _remove(self, segment: int) -> None:
+        if self._reader_segment == segment:
+            self._reader.close()
+            self._reader, self._reader_segment = None, None
+        self._sizes.pop(segment, None)
+        try:
+            os.remove(self._segment_path(segment))
+        except FileNotFoundError:
+            pass
+
+    def append(self, key: int, value: bytes, kind: int = 0) -> None:
+        """
+        Append a record to the spool. The record is handed to the operating system
+        before returning, so it survives a crash of this process.
+
+        :param kind: kind of the record, between 0 and 255
+        """
+        if self._writer is None or self._sizes[self._writer_segment] >= (
+            self.segment_size
+        ):
+            self._roll()
+
+        frame = _FRAME.pack(len(value), zlib.crc32(value), kind, key) + value
+        self._writer.write(frame)
+        self._writer.flush()
+        self._sizes[self._writer_segment] += len(frame)
+        self._enforce_max_size()
+
+    def _open_reader(self, segment: int) -> BinaryIO:
+        if self._reader_segment != segment:
+            if self._reader is not None:
+                self._reader.close()
+            self._reader = open(self._segment_path(segment), "rb")
+            self._reader_segment = segment
+        return self._reader
+
+    def read(self, max_records: int = 1000) -> Tuple[List[Record], Cursor]:
+        """
+        Read records from the current cursor without moving it.
+
+        :return: The records read, as (kind, key, value), and the cursor to commit
+            once they are delivered
+        """
+        records: List[Record] = []
+        segment, offset = self._cursor
+        while len(records) < max_records:
+            if segment in self._sizes:
+                reader = self._open_reader(segment)
+                reader.seek(offset)
+                while len(records) < max_records:
+                    header = reader.read(_FRAME.size)
+                    if len(header) < _FRAME.size:
+                        break
+                    length, crc, kind, key = _FRAME.unpack(header)
+                    value = reader.read(length)
+                    if len(value) < length or zlib.crc32(value) != crc:
+                        break
+                    records.append((kind, key, value))
+                    offset += _FRAME.size + length
+
+                if len(records) >= max_records or segment == self._writer_segment:
+                    # batch complete or caught up with the writer
+                    break
+
+                if offset < self._sizes[segment]:
+                    logger.warning(
+                        "Skipping corrupt data in spool segment %d at offset %d",
+                        segment,
+                        offset,
+                    )
+
+            later = [s for s in self._segments if s > segment]
+            if not later:
+                break
+            segment, offset = later[0], 0
+
+        return records, (segment, offset)
+
+    def commit(self, cursor: Cursor) -> None:
+        """
+        Persist the cursor, removing any segments that have been fully read.
+        """
+        self._cursor = cursor
+        for segment in [s for s in self._segments if s < cursor[0]]:
+            self._segments.remove(segment)
+            self._remove(segment)
+
+        checkpoint = os.path.join(self.path, CHECKPOINT)
+        with open(checkpoint + ".tmp", "wb") as f:
+            f.write(_CURSOR.pack(*cursor))
+        os.replace(checkpoint + ".tmp", checkpoint)
+
+    def close(self) -> None:
+        for f in (self._writer, self._reader):
+            if f is not None:
+                f.close()
+        self._writer, self._reader, self._reader_segment = None, None, None
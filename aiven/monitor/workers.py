@@ -0,0 +1,146 @@
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+import zlib
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional
+
+import ujson
+
+from aiven.monitor import Check
+
+logger = logging.getLogger(__name__)
+
+
+def shard(check: Check, workers: int) -> int:
+    """
+    Deterministically map a check to a worker index based on a stable hash of its
+    configuration.
+
+    :param check: Check to map
+    :param workers: Total number of workers
+    :return: Index of the worker the check belongs to
+    """
+    key = ujson.dumps(asdict(check), sort_keys=True).encode("utf-8")
+    return zlib.crc32(key) % workers
+
+
+def shard_checks(checks: List[Check], workers: int) -> List[List[Check]]:
+    """
+    Split checks into `workers` shards, see `shard`.
+    """
+    shards: List[List[Check]] = [[] for _ in range(workers)]
+    for check in checks:
+        shards[shard(check, workers)].append(check)
+    return shards
+
+
+class Supervisor:
+    """
+    Run each target in a dedicated process, restarting processes that exit
+    unexpectedly, until the supervisor receives SIGINT or SIGTERM. On shutdown,
+    workers are sent SIGTERM and given `shutdown_timeout` seconds to exit cleanly
+    before being killed.
+    """
+
+    def __init__(
+        self,
+        targets: List[Callable[[], None]],
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 30.0,
+        shutdown_timeout: float = 10.0,
+    ):
+        """
+        :param targets: Picklable callables, one per worker process
+        :param restart_delay: initial delay (seconds) before restarting a dead worker,
+            doubled on every consecutive failure up to `max_restart_delay`
+        """
+        self.targets = targets
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._delays: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._started_at: Dict[int, float] = {}
+        self._stopping = threading.Event()
+
+    def _start(self, index: int) -> None:
+        process = self._context.Process(
+            target=self.targets[index], name=f"aiven-monitor-worker-{index}"
+        )
+        process.start()
+        logger.info("Started worker %d (pid=%d)", index, process.pid)
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+
+    def _stop(self, *_) -> None:
+        self._stopping.set()
+
+    def _supervise(self, now: float) -> Optional[float]:
+        """
+        Restart dead workers as required.
+
+        :return: Time (seconds) until the next pending restart is due, if any
+        """
+        wait = None
+        for index, process in list(self._processes.items()):
+            if process.is_alive():
+                if now - self._started_at[index] > self.max_restart_delay:
+                    # worker has been healthy for a while, reset its backoff
+                    self._delays.pop(index, None)
+                continue
+
+            if index not in self._restart_at:
+                delay = self._delays.get(index, self.restart_delay)
+                logger.warning(
+                    "Worker %d (pid=%d) exited with code %s, restarting in %.1fs",
+                    index,
+                    process.pid,
+                    process.exitcode,
+                    delay,
+                )
+                self._restart_at[index] = now + delay
+                self._delays[index] = min(delay * 2, self.max_restart_delay)
+
+            if self._restart_at[index] <= now:
+                del self._restart_at[index]
+                self._start(index)
+            else:
+                remaining = self._restart_at[index] - now
+                wait = remaining if wait is None else min(wait, remaining)
+        return wait
+
+    def _shutdown(self) -> None:
+        processes = [p for p in self._processes.values() if p.is_alive()]
+        logger.info("Stopping %d worker(s)", len(processes))
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(self.shutdown_timeout)
+            if process.is_alive():
+                logger.warning("Killing unresponsive worker (pid=%d)", process.pid)
+                process.kill()
+                process.join()
+
+    def run(self, poll_interval: float = 1.0) -> None:
+        """
+        Start all workers and supervise them until a shutdown is requested.
+        """
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+
+        for index in range(len(self.targets)):
+            self._start(index)
+
+        try:
+            while not self._stopping.is_set():
+                wait = self._supervise(time.monotonic())
+                self._stopping.wait(
+                    poll_interval if wait is None else min(wait, poll_interval)
+                )
+        finally:
+            self._shutdown()
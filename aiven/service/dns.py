@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import os
+import socket
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import ThreadedResolver
+
+try:
+    import aiodns
+except ImportError:  # pragma: no cover
+    aiodns = None
+
+logger = logging.getLogger(__name__)
+
+_Key = Tuple[str, int]
+
+
+@dataclass
+class ResolverStats:
+    hits: int = field(default=0)
+    misses: int = field(default=0)
+    # lookups that waited for a resolution of the same host already in flight
+    coalesced: int = field(default=0)
+    refreshes: int = field(default=0)
+    errors: int = field(default=0)
+
+
+class _Entry:
+    __slots__ = ("addresses", "expires", "used", "offset", "handle")
+
+    def __init__(self, addresses: List[Dict[str, Any]], expires: float, used: bool):
+        self.addresses = addresses
+        self.expires = expires
+        self.used = used
+        self.offset = 0
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+@dataclass
+class CachingResolver(AbstractResolver):
+    """
+    Resolver caching addresses per host for the TTL of their records, shared by all
+    connectors of a process (see `shared_resolver`).
+
+    Concurrent lookups of a host are collapsed into a single resolution, and entries
+    looked up since they were last resolved are refreshed in the background before
+    they expire, so that hosts probed periodically never wait for a resolution. Others
+    are evicted. Record TTLs are only known if aiodns is available, otherwise the
+    system resolver is used (in an executor) and entries are kept `default_ttl`
+    seconds. Names DNS queries return no addresses for are resolved by the system
+    resolver too, so that names only known to it (eg: hosts file entries such as
+    `localhost`, docker-compose aliases or Kubernetes hostAliases) still resolve.
+    """
+
+    default_ttl: float = field(
+        default=float(os.environ.get("DNS_CACHE_DEFAULT_TTL", 60.0))
+    )
+    min_ttl: float = field(default=float(os.environ.get("DNS_CACHE_MIN_TTL", 5.0)))
+    max_ttl: float = field(default=float(os.environ.get("DNS_CACHE_MAX_TTL", 3600.0)))
+    refresh_ratio: float = field(default=0.8)
+    use_aiodns: bool = field(default=aiodns is not None)
+    stats: ResolverStats = field(default_factory=ResolverStats, init=False)
+    _cache: Dict[_Key, _Entry] = field(default_factory=dict, init=False, repr=False)
+    _pending: Dict[_Key, asyncio.Future] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _resolver: Any = field(default=None, init=False, repr=False)
+    _system_resolver: Optional[ThreadedResolver] = field(
+        default=None, init=False, repr=False
+    )
+    _loop: Optional[asyncio.AbstractEventLoop] = field(
+        default=None, init=False, repr=False
+    )
+
+    def __post_init__(self):
+        if not 0 < self.refresh_ratio <= 1:
+            raise ValueError(f"Invalid refresh ratio: {self.refresh_ratio}")
+        if self.use_aiodns and aiodns is None:
+            raise ValueError("aiodns is required to resolve with record TTLs")
+
+    @property
+    def size(self) -> int:
+        return len(self._cache)
+
+    async def resolve(
+        self, host: str, port: int = 0, family: int = socket.AF_INET
+    ) -> List[Dict[str, Any]]:
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            # entries, timers and pending lookups are bound to the loop they were
+            # created on
+            self.clear()
+            self._pending.clear()
+            self._resolver = None
+            self._system_resolver = None
+            self._loop = loop
+
+        key = (host, family)
+        entry = self._cache.get(key)
+        if entry is not None and entry.expires > loop.time():
+            self.stats.hits += 1
+            entry.used = True
+        else:
+            future = self._pending.get(key)
+            if future is None:
+                self.stats.misses += 1
+                future = self._pending[key] = asyncio.ensure_future(self._resolve(key))
+            else:
+                self.stats.coalesced += 1
+            # shielded, so that a cancelled probe does not cancel the resolution
+            # other lookups are waiting for
+            entry = await asyncio.shield(future)
+
+        # rotate addresses, so that connections are spread across them
+        addresses = entry.addresses
+        offset = entry.offset % len(addresses)
+        entry.offset += 1
+        return [
+            dict(address, port=port)
+            for address in addresses[offset:] + addresses[:offset]
+        ]
+
+    async def _resolve(self, key: _Key, used: bool = True) -> _Entry:
+        try:
+            addresses, ttl = [], self.default_ttl
+            if self.use_aiodns:
+                addresses, ttl = await self._query(*key)
+                if not addresses:
+                    logger.debug("No DNS records for %s, using system resolver", key[0])
+            if not addresses:
+                if self._system_resolver is None:
+                    self._system_resolver = ThreadedResolver()
+                addresses = await self._system_resolver.resolve(key[0], 0, key[1])
+                ttl = self.default_ttl
+            if not addresses:
+                raise OSError(f"DNS lookup of {key[0]} returned no addresses")
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        loop = asyncio.get_event_loop()
+        entry = _Entry(addresses, loop.time() + ttl, used)
+        previous = self._cache.get(key)
+        if previous is not None and previous.handle is not None:
+            previous.handle.cancel()
+        entry.handle = loop.call_later(ttl * self.refresh_ratio, self._refresh, key)
+        self._cache[key] = entry
+        logger.debug(
+            "Resolved %s to %d addresses, ttl=%.0fs", key[0], len(addresses), ttl
+        )
+        return entry
+
+    async def _query(
+        self, host: str, family: int
+    ) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Query A/AAAA records of a host, returning no addresses if there are none or
+        the queries failed (eg: NXDOMAIN).
+        """
+        if self._resolver is None:
+            self._resolver = aiodns.DNSResolver()
+
+        record_types = []
+        if family in (socket.AF_INET, socket.AF_UNSPEC):
+            record_types.append((socket.AF_INET, "A"))
+        if family in (socket.AF_INET6, socket.AF_UNSPEC):
+            record_types.append((socket.AF_INET6, "AAAA"))
+
+        answers = await asyncio.gather(
+            *(self._resolver.query(host, t) for _, t in record_types),
+            return_exceptions=True,
+        )
+        addresses, ttls = [], []
+        for (record_family, _), answer in zip(record_types, answers):
+            if isinstance(answer, Exception):
+                continue
+            for record in answer:
+                ttls.append(record.ttl)
+                addresses.append(
+                    {
+                        "hostname": host,
+                        "host": record.host,
+                        "port": 0,
+                        "family": record_family,
+                        "proto": 0,
+                        "flags": socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+                    }
+                )
+        if not addresses:
+            errors = [a for a in answers if isinstance(a, Exception)]
+            if errors:
+                logger.debug("DNS lookup of %s failed: %s", host, errors[0])
+        return addresses, min(ttls, default=self.default_ttl)
+
+    def _refresh(self, key: _Key) -> None:
+        entry = self._cache.get(key)
+        if entry is None:
+            return
+        entry.handle = None
+        if not entry.used:
+            logger.debug("Evicting unused DNS cache entry for %s", key[0])
+            del self._cache[key]
+            return
+        if key not in self._pending:
+            self.stats.refreshes += 1
+            self._pending[key] = future = asyncio.ensure_future(
+                self._resolve(key, used=False)
+            )
+            future.add_done_callback(self._refreshed)
+
+    def _refreshed(self, future: asyncio.Future) -> None:
+        # the stale entry is served until it expires, then looked up again
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("Failed to refresh DNS cache entry: %s", future.exception())
+
+    def clear(self) -> None:
+        for entry in self._cache.values():
+            if entry.handle is not None:
+                entry.handle.cancel()
+        self._cache.clear()
+
+    async def close(self) -> None:
+        """
+        Connectors share this resolver, they must not close it. Use `clear` instead
+        to release cached entries and their refresh timers.
+        """
+
+
+_shared: Optional[CachingResolver] = None
+
+
+def shared_resolver() -> CachingResolver:
+    """
+    Retrieve the resolver shared by all http connectors of this process.
+    """
+    global _shared
+    if _shared is None:
+        _shared = CachingResolver()
+    return _shared
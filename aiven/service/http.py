@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from aiven.service.dns import shared_resolver
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HTTPManager:
+    limit: int = field(default=int(os.environ.get("HTTP_CONNECTION_LIMIT", 100)))
+    limit_per_host: int = field(
+        default=int(os.environ.get("HTTP_CONNECTION_LIMIT_PER_HOST", 0))
+    )
+    keep_alive: bool = field(
+        default=os.environ.get("HTTP_KEEP_ALIVE", "true").lower()
+        in ("1", "true", "yes")
+    )
+    keepalive_timeout: float = field(
+        default=float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", 15.0))
+    )
+    trace_configs: List[aiohttp.TraceConfig] = field(default_factory=list, repr=False)
+    resolver: AbstractResolver = field(default_factory=shared_resolver, repr=False)
+    _session: Optional[aiohttp.ClientSession] = field(
+        default=None, init=False, repr=False
+    )
+    _lock: Optional[asyncio.Lock] = field(default=None, init=False, repr=False)
+
+    def _connector(self) -> aiohttp.TCPConnector:
+        kwargs = dict(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            enable_cleanup_closed=True,
+            # the resolver caches addresses itself, honoring record TTLs
+            resolver=self.resolver,
+            use_dns_cache=False,
+        )
+        if self.keep_alive:
+            kwargs["keepalive_timeout"] = self.keepalive_timeout
+        else:
+            kwargs["force_close"] = True
+        return aiohttp.TCPConnector(**kwargs)
+
+    async def session(self) -> aiohttp.ClientSession:
+        """
+        Retrieve the session shared by all checks using this manager, creating it if
+        required. Request specific parameters (headers, timeout, tls verification)
+        are expected to be provided per request.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                logger.debug("Initialising shared http session: %s", self)
+                self._session = aiohttp.ClientSession(
+                    connector=self._connector(), trace_configs=self.trace_configs
+                )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            logger.debug("Closing shared http session")
+            await self._session.close()
+        self._session = None
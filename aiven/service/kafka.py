@@ -4,7 +4,7 @@ import os
 from contextlib import asynccontextmanager
 from dataclasses import InitVar, dataclass, field
 from ssl import SSLContext
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
 from aiokafka.helpers import create_ssl_context
@@ -50,6 +50,18 @@ class KafkaManager:
     sasl_kerberos_domain_name: str = field(
         default=os.environ.get("KAFKA_SASL_KERBEROS_DOMAIN_NAME")
     )
+    producer_linger_ms: int = field(
+        default=int(os.environ.get("KAFKA_PRODUCER_LINGER_MS", 50))
+    )
+    producer_max_batch_size: int = field(
+        default=int(os.environ.get("KAFKA_PRODUCER_MAX_BATCH_SIZE", 65536))
+    )
+    producer_compression_type: Optional[str] = field(
+        default=os.environ.get("KAFKA_PRODUCER_COMPRESSION_TYPE")
+    )
+    producer_acks: Union[int, str] = field(
+        default=os.environ.get("KAFKA_PRODUCER_ACKS", 1)
+    )
     _client_kwargs: Dict[str, Any] = field(default_factory=dict, init=False, repr=False)
 
     def __post_init__(
@@ -85,17 +97,32 @@ class KafkaManager:
         if self.client_id:
             self._client_kwargs["client_id"] = self.client_id
 
+        if isinstance(self.producer_acks, str) and self.producer_acks != "all":
+            self.producer_acks = int(self.producer_acks)
+
     @property
     def client_configuration(self) -> Dict[str, Any]:
         return self._client_kwargs
 
+    @property
+    def producer_configuration(self) -> Dict[str, Any]:
+        return dict(
+            linger_ms=self.producer_linger_ms,
+            max_batch_size=self.producer_max_batch_size,
+            compression_type=self.producer_compression_type or None,
+            acks=self.producer_acks,
+        )
+
     @asynccontextmanager
-    async def producer(self) -> AIOKafkaProducer:
+    async def producer(self, **kwargs) -> AIOKafkaProducer:
         logger.debug("Initialising new producer")
         try:
-            producer = AIOKafkaProducer(
-                loop=asyncio.get_event_loop(), **self._client_kwargs
-            )
+            kwargs = {
+                **self.client_configuration,
+                **self.producer_configuration,
+                **kwargs,
+            }
+            producer = AIOKafkaProducer(loop=asyncio.get_event_loop(), **kwargs)
         except ValueError as e:
             raise RuntimeError(f"Invalid Kafka configuration: {e}")
 
@@ -103,8 +130,11 @@ class KafkaManager:
             await producer.start()
             yield producer
         finally:
-            logger.debug("Stopping producer")
-            await producer.stop()
+            logger.debug("Flushing and stopping producer")
+            try:
+                await producer.flush()
+            finally:
+                await producer.stop()
 
     @asynccontextmanager
     async def consumer(self, *topics, **kwargs) -> AIOKafkaConsumer:
@@ -1,15 +1,38 @@
 import logging
 import os
 import ssl
+import time
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
-from typing import AsyncGenerator, List, Optional
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
 
 import asyncpg
 import ujson
 
 logger = logging.getLogger(__name__)
 
+# jsonb binary wire format version
+JSONB_FORMAT_VERSION = b"\x01"
+
+
+def _jsonb_encoder(value: Any) -> bytes:
+    return JSONB_FORMAT_VERSION + ujson.dumps(value).encode("utf-8")
+
+
+def _jsonb_decoder(value: bytes) -> Any:
+    return ujson.loads(value[1:].decode("utf-8"))
+
 
 @dataclass
 class PostgresManager:
@@ -19,6 +42,11 @@ class PostgresManager:
         )
     )
     ssl_cafile: Optional[str] = field(default=os.environ.get("POSTGRES_CAFILE"))
+    min_size: int = field(default=int(os.environ.get("POSTGRES_POOL_MIN_SIZE", 1)))
+    max_size: int = field(default=int(os.environ.get("POSTGRES_POOL_MAX_SIZE", 3)))
+    on_query: Optional[Callable[[str, float, bool], None]] = field(
+        default=None, repr=False
+    )
     ssl_context: Optional[ssl.SSLContext] = field(default=None, init=False, repr=False)
     _pool: Optional[asyncpg.pool.Pool] = field(default=None, repr=False)
 
@@ -37,27 +65,51 @@ class PostgresManager:
         if self._pool is None:
 
             async def init_connection(conn):
+                # binary format is required for jsonb columns to be usable with COPY
                 await conn.set_type_codec(
                     "jsonb",
-                    encoder=ujson.dumps,
-                    decoder=ujson.loads,
+                    encoder=_jsonb_encoder,
+                    decoder=_jsonb_decoder,
                     schema="pg_catalog",
+                    format="binary",
                 )
 
             self._pool = await asyncpg.create_pool(
                 dsn=self.url,
                 ssl=self.ssl_context,
-                min_size=1,
-                max_size=3,
+                min_size=self.min_size,
+                max_size=self.max_size,
                 init=init_connection,
             )
 
+    def pool_stats(self) -> Dict[str, int]:
+        """
+        Current utilisation of the connection pool.
+        """
+        if self._pool is None:
+            return dict(size=0, idle=0, max=self.max_size)
+        return dict(
+            size=self._pool.get_size(),
+            idle=self._pool.get_idle_size(),
+            max=self.max_size,
+        )
+
+    def _observe(self, operation: str, start: float, ok: bool) -> None:
+        if self.on_query is not None:
+            self.on_query(operation, time.perf_counter() - start, ok)
+
     @asynccontextmanager
-    async def connection(self, warning_msg: str = None) -> AsyncGenerator:
+    async def connection(
+        self,
+        warning_msg: str = None,
+        reraise: Tuple[Type[BaseException], ...] = (),
+    ) -> AsyncGenerator:
         await self.init()
         try:
             async with self._pool.acquire() as connection:
                 yield connection
+        except reraise:
+            raise
         except (ValueError, AttributeError, TypeError) as e:
             logger.warning(e)
             if warning_msg:
@@ -69,6 +121,57 @@ class PostgresManager:
         """
         Helper method to execute an sql query and fetch results within a transaction.
         """
+        start, result = time.perf_counter(), None
         async with self.connection() as connection:  # type: asyncpg.Connection
             async with connection.transaction():
-                return await connection.fetch(*args, **kwargs)
+                result = await connection.fetch(*args, **kwargs)
+        self._observe("execute", start, result is not None)
+        return result
+
+    async def copy_records(
+        self,
+        table: str,
+        records: Iterable[Tuple],
+        columns: Sequence[str],
+        schema: str = "public",
+        on_conflict: Optional[str] = None,
+        reraise: Tuple[Type[BaseException], ...] = (),
+    ) -> Optional[str]:
+        """
+        Helper method to bulk load records into a table using binary COPY within a
+        transaction.
+
+        :param on_conflict: conflict action (eg: `(a, b) DO NOTHING`); if provided,
+            records are copied into a temporary staging table first and inserted from
+            there, as COPY itself fails on conflicts
+        :param reraise: errors raised to the caller instead of being logged, eg: to
+            tell records that can never be written from transient failures
+        :return: COPY (or INSERT) command status, or None if the records could not be
+            written
+        """
+        start, status = time.perf_counter(), None
+        try:
+            async with self.connection(reraise=reraise) as connection:
+                async with connection.transaction():
+                    if on_conflict is None:
+                        status = await connection.copy_records_to_table(
+                            table, records=records, columns=columns, schema_name=schema
+                        )
+                    else:
+                        names = ", ".join(columns)
+                        staging = f"_staging_{table}"
+                        await connection.execute(
+                            f'CREATE TEMPORARY TABLE "{staging}" ON COMMIT DROP AS '
+                            f'SELECT {names} FROM "{schema}"."{table}" WITH NO DATA'
+                        )
+                        await connection.copy_records_to_table(
+                            staging, records=records, columns=columns
+                        )
+                        status = await connection.execute(
+                            f'INSERT INTO "{schema}"."{table}" ({names}) '
+                            f'SELECT {names} FROM "{staging}" '
+                            f"ON CONFLICT {on_conflict}"
+                        )
+        finally:
+            self._observe("copy", start, status is not None)
+        return status
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimiterStats:
+    acquired: int = field(default=0)
+    # acquisitions that had to wait for a token, and the total time they waited
+    throttled: int = field(default=0)
+    waited: float = field(default=0.0)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, holding up to `burst` tokens.
+
+    Tokens are reserved rather than waited for: the balance goes negative when tokens
+    are taken before they are available, and each caller waits for its own token, so
+    that callers are served in order without a lock.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """
+        Take a token.
+
+        :return: The time (seconds) to wait for the token to be available
+        """
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.burst)
+        self.updated = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+@dataclass
+class HostRateLimiter:
+    """
+    Limit the rate of requests to each host, with a token bucket per host shared by
+    all checks of a process targeting it.
+    """
+
+    rate: float = field(default=float(os.environ.get("HTTP_RATE_LIMIT_PER_HOST", 0)))
+    burst: int = field(default=int(os.environ.get("HTTP_RATE_BURST_PER_HOST", 1)))
+    stats: RateLimiterStats = field(default_factory=RateLimiterStats, init=False)
+    _buckets: Dict[str, TokenBucket] = field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def __post_init__(self):
+        if self.rate < 0:
+            raise ValueError(f"Invalid rate limit: {self.rate}")
+        if self.burst < 1:
+            raise ValueError(f"Invalid burst size: {self.burst}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def reserve(self, host: str) -> float:
+        """
+        Reserve a request to `host`, without waiting for it to be allowed.
+
+        :return: The time (seconds) until the request is allowed
+        """
+        if not self.enabled:
+            return 0.0
+        now = asyncio.get_event_loop().time()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst, now)
+        delay = bucket.reserve(now)
+        self.stats.acquired += 1
+        if delay > 0:
+            self.stats.throttled += 1
+            self.stats.waited += delay
+            logger.debug("Throttling request to %s for %.3fs", host, delay)
+        return delay
+
+    async def acquire(self, host: str) -> float:
+        """
+        Wait until a request to `host` is allowed.
+
+        :return: The time (seconds) waited
+        """
+        delay = self.reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
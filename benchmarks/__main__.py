@@ -0,0 +1,509 @@
+"""
+Benchmark checks, publishing and consuming against local stand-ins.
+
+Each scenario prints a single json document, one per line, with throughput, latency
+percentiles, cpu time and peak memory, suitable to be tracked across versions.
+
+    poetry run python -m benchmarks --help
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import click
+
+from aiven.monitor.codec import encode_event
+from aiven.monitor.http.check import HTTPCheck, HTTPCheckResult, trace_config
+from aiven.monitor.manager import CheckManager
+from aiven.monitor.replay import Replay
+from aiven.monitor.scheduler import Scheduler
+from aiven.service.http import HTTPManager
+from benchmarks.standins import (
+    InMemoryBroker,
+    InMemoryKafkaManager,
+    SinkPostgresManager,
+    TargetServer,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class Measurement:
+    """
+    Measure wall clock time, cpu time and latencies of a scenario.
+    """
+
+    def __init__(self, scenario: str, **parameters: Any):
+        self.scenario = scenario
+        self.parameters = parameters
+        self.latencies: List[float] = []
+        self.operations = 0
+
+    def __enter__(self) -> "Measurement":
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.duration = time.perf_counter() - self._wall
+        self.cpu = time.process_time() - self._cpu
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 3)
+
+        # ru_maxrss is reported in kilobytes on linux and bytes on macos
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            max_rss //= 1024
+
+        return dict(
+            scenario=self.scenario,
+            parameters=self.parameters,
+            timestamp=datetime.now(tz=timezone.utc).isoformat(),
+            python=platform.python_version(),
+            operations=self.operations,
+            duration_s=round(self.duration, 3),
+            throughput_per_s=round(self.operations / self.duration, 1),
+            latency_p50_ms=ms(_percentile(self.latencies, 0.5)),
+            latency_p99_ms=ms(_percentile(self.latencies, 0.99)),
+            cpu_s=round(self.cpu, 3),
+            cpu_utilisation=round(self.cpu / self.duration, 3),
+            max_rss_mb=round(max_rss / 1024, 1),
+            **extra,
+        )
+
+
+async def _drive(
+    operation: Callable[[int], Awaitable[Any]],
+    count: int,
+    concurrency: int,
+    measurement: Measurement,
+) -> None:
+    """
+    Run `operation` `count` times with at most `concurrency` operations in flight,
+    recording the latency of each operation.
+    """
+    counter = iter(range(count))
+
+    async def worker():
+        for index in counter:
+            start = time.perf_counter()
+            await operation(index)
+            measurement.latencies.append(time.perf_counter() - start)
+            measurement.operations += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def bench_http(
+    count: int,
+    concurrency: int,
+    latency: float,
+    body_size: int,
+    connection_mode: str,
+    regex: Optional[str],
+) -> Dict[str, Any]:
+    with TargetServer(latency=latency, body_size=body_size) as server:
+        checks = [HTTPCheck(url=server.url, regex=regex) for _ in range(concurrency)]
+        http = None
+        if connection_mode == "shared":
+            http = HTTPManager(limit=concurrency, trace_configs=[trace_config])
+        session = await http.session() if http else None
+
+        failures = 0
+
+        async def probe(index: int) -> None:
+            nonlocal failures
+            result = await checks[index % len(checks)].probe(session=session)
+            if result.failed or (regex and not result.content_verified):
+                failures += 1
+
+        with Measurement(
+            "http",
+            count=count,
+            concurrency=concurrency,
+            latency=latency,
+            body_size=body_size,
+            connection_mode=connection_mode,
+            regex=regex,
+        ) as measurement:
+            await _drive(probe, count, concurrency, measurement)
+
+        for check in checks:
+            await check.close()
+        if http:
+            await http.close()
+    return measurement.report(failures=failures)
+
+
+async def bench_publish(
+    count: int, concurrency: int, event_format: str, rollup_window: int
+) -> Dict[str, Any]:
+    kafka = InMemoryKafkaManager()
+    manager = CheckManager(
+        kafka=kafka,
+        postgres=SinkPostgresManager(),
+        event_format=event_format,
+        rollup_window=rollup_window or None,
+    )
+    result = HTTPCheckResult(status=200, connected=True, elapsed=0.05, ttfb=0.04)
+
+    async def publish(index: int) -> None:
+        await manager.publish_event(index % 1000 + 1, result)
+
+    async with manager:
+        with Measurement(
+            "publish",
+            count=count,
+            concurrency=concurrency,
+            event_format=event_format,
+            rollup_window=rollup_window,
+        ) as measurement:
+            await _drive(publish, count, concurrency, measurement)
+    return measurement.report()
+
+
+def _append_events(
+    broker: InMemoryBroker, topic: str, count: int, event_format: str
+) -> None:
+    result = HTTPCheckResult(status=200, connected=True, elapsed=0.05)
+    for index in range(count):
+        check_id = index % 1000 + 1
+        broker.append(
+            topic,
+            str(check_id).encode("utf-8"),
+            encode_event(check_id, result, binary=event_format == "binary"),
+        )
+
+
+async def bench_consume(
+    count: int,
+    partitions: int,
+    event_format: str,
+    sink_latency: float,
+    sink_batch_size: int,
+) -> Dict[str, Any]:
+    broker = InMemoryBroker(partitions=partitions)
+    kafka = InMemoryKafkaManager(broker=broker)
+    postgres = SinkPostgresManager(latency=sink_latency)
+    manager = CheckManager(
+        kafka=kafka,
+        postgres=postgres,
+        sink_batch_size=sink_batch_size,
+        rollup_window=None,
+    )
+
+    _append_events(broker, manager.topic, count, event_format)
+
+    # latency of each database write, observed via the postgres hook
+    latencies = []
+    postgres.on_query = lambda operation, duration, ok: latencies.append(duration)
+
+    async with manager:
+        with Measurement(
+            "consume",
+            count=count,
+            partitions=partitions,
+            event_format=event_format,
+            sink_latency=sink_latency,
+            sink_batch_size=sink_batch_size,
+        ) as measurement:
+            task = asyncio.ensure_future(manager.consume_events())
+            while postgres.rows["public.events"] < count and not task.done():
+                await asyncio.sleep(0.001)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        measurement.operations = postgres.rows["public.events"]
+        measurement.latencies = latencies
+    return measurement.report(batches=postgres.queries)
+
+
+async def bench_replay(
+    count: int,
+    partitions: int,
+    event_format: str,
+    sink_latency: float,
+    batch_size: int,
+    writers: int,
+) -> Dict[str, Any]:
+    broker = InMemoryBroker(partitions=partitions)
+    postgres = SinkPostgresManager(latency=sink_latency)
+    replay = Replay(
+        InMemoryKafkaManager(broker=broker),
+        postgres,
+        batch_size=batch_size,
+        writers=writers,
+        progress_interval=float("inf"),
+    )
+    _append_events(broker, replay.topic, count, event_format)
+
+    latencies = []
+    postgres.on_query = lambda operation, duration, ok: latencies.append(duration)
+
+    with Measurement(
+        "replay",
+        count=count,
+        partitions=partitions,
+        event_format=event_format,
+        sink_latency=sink_latency,
+        batch_size=batch_size,
+        writers=writers,
+    ) as measurement:
+        progress = await replay.run()
+    measurement.operations = progress.written
+    measurement.latencies = latencies
+    return measurement.report(batches=postgres.queries)
+
+
+async def bench_end_to_end(
+    checks: int, interval: float, duration: float, latency: float, body_size: int
+) -> Dict[str, Any]:
+    with TargetServer(latency=latency, body_size=body_size) as server:
+        postgres = SinkPostgresManager()
+        manager = CheckManager(
+            kafka=InMemoryKafkaManager(),
+            postgres=postgres,
+            http=HTTPManager(trace_configs=[trace_config]),
+            scheduler=Scheduler(max_jitter=interval),
+        )
+        async with manager:
+            with Measurement(
+                "end-to-end",
+                checks=checks,
+                interval=interval,
+                duration=duration,
+                latency=latency,
+                body_size=body_size,
+            ) as measurement:
+                publish_event = manager.publish_event
+
+                async def record_elapsed(check_id: int, result: HTTPCheckResult):
+                    if result.elapsed is not None:
+                        measurement.latencies.append(result.elapsed)
+                    await publish_event(check_id, result)
+
+                manager.publish_event = record_elapsed
+                consumer = asyncio.ensure_future(manager.consume_events())
+                await manager.monitor_many(
+                    "http",
+                    [
+                        HTTPCheck(url=f"{server.url}{index}", interval=interval)
+                        for index in range(checks)
+                    ],
+                )
+                await asyncio.sleep(duration)
+                await manager.scheduler.close()
+                consumer.cancel()
+                await asyncio.gather(consumer, return_exceptions=True)
+            stats = manager.scheduler.stats
+            measurement.operations = stats.ticks
+    return measurement.report(
+        events_written=postgres.rows["public.events"],
+        late_ticks=stats.late,
+        missed_ticks=stats.missed,
+        max_tick_lag_ms=round(stats.max_lag * 1000, 3),
+    )
+
+
+# cold start of a process probing once, run with the event loop given as argument
+_FIRST_PROBE = """
+import asyncio, sys
+from aiven.monitor.cli import use_event_loop
+use_event_loop(sys.argv[2])
+from aiven.monitor.http.check import HTTPCheck
+probe = HTTPCheck(url=sys.argv[1]).probe()
+sys.exit(asyncio.get_event_loop().run_until_complete(probe).failed)
+"""
+
+
+async def _start_processes(
+    command: List[str], runs: int, measurement: Measurement
+) -> int:
+    """
+    Start `runs` processes one after the other, recording the time each one takes
+    to complete.
+
+    :return: The number of processes that failed
+    """
+    failures = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        if await process.wait() != 0:
+            failures += 1
+        measurement.latencies.append(time.perf_counter() - start)
+        measurement.operations += 1
+    return failures
+
+
+async def bench_startup(runs: int, invocation: str, loop: str) -> Dict[str, Any]:
+    # the target server is only started when probing, it is a child process too
+    with contextlib.ExitStack() as stack:
+        if invocation == "help":
+            command = [
+                sys.executable,
+                "-m",
+                "aiven.monitor.cli",
+                "--loop",
+                loop,
+                "--help",
+            ]
+        else:
+            server = stack.enter_context(TargetServer())
+            command = [sys.executable, "-c", _FIRST_PROBE, server.url, loop]
+
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        with Measurement(
+            "startup", runs=runs, invocation=invocation, loop=loop
+        ) as measurement:
+            failures = await _start_processes(command, runs, measurement)
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    # cpu time of the processes started rather than of this one; their peak memory
+    # is not reported as it includes that of this process, at the time it forked
+    cpu = (after.ru_utime + after.ru_stime) - (before.ru_utime + before.ru_stime)
+    return measurement.report(failures=failures, process_cpu_s=round(cpu / runs, 3))
+
+
+@click.group(chain=True)
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("a"),
+    default="-",
+    help="File to append results to, one json document per line [default: stdout]",
+)
+@click.pass_context
+def benchmark(ctx, output):
+    logging.basicConfig(format="%(levelname)s %(name)s - %(message)s")
+    logging.root.setLevel(logging.WARNING)
+    ctx.obj = output
+
+
+def _command(func: Callable[..., Awaitable[Dict[str, Any]]]) -> Callable:
+    @functools.wraps(func)
+    @click.pass_obj
+    def command(output, **kwargs):
+        report = asyncio.get_event_loop().run_until_complete(func(**kwargs))
+        output.write(json.dumps(report) + "\n")
+        output.flush()
+
+    return command
+
+
+@benchmark.command("http")
+@click.option("-n", "--count", default=5000, type=click.IntRange(min=1))
+@click.option("-c", "--concurrency", default=100, type=click.IntRange(min=1))
+@click.option("--latency", default=0.0, type=float, help="Target latency (seconds)")
+@click.option("--body-size", default=1024, type=click.IntRange(min=5))
+@click.option(
+    "--connection-mode", default="shared", type=click.Choice(["cold", "shared"])
+)
+@click.option("-r", "--regex", required=False, help="Regex to verify content with")
+@_command
+def http_command(**kwargs):
+    """
+    Probe a local target with http checks.
+    """
+    return bench_http(**kwargs)
+
+
+@benchmark.command("publish")
+@click.option("-n", "--count", default=100000, type=click.IntRange(min=1))
+@click.option("-c", "--concurrency", default=100, type=click.IntRange(min=1))
+@click.option("--event-format", default="json", type=click.Choice(["json", "binary"]))
+@click.option("--rollup-window", default=60, type=click.IntRange(min=0))
+@_command
+def publish_command(**kwargs):
+    """
+    Publish events to an in-memory broker.
+    """
+    return bench_publish(**kwargs)
+
+
+@benchmark.command("consume")
+@click.option("-n", "--count", default=100000, type=click.IntRange(min=1))
+@click.option("-p", "--partitions", default=4, type=click.IntRange(min=1))
+@click.option("--event-format", default="json", type=click.Choice(["json", "binary"]))
+@click.option(
+    "--sink-latency", default=0.002, type=float, help="Database latency (seconds)"
+)
+@click.option("--sink-batch-size", default=500, type=click.IntRange(min=1))
+@_command
+def consume_command(**kwargs):
+    """
+    Consume events from an in-memory broker into a sink-only database.
+    """
+    return bench_consume(**kwargs)
+
+
+@benchmark.command("replay")
+@click.option("-n", "--count", default=100000, type=click.IntRange(min=1))
+@click.option("-p", "--partitions", default=4, type=click.IntRange(min=1))
+@click.option("--event-format", default="json", type=click.Choice(["json", "binary"]))
+@click.option(
+    "--sink-latency", default=0.002, type=float, help="Database latency (seconds)"
+)
+@click.option("--batch-size", default=10000, type=click.IntRange(min=1))
+@click.option("--writers", default=3, type=click.IntRange(min=1))
+@_command
+def replay_command(**kwargs):
+    """
+    Replay events from an in-memory broker into a sink-only database.
+    """
+    return bench_replay(**kwargs)
+
+
+@benchmark.command("end-to-end")
+@click.option("--checks", default=500, type=click.IntRange(min=1))
+@click.option("-i", "--interval", default=1.0, type=float)
+@click.option("-d", "--duration", default=10.0, type=float)
+@click.option("--latency", default=0.01, type=float, help="Target latency (seconds)")
+@click.option("--body-size", default=1024, type=click.IntRange(min=5))
+@_command
+def end_to_end_command(**kwargs):
+    """
+    Schedule checks against a local target, publishing and consuming their events.
+    """
+    return bench_end_to_end(**kwargs)
+
+
+@benchmark.command("startup")
+@click.option("-n", "--runs", default=20, type=click.IntRange(min=1))
+@click.option(
+    "--invocation",
+    default="help",
+    type=click.Choice(["help", "first-probe"]),
+    help="Process to start: aiven-monitor --help, or a single probe of a local target",
+)
+@click.option("--loop", default="asyncio", type=click.Choice(["asyncio", "uvloop"]))
+@_command
+def startup_command(**kwargs):
+    """
+    Start fresh processes, measuring their wall clock time to completion.
+    """
+    return bench_startup(**kwargs)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,317 @@
+"""
+Local, in-process stand-ins for the services used by the monitor, so that checks,
+publishing and consuming can be benchmarked without a live broker or database.
+"""
+import asyncio
+import collections
+import multiprocessing
+import socket
+import time
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import ujson
+from aiohttp import web
+from aiokafka.structs import TopicPartition
+
+from aiven.service.kafka import KafkaManager
+from aiven.service.postgres import PostgresManager
+
+Record = collections.namedtuple(
+    "Record", ["topic", "partition", "offset", "timestamp", "key", "value"]
+)
+
+
+def _serve_target(host: str, port: int, latency: float, body_size: int) -> None:
+    body = (b"x" * max(body_size - 5, 0)) + b"Aiven"
+
+    async def handle(_: web.Request) -> web.Response:
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return web.Response(body=body, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handle)
+    web.run_app(app, host=host, port=port, access_log=None, print=None)
+
+
+class TargetServer:
+    """
+    Local http server, run in a separate process so that it does not compete with
+    the benchmarked code for the event loop. Responses end with "Aiven", so that
+    content verification has to read the entire body.
+    """
+
+    def __init__(
+        self, latency: float = 0.0, body_size: int = 1024, host: str = "127.0.0.1"
+    ):
+        """
+        :param latency: delay (seconds) before each response is sent
+        :param body_size: size (bytes) of each response body
+        """
+        self.latency = latency
+        self.body_size = body_size
+        self.host = host
+        self.port: Optional[int] = None
+        self._process: Optional[multiprocessing.Process] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    def __enter__(self) -> "TargetServer":
+        with socket.socket() as s:
+            s.bind((self.host, 0))
+            self.port = s.getsockname()[1]
+
+        self._process = multiprocessing.get_context("spawn").Process(
+            target=_serve_target,
+            args=(self.host, self.port, self.latency, self.body_size),
+            daemon=True,
+        )
+        self._process.start()
+
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection((self.host, self.port), timeout=1).close()
+                return self
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.__exit__()
+                    raise RuntimeError("Target server failed to start")
+                time.sleep(0.05)
+
+    def __exit__(self, *_) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+
+
+class InMemoryBroker:
+    """
+    Partitioned, in-memory log of records per topic.
+    """
+
+    def __init__(self, partitions: int = 1):
+        self.partitions = partitions
+        self.topics: Dict[str, List[List[Record]]] = {}
+        self.committed: Dict[TopicPartition, int] = {}
+        self._appended: Optional[asyncio.Event] = None
+
+    @property
+    def appended(self) -> asyncio.Event:
+        # created lazily so that it is bound to the running loop
+        if self._appended is None:
+            self._appended = asyncio.Event()
+        return self._appended
+
+    def log(self, topic: str) -> List[List[Record]]:
+        if topic not in self.topics:
+            self.topics[topic] = [[] for _ in range(self.partitions)]
+        return self.topics[topic]
+
+    def append(self, topic: str, key: Optional[bytes], value: bytes) -> Record:
+        log = self.log(topic)
+        partition = zlib.crc32(key) % self.partitions if key else 0
+        record = Record(
+            topic, partition, len(log[partition]), int(time.time() * 1000), key, value
+        )
+        log[partition].append(record)
+        self.appended.set()
+        return record
+
+
+class InMemoryProducer:
+    def __init__(self, broker: InMemoryBroker):
+        self.broker = broker
+
+    async def send(
+        self, topic: str, value: bytes = None, key: bytes = None, **_
+    ) -> asyncio.Future:
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(self.broker.append(topic, key, value))
+        return future
+
+    async def send_and_wait(self, *args, **kwargs) -> Record:
+        return await (await self.send(*args, **kwargs))
+
+    async def flush(self) -> None:
+        pass
+
+
+class InMemoryConsumer:
+    def __init__(self, broker: InMemoryBroker):
+        self.broker = broker
+        self.positions: Dict[TopicPartition, int] = {}
+        self.paused: Set[TopicPartition] = set()
+
+    def subscribe(self, topics: Sequence[str], listener: Any = None) -> None:
+        for topic in topics:
+            for partition in range(len(self.broker.log(topic))):
+                tp = TopicPartition(topic, partition)
+                self.positions[tp] = self.broker.committed.get(tp, 0)
+
+    async def topics(self) -> Set[str]:
+        return set(self.broker.topics)
+
+    def partitions_for_topic(self, topic: str) -> Optional[Set[int]]:
+        if topic not in self.broker.topics:
+            return None
+        return set(range(len(self.broker.topics[topic])))
+
+    def assign(self, partitions: Sequence[TopicPartition]) -> None:
+        self.positions = {tp: 0 for tp in partitions}
+
+    def seek(self, tp: TopicPartition, offset: int) -> None:
+        self.positions[tp] = offset
+
+    async def position(self, tp: TopicPartition) -> int:
+        return self.positions[tp]
+
+    async def beginning_offsets(
+        self, partitions: Sequence[TopicPartition]
+    ) -> Dict[TopicPartition, int]:
+        return {tp: 0 for tp in partitions}
+
+    async def end_offsets(
+        self, partitions: Sequence[TopicPartition]
+    ) -> Dict[TopicPartition, int]:
+        return {tp: self.highwater(tp) for tp in partitions}
+
+    def _fetch(self, max_records: Optional[int]) -> Dict[TopicPartition, List[Record]]:
+        fetched = {}
+        remaining = max_records
+        for tp, position in self.positions.items():
+            if tp in self.paused or (remaining is not None and remaining <= 0):
+                continue
+            log = self.broker.topics[tp.topic][tp.partition]
+            end = len(log) if remaining is None else position + remaining
+            records = log[position:end]
+            if records:
+                fetched[tp] = records
+                self.positions[tp] = position + len(records)
+                if remaining is not None:
+                    remaining -= len(records)
+        return fetched
+
+    async def getmany(
+        self, timeout_ms: int = 0, max_records: Optional[int] = None
+    ) -> Dict[TopicPartition, List[Record]]:
+        fetched = self._fetch(max_records)
+        if not fetched:
+            self.broker.appended.clear()
+            try:
+                await asyncio.wait_for(
+                    self.broker.appended.wait(), timeout=timeout_ms / 1000
+                )
+            except asyncio.TimeoutError:
+                pass
+            fetched = self._fetch(max_records)
+        return fetched
+
+    async def commit(self, offsets: Dict[TopicPartition, int]) -> None:
+        self.broker.committed.update(offsets)
+
+    def pause(self, *partitions: TopicPartition) -> None:
+        self.paused.update(partitions)
+
+    def resume(self, *partitions: TopicPartition) -> None:
+        self.paused.difference_update(partitions)
+
+    def highwater(self, tp: TopicPartition) -> int:
+        return len(self.broker.topics[tp.topic][tp.partition])
+
+
+@dataclass
+class InMemoryKafkaManager(KafkaManager):
+    """
+    `KafkaManager` whose producers and consumers use an in-memory broker.
+    """
+
+    broker: InMemoryBroker = field(default_factory=InMemoryBroker, repr=False)
+
+    @asynccontextmanager
+    async def producer(self, **kwargs) -> InMemoryProducer:
+        yield InMemoryProducer(self.broker)
+
+    @asynccontextmanager
+    async def consumer(self, *topics, **kwargs) -> InMemoryConsumer:
+        consumer = InMemoryConsumer(self.broker)
+        if topics:
+            consumer.subscribe(topics)
+        yield consumer
+
+
+@dataclass
+class SinkPostgresManager(PostgresManager):
+    """
+    `PostgresManager` that counts rows instead of writing them, after waiting
+    `latency` seconds per query to simulate a round trip.
+    """
+
+    latency: float = field(default=0.0)
+    rows: Dict[str, int] = field(
+        default_factory=lambda: collections.defaultdict(int), repr=False
+    )
+    queries: int = field(default=0, repr=False)
+    _checks: Dict[Tuple[str, str], int] = field(default_factory=dict, repr=False)
+    _error_codes: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    async def init(self) -> None:
+        pass
+
+    async def _query(self, operation: str) -> float:
+        self.queries += 1
+        start = time.perf_counter()
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return start
+
+    async def execute(self, query: str, *args, **kwargs) -> List[Dict[str, Any]]:
+        start = await self._query("execute")
+        rows = []
+        if "INSERT INTO public.checks" in query:
+            # bulk registration, see `CheckManager.register`
+            check_type, configs = args[0], args[1]
+            for index, config in enumerate(configs, start=1):
+                key = (check_type, repr(sorted(config.items())))
+                check_id = self._checks.setdefault(key, len(self._checks) + 1)
+                rows.append({"idx": index, "id": check_id})
+        elif "INSERT INTO public.error_codes" in query:
+            # see `EventWriter.error_codes`
+            for kind in args[0]:
+                code = self._error_codes.setdefault(kind, len(self._error_codes) + 1)
+                rows.append({"code": code, "kind": kind})
+        elif args and isinstance(args[0], list):
+            self.rows[query.split("INTO", 1)[-1].split()[0]] += len(args[0])
+        self._observe("execute", start, True)
+        return rows
+
+    async def copy_records(
+        self,
+        table: str,
+        records: Any,
+        columns: Sequence[str],
+        schema: str = "public",
+        on_conflict: Optional[str] = None,
+        reraise: Tuple[type, ...] = (),
+    ) -> Optional[str]:
+        start = await self._query("copy")
+        count = 0
+        for record in records:
+            # jsonb values are encoded by the connection codec when copied, see
+            # `PostgresManager.init`
+            for value in record:
+                if isinstance(value, (dict, list)):
+                    ujson.dumps(value)
+            count += 1
+        self.rows[f"{schema}.{table}"] += count
+        self._observe("copy", start, True)
+        return f"COPY {count}" if on_conflict is None else f"INSERT 0 {count}"
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,13 @@
+SET TIME ZONE 'UTC';
+
+-- checks are deduplicated on a hash of their type specific configuration
+ALTER TABLE public.checks ADD COLUMN IF NOT EXISTS config_hash TEXT;
+
+-- only the oldest of any existing duplicate configurations is hashed, others are
+-- retained (with no hash) as they may be referenced by existing events
+UPDATE public.checks c
+SET config_hash = md5(c.config::TEXT)
+WHERE c.config_hash IS NULL
+  AND c.id = (SELECT min(d.id) FROM public.checks d WHERE d.type = c.type AND d.config = c.config);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_check_type_config_hash ON public.checks (type, config_hash);
@@ -0,0 +1,32 @@
+SET TIME ZONE 'UTC';
+
+-- sum the values of two jsonb objects key by key, used to merge latency sketches
+CREATE OR REPLACE FUNCTION public.merge_counts(a JSONB, b JSONB) RETURNS JSONB AS
+$$
+SELECT COALESCE(jsonb_object_agg(key, total), '{}'::JSONB)
+FROM (
+       SELECT key, sum(value::BIGINT) AS total
+       FROM (
+              SELECT * FROM jsonb_each_text(COALESCE(a, '{}'::JSONB))
+              UNION ALL
+              SELECT * FROM jsonb_each_text(COALESCE(b, '{}'::JSONB))
+            ) kv
+       GROUP BY key
+     ) merged
+$$ LANGUAGE SQL IMMUTABLE;
+
+CREATE TABLE IF NOT EXISTS public.rollups
+(
+  check_id       INTEGER REFERENCES public.checks (id),
+  window_start   TIMESTAMPTZ      NOT NULL,
+  window_seconds INTEGER          NOT NULL,
+  count          BIGINT           NOT NULL DEFAULT 0,
+  errors         BIGINT           NOT NULL DEFAULT 0,
+  latency_sum    DOUBLE PRECISION NOT NULL DEFAULT 0,
+  latency_min    DOUBLE PRECISION,
+  latency_max    DOUBLE PRECISION,
+  sketch         JSONB            NOT NULL DEFAULT '{}'::JSONB,
+  PRIMARY KEY (check_id, window_seconds, window_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rollups_window_start ON public.rollups (window_start);
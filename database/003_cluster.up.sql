@@ -0,0 +1,22 @@
+SET TIME ZONE 'UTC';
+
+-- checks are run by the cluster until disabled, see `aiven.monitor.cluster`
+ALTER TABLE public.checks ADD COLUMN IF NOT EXISTS enabled BOOLEAN NOT NULL DEFAULT TRUE;
+
+-- nodes taking part in running checks, with their last heartbeat
+CREATE TABLE IF NOT EXISTS public.nodes
+(
+  name         TEXT PRIMARY KEY,
+  heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- checks are split into a fixed number of shards (check id modulo the number of
+-- shards), each leased to at most one node at a time; released_at is the time the
+-- previous owner stopped running the checks of a shard it handed over
+CREATE TABLE IF NOT EXISTS public.shards
+(
+  shard       INTEGER PRIMARY KEY,
+  node        TEXT,
+  expires_at  TIMESTAMPTZ,
+  released_at TIMESTAMPTZ
+);
@@ -0,0 +1,87 @@
+SET TIME ZONE 'UTC';
+
+-- events are range partitioned by day (requires PostgreSQL 11 or later), existing
+-- events are moved over to the partitioned table, see `aiven-monitor maintain`
+DO
+$$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('public.events')) = 'r' THEN
+    ALTER TABLE public.events RENAME TO events_legacy;
+    ALTER TABLE public.events_legacy RENAME CONSTRAINT events_pkey TO events_legacy_pkey;
+  END IF;
+END
+$$;
+
+-- ids are time ordered, unlike random uuids they are appended to the right of indexes
+CREATE SEQUENCE IF NOT EXISTS public.events_id_seq AS BIGINT;
+
+CREATE TABLE IF NOT EXISTS public.events
+(
+  id        BIGINT      NOT NULL DEFAULT nextval('public.events_id_seq'),
+  timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+  check_id  INTEGER REFERENCES public.checks (id),
+  result    JSONB,
+  PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE INDEX IF NOT EXISTS idx_events_check_id_timestamp ON public.events (check_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON public.events USING BRIN (timestamp);
+
+-- create the daily partitions (events_YYYYMMDD) of the days between from_day and
+-- to_day (inclusive) that do not exist yet, returning their names
+CREATE OR REPLACE FUNCTION public.create_events_partitions(from_day DATE, to_day DATE)
+  RETURNS SETOF TEXT AS
+$$
+DECLARE
+  day  DATE;
+  name TEXT;
+BEGIN
+  FOR day IN SELECT generate_series(from_day, to_day, INTERVAL '1 day')::DATE
+    LOOP
+      name := 'events_' || to_char(day, 'YYYYMMDD');
+      IF to_regclass('public.' || name) IS NULL THEN
+        EXECUTE format(
+          'CREATE TABLE public.%I PARTITION OF public.events FOR VALUES FROM (%L) TO (%L)',
+          name,
+          day::TIMESTAMP AT TIME ZONE 'UTC',
+          (day + 1)::TIMESTAMP AT TIME ZONE 'UTC'
+        );
+        RETURN NEXT name;
+      END IF;
+    END LOOP;
+END
+$$ LANGUAGE plpgsql;
+
+-- sum of latency sketches, used to merge rollups into larger windows
+DO
+$$
+BEGIN
+  IF to_regproc('public.merge_counts_agg') IS NULL THEN
+    CREATE AGGREGATE public.merge_counts_agg(JSONB) (
+      SFUNC = public.merge_counts,
+      STYPE = JSONB,
+      INITCOND = '{}'
+    );
+  END IF;
+END
+$$;
+
+DO
+$$
+BEGIN
+  IF to_regclass('public.events_legacy') IS NOT NULL THEN
+    PERFORM public.create_events_partitions(
+      COALESCE((SELECT min(timestamp) FROM public.events_legacy), now())::DATE,
+      (now() + INTERVAL '7 days')::DATE
+    );
+    -- copied in time order, so that ids follow time
+    INSERT INTO public.events (timestamp, check_id, result)
+      SELECT timestamp, check_id, result FROM public.events_legacy ORDER BY timestamp;
+    DROP TABLE public.events_legacy;
+  ELSE
+    PERFORM public.create_events_partitions(
+      now()::DATE, (now() + INTERVAL '7 days')::DATE
+    );
+  END IF;
+END
+$$;
@@ -0,0 +1,22 @@
+SET TIME ZONE 'UTC';
+
+-- number of failed results per kind of error (see CheckResult.error_kind)
+ALTER TABLE public.rollups ADD COLUMN IF NOT EXISTS error_kinds JSONB NOT NULL DEFAULT '{}'::JSONB;
+
+-- outcome of each event as aggregated in rollups, heartbeats excluded
+CREATE OR REPLACE VIEW public.event_outcomes AS
+SELECT id, timestamp, check_id, error_kind IS NOT NULL AS failed, error_kind, latency
+FROM (
+       SELECT id, timestamp, check_id,
+              CASE
+                WHEN result ->> 'error' IS NOT NULL
+                  THEN COALESCE(result ->> 'error_type', 'error')
+                WHEN COALESCE((result ->> 'status')::INTEGER, 0) >= 500
+                  THEN 'http_' || (result ->> 'status')
+                WHEN NOT COALESCE((result ->> 'connected')::BOOLEAN, TRUE)
+                  THEN 'not_connected'
+              END AS error_kind,
+              (result ->> 'elapsed')::DOUBLE PRECISION AS latency
+       FROM public.events
+       WHERE NOT result ? 'failing'
+     ) outcomes;
@@ -0,0 +1,11 @@
+SET TIME ZONE 'UTC';
+
+-- kafka partition and offset events were consumed from, so that events consumed more
+-- than once (redelivered or replayed, see `aiven-monitor replay`) are written once;
+-- NULL for events written before, which never conflict
+ALTER TABLE public.events
+  ADD COLUMN IF NOT EXISTS source_partition INTEGER,
+  ADD COLUMN IF NOT EXISTS source_offset BIGINT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_source
+  ON public.events (source_partition, source_offset, timestamp);
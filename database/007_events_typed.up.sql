@@ -0,0 +1,164 @@
+SET TIME ZONE 'UTC';
+
+-- kinds of errors of events (see CheckResult.error_kind), registered by consumers as
+-- they are first seen, see `aiven.monitor.events.EventWriter`
+CREATE TABLE IF NOT EXISTS public.error_codes
+(
+  code SMALLSERIAL PRIMARY KEY,
+  kind TEXT NOT NULL UNIQUE
+);
+
+-- results are stored in typed columns instead of a jsonb document; fields without a
+-- column are kept in extra, null fields omitted. The events table is rebuilt, and
+-- existing events are converted over, partition by partition, see below
+DO
+$$
+DECLARE
+  part TEXT;
+BEGIN
+  IF EXISTS(
+      SELECT 1
+      FROM information_schema.columns
+      WHERE table_schema = 'public' AND table_name = 'events' AND column_name = 'result'
+    ) THEN
+    DROP VIEW IF EXISTS public.event_outcomes;
+    ALTER TABLE public.events RENAME TO events_jsonb;
+    ALTER TABLE public.events_jsonb RENAME CONSTRAINT events_pkey TO events_jsonb_pkey;
+    ALTER INDEX public.idx_events_check_id_timestamp RENAME TO idx_events_jsonb_check_id_timestamp;
+    ALTER INDEX public.idx_events_timestamp RENAME TO idx_events_jsonb_timestamp;
+    ALTER INDEX public.idx_events_source RENAME TO idx_events_jsonb_source;
+    FOR part IN
+      SELECT c.relname
+      FROM pg_inherits i
+             JOIN pg_class c ON c.oid = i.inhrelid
+      WHERE i.inhparent = 'public.events_jsonb'::REGCLASS
+      LOOP
+        EXECUTE format(
+          'ALTER TABLE public.%I RENAME TO %I', part, 'jsonb_' || part
+        );
+      END LOOP;
+  END IF;
+END
+$$;
+
+-- columns are ordered by alignment, so that rows are not padded
+CREATE TABLE IF NOT EXISTS public.events
+(
+  id               BIGINT      NOT NULL DEFAULT nextval('public.events_id_seq'),
+  timestamp        TIMESTAMPTZ NOT NULL DEFAULT now(),
+  source_offset    BIGINT,
+  check_id         INTEGER REFERENCES public.checks (id),
+  source_partition INTEGER,
+  elapsed          REAL,
+  status           SMALLINT,
+  error_code       SMALLINT REFERENCES public.error_codes (code),
+  connected        BOOLEAN,
+  content_verified BOOLEAN,
+  heartbeat        BOOLEAN     NOT NULL DEFAULT FALSE,
+  extra            JSONB,
+  PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE INDEX IF NOT EXISTS idx_events_check_id_timestamp ON public.events (check_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON public.events USING BRIN (timestamp);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_source
+  ON public.events (source_partition, source_offset, timestamp);
+
+-- outcome of each event as aggregated in rollups, heartbeats excluded
+CREATE OR REPLACE VIEW public.event_outcomes AS
+SELECT e.id, e.timestamp, e.check_id, e.error_code IS NOT NULL AS failed,
+       c.kind AS error_kind, e.elapsed::DOUBLE PRECISION AS latency
+FROM public.events e
+       LEFT JOIN public.error_codes c ON c.code = e.error_code
+WHERE NOT e.heartbeat;
+
+-- kind of error of a jsonb result, as `aiven.monitor.events.error_kind`
+CREATE OR REPLACE FUNCTION pg_temp.result_error_kind(result JSONB) RETURNS TEXT AS
+$$
+SELECT CASE
+         WHEN result ->> 'error' IS NOT NULL
+           THEN COALESCE(result ->> 'error_type', 'error')
+         WHEN COALESCE((result ->> 'status')::INTEGER, 0) >= 500
+           THEN 'http_' || (result ->> 'status')
+         WHEN NOT COALESCE((result ->> 'connected')::BOOLEAN, TRUE)
+           THEN 'not_connected'
+       END
+$$ LANGUAGE SQL IMMUTABLE;
+
+-- heartbeats (stored without their type, the only results with `failing`) fail with
+-- the kind of error of the last result they summarise
+CREATE OR REPLACE FUNCTION pg_temp.error_kind(result JSONB) RETURNS TEXT AS
+$$
+SELECT CASE
+         WHEN NOT result ? 'failing'
+           THEN pg_temp.result_error_kind(result)
+         WHEN (result ->> 'failing')::BOOLEAN
+           THEN COALESCE(
+             pg_temp.result_error_kind(COALESCE(result -> 'last', '{}'::JSONB)), 'error'
+           )
+       END
+$$ LANGUAGE SQL IMMUTABLE;
+
+DO
+$$
+DECLARE
+  part TEXT;
+BEGIN
+  IF to_regclass('public.events_jsonb') IS NULL THEN
+    PERFORM public.create_events_partitions(
+      now()::DATE, (now() + INTERVAL '7 days')::DATE
+    );
+    RETURN;
+  END IF;
+
+  PERFORM public.create_events_partitions(
+    COALESCE((SELECT min(timestamp) FROM public.events_jsonb), now())::DATE,
+    (now() + INTERVAL '7 days')::DATE
+  );
+  INSERT INTO public.error_codes (kind)
+    SELECT DISTINCT pg_temp.error_kind(result) FROM public.events_jsonb
+    WHERE pg_temp.error_kind(result) IS NOT NULL
+  ON CONFLICT (kind) DO NOTHING;
+
+  -- each partition is converted and dropped in turn; the whole conversion runs in the
+  -- single transaction of the migration, so the space of dropped partitions is only
+  -- released on commit (all events are stored twice until then), and locks on every
+  -- converted partition are held until then too
+  FOR part IN
+    SELECT c.relname
+    FROM pg_inherits i
+           JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'public.events_jsonb'::REGCLASS
+    ORDER BY c.relname
+    LOOP
+      EXECUTE format(
+        $sql$
+        INSERT INTO public.events (
+          id, timestamp, source_offset, check_id, source_partition, elapsed, status,
+          error_code, connected, content_verified, heartbeat, extra
+        )
+          SELECT e.id, e.timestamp, e.source_offset, e.check_id, e.source_partition,
+                 (e.result ->> 'elapsed')::REAL,
+                 (e.result ->> 'status')::SMALLINT,
+                 c.code,
+                 (e.result ->> 'connected')::BOOLEAN,
+                 (e.result ->> 'content_verified')::BOOLEAN,
+                 COALESCE(e.result ? 'failing', FALSE),
+                 (
+                   SELECT jsonb_object_agg(key, value)
+                   FROM jsonb_each(
+                     e.result - 'elapsed' - 'status' - 'connected' - 'content_verified'
+                   )
+                   WHERE jsonb_typeof(value) <> 'null'
+                 )
+          FROM public.%I e
+                 LEFT JOIN public.error_codes c ON c.kind = pg_temp.error_kind(e.result)
+          ORDER BY e.timestamp
+        $sql$,
+        part
+      );
+      EXECUTE format('DROP TABLE public.%I', part);
+    END LOOP;
+  DROP TABLE public.events_jsonb;
+END
+$$;
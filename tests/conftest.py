@@ -41,6 +41,7 @@ def manager(kafka, postgres) -> CheckManager:
 @pytest.fixture(autouse=True)
 async def a_cleanup(postgres):
     await postgres.execute("DELETE FROM public.events WHERE TRUE")
+    await postgres.execute("DELETE FROM public.rollups WHERE TRUE")
     await postgres.execute("DELETE FROM public.checks WHERE TRUE")
     await postgres.execute("ALTER SEQUENCE checks_id_seq RESTART")
 
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from aiven.monitor.adaptive import AdaptiveInterval
+from aiven.monitor.http.check import HTTPCheckResult
+from aiven.service.ratelimit import HostRateLimiter
+
+
+def test_adaptive_interval_confirms_failures():
+    adaptive = AdaptiveInterval(retry_interval=5, retries=2, stable_after=3)
+    up = HTTPCheckResult(status=200, connected=True)
+    down = HTTPCheckResult(status=503, connected=True)
+    refused = HTTPCheckResult(error="refused", error_type="ClientConnectionError")
+
+    assert [adaptive.observe(1, 30, up) for _ in range(4)] == [30, 30, 60, 60]
+
+    # a failure is re-probed until observed on two re-probes
+    assert [adaptive.observe(1, 30, down) for _ in range(4)] == [5, 5, 30, 30]
+    assert adaptive.observe(1, 30, up) == 30
+
+    # flapping states are re-probed at most twice in a row
+    assert adaptive.observe(1, 30, down) == 5
+    assert adaptive.observe(1, 30, refused) == 5
+    assert adaptive.observe(1, 30, down) == 30
+    assert adaptive.observe(1, 30, refused) == 5
+
+    # re-probes are never slower than the interval of the check
+    assert adaptive.observe(2, 2, down) == 2
+    adaptive.forget(1)
+    assert adaptive.observe(1, 30, up) == 30
+
+    with pytest.raises(ValueError):
+        AdaptiveInterval(retry_interval=0)
+
+
+@pytest.mark.asyncio
+async def test_host_rate_limiter():
+    limiter = HostRateLimiter(rate=50, burst=2)
+    loop = asyncio.get_event_loop()
+
+    start = loop.time()
+    waited = await asyncio.gather(*(limiter.acquire("a") for _ in range(6)))
+    await limiter.acquire("b")
+    elapsed = loop.time() - start
+
+    # the burst is served immediately, other requests are spread at the rate
+    assert waited[:2] == [0, 0]
+    assert waited[2:] == pytest.approx([0.02, 0.04, 0.06, 0.08], abs=0.005)
+    assert elapsed == pytest.approx(0.08, abs=0.03)
+    assert (limiter.stats.acquired, limiter.stats.throttled) == (7, 4)
+
+    assert await HostRateLimiter(rate=0).acquire("a") == 0
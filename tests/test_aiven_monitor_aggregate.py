@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from aiven.monitor.aggregate import Aggregator, LatencySketch, Rollup
+from aiven.monitor.http.check import HTTPCheckResult
+
+
+def test_latency_sketch_merge_quantiles():
+    values = [random.lognormvariate(-3, 1) for _ in range(10000)]
+    sketches = [LatencySketch(), LatencySketch()]
+    for index, value in enumerate(values):
+        sketches[index % 2].add(value)
+
+    sketch = LatencySketch.from_dict(sketches[0].to_dict())
+    sketch.merge(sketches[1])
+    assert sketch.count == len(values)
+
+    values.sort()
+    for q in (0.5, 0.9, 0.99):
+        expected = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(expected, rel=0.02)
+
+
+def test_latency_sketch_bounds():
+    sketch = LatencySketch()
+    for _ in range(10):
+        sketch.add(0.99)
+    assert sketch.quantile(0.5) == pytest.approx(0.99, rel=0.02)
+
+    for _ in range(30):
+        sketch.add(0.0)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(0.99) == pytest.approx(0.99, rel=0.02)
+    assert LatencySketch.from_dict(sketch.to_dict()).buckets == sketch.buckets
+
+
+def test_aggregator_windows():
+    aggregator = Aggregator(window=60)
+    for i in range(10):
+        aggregator.record(
+            1,
+            HTTPCheckResult(
+                timestamp=120 + i,
+                connected=True,
+                status=503 if i == 0 else 200,
+                elapsed=0.1 * (i + 1),
+            ),
+        )
+    aggregator.record(
+        2,
+        HTTPCheckResult(
+            timestamp=185, error="Connection refused", error_type="ClientOSError"
+        ),
+    )
+
+    assert aggregator.flush(now=150) == []
+
+    (rollup,) = aggregator.flush(now=180)
+    assert rollup.check_id == 1
+    assert rollup.window_start == 120
+    assert rollup.count == 10
+    assert rollup.errors == 1
+    assert rollup.error_kinds == {"http_503": 1}
+    assert rollup.latency_min == pytest.approx(0.1)
+    assert rollup.latency_max == pytest.approx(1.0)
+    assert Rollup.from_dict(rollup.to_dict()) == rollup
+
+    (rollup,) = aggregator.flush()
+    assert rollup.check_id == 2
+    assert rollup.errors == 1
+    assert rollup.error_kinds == {"ClientOSError": 1}
+    assert rollup.latency_min is None
+
+
+@pytest.mark.parametrize("include_dns, expected", [(True, 0.3), (False, 0.25)])
+def test_aggregator_dns_latency(include_dns, expected):
+    aggregator = Aggregator(window=60, include_dns=include_dns)
+    aggregator.record(
+        1, HTTPCheckResult(timestamp=0, connected=True, elapsed=0.3, dns=0.05)
+    )
+    aggregator.record(2, HTTPCheckResult(timestamp=0, connected=True, elapsed=0.3))
+
+    rollups = sorted(aggregator.flush(), key=lambda r: r.check_id)
+    assert rollups[0].latency_max == pytest.approx(expected)
+    assert rollups[1].latency_max == pytest.approx(0.3)
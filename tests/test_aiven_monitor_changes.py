@@ -0,0 +1,84 @@
+import pytest
+
+from aiven.monitor.changes import ChangeFilter, Heartbeat
+from aiven.monitor.codec import decode_event, encode_event
+from aiven.monitor.http.check import HTTPCheckResult
+
+
+def ok(timestamp, elapsed=0.1):
+    return HTTPCheckResult(
+        timestamp=timestamp,
+        status=200,
+        connected=True,
+        content_verified=True,
+        elapsed=elapsed,
+    )
+
+
+def down(timestamp):
+    return HTTPCheckResult(
+        timestamp=timestamp,
+        error="Connection refused",
+        error_type="ClientConnectorError",
+    )
+
+
+def test_change_filter_publishes_changes_only():
+    changes = ChangeFilter(heartbeat_interval=300)
+
+    first = ok(0)
+    assert changes.observe(1, first) == [first]
+    for timestamp in range(30, 300, 30):
+        assert changes.observe(1, ok(timestamp, elapsed=timestamp / 1000)) == []
+
+    # the outage edge is published right after a heartbeat summarising the ticks
+    outage = down(300)
+    heartbeat, event = changes.observe(1, outage)
+    assert event is outage
+    assert isinstance(heartbeat, Heartbeat)
+    assert heartbeat.count == 9
+    assert heartbeat.since == 30
+    assert heartbeat.timestamp == 270
+    assert heartbeat.failed is False
+    assert heartbeat.latency_min == pytest.approx(0.03)
+    assert heartbeat.latency_max == pytest.approx(0.27)
+    assert heartbeat.latency_mean == pytest.approx(0.15)
+    assert heartbeat.last["status"] == 200
+
+    # a different error message of the same class is not a state change
+    assert changes.observe(1, down(330)) == []
+    recovered = ok(360)
+    heartbeat, event = changes.observe(1, recovered)
+    assert event is recovered
+    assert heartbeat.failed is True
+    assert heartbeat.error == "Connection refused"
+
+
+def test_change_filter_heartbeat_interval():
+    changes = ChangeFilter(heartbeat_interval=60)
+    published = []
+    for timestamp in range(0, 300, 10):
+        published.extend(changes.observe(1, ok(timestamp)))
+        published.extend(changes.observe(2, down(timestamp)))
+
+    heartbeats = [event for event in published if isinstance(event, Heartbeat)]
+    assert len(published) == 2 + len(heartbeats)
+    assert len(heartbeats) == 8
+    assert all(h.count == 6 for h in heartbeats)
+
+    pending = changes.flush()
+    assert [(check_id, h.count) for check_id, h in pending] == [(1, 5), (2, 5)]
+    assert changes.flush() == []
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_heartbeat_codec(binary):
+    changes = ChangeFilter()
+    changes.observe(1, ok(0))
+    changes.observe(1, ok(30))
+    ((_, heartbeat),) = changes.flush()
+
+    check_id, result = decode_event(encode_event(1, heartbeat, binary=binary))
+    assert check_id == 1
+    assert result["count"] == 1
+    assert result["last"]["status"] == 200
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from aiven.monitor.cli import monitor
+
+
+def test_cli_imports_subsystems_lazily():
+    # a fresh interpreter, as modules may already be imported by other tests
+    modules = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys, aiven.monitor.cli; print(' '.join(sys.modules))",
+        ]
+    ).split()
+    for module in (b"aiohttp", b"aiokafka", b"asyncpg", b"cafeteria"):
+        assert module not in modules
+
+
+def test_cli_event_loop_option():
+    result = CliRunner().invoke(monitor, ["--loop", "trio", "http"])
+    assert result.exit_code == 2
+    assert "--loop" in result.output
+
+    result = CliRunner().invoke(monitor, ["--loop", "asyncio", "http"])
+    assert "At least one url" in result.output
@@ -0,0 +1,193 @@
+import asyncio
+import collections
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from aiven.monitor import Check, CheckResult
+from aiven.monitor.cluster import ClusterCoordinator, first_tick_delay, shard_owner
+from aiven.monitor.scheduler import Scheduler
+
+
+def test_shard_owner_balanced_and_stable():
+    nodes = [f"node-{i}" for i in range(4)]
+    owners = {shard: shard_owner(nodes, shard) for shard in range(1024)}
+    counts = collections.Counter(owners.values())
+    assert set(counts) == set(nodes)
+    assert all(200 < count < 320 for count in counts.values())
+
+    # only the shards of a node leaving move
+    remaining = nodes[1:]
+    for shard, owner in owners.items():
+        if owner != "node-0":
+            assert shard_owner(remaining, shard) == owner
+    assert shard_owner([], 0) is None
+
+
+def test_first_tick_delay():
+    offset = 7 * 0.6180339887498949 % 1.0 * 10
+    now = 1000 + offset + 4
+    assert first_tick_delay(7, 10, now) == pytest.approx(6)
+    # the run due 4 seconds ago was not run by the previous owner
+    assert first_tick_delay(7, 10, now, resume_from=now - 5) == 0
+    assert first_tick_delay(7, 10, now, resume_from=now - 3) == pytest.approx(6)
+
+
+class FakeClusterPostgres:
+    """
+    Emulates the queries of `ClusterCoordinator` against in-memory tables.
+    """
+
+    def __init__(self, check_ids):
+        self.checks = {i: dict(id=i, enabled=True) for i in check_ids}
+        self.nodes = {}
+        self.shards = {}
+
+    @staticmethod
+    def _now():
+        return datetime.now(tz=timezone.utc)
+
+    async def execute(self, query, *args):
+        await asyncio.sleep(0)
+        now = self._now()
+        if "INSERT INTO public.shards" in query:
+            for shard in range(args[0]):
+                self.shards.setdefault(
+                    shard, dict(node=None, expires_at=None, released_at=None)
+                )
+            return []
+        if "count(*)" in query:
+            return [dict(shards=len(self.shards))]
+        if "INSERT INTO public.nodes" in query:
+            self.nodes[args[0]] = now
+            horizon = now - timedelta(seconds=args[1])
+            return [dict(name=n) for n, t in self.nodes.items() if t > horizon]
+        if "DELETE FROM public.nodes" in query:
+            self.nodes.pop(args[0], None)
+            return []
+        if "SET node = NULL" in query:
+            for shard in args[1]:
+                if self.shards[shard]["node"] == args[0]:
+                    self.shards[shard] = dict(
+                        node=None, expires_at=None, released_at=args[2]
+                    )
+            return []
+        if "UPDATE public.shards s" in query:
+            node, shards, ttl = args
+            rows = []
+            for shard in shards:
+                previous = self.shards[shard]
+                if previous["node"] not in (None, node) and (
+                    previous["expires_at"] >= now
+                ):
+                    continue
+                resume_from = previous["released_at"] or (
+                    previous["expires_at"]
+                    and previous["expires_at"] - timedelta(seconds=ttl)
+                )
+                self.shards[shard] = dict(
+                    node=node,
+                    expires_at=now + timedelta(seconds=ttl),
+                    released_at=None,
+                )
+                rows.append(dict(shard=shard, resume_from=resume_from))
+            return rows
+        if "SELECT id FROM public.checks" in query:
+            _, shards, owned = args
+            return [
+                dict(id=i)
+                for i, check in self.checks.items()
+                if check["enabled"] and i % shards in owned
+            ]
+        if "SELECT id, config" in query:
+            return [dict(id=i, config=dict(id=i)) for i in args[0]]
+        raise AssertionError(f"Unexpected query: {query}")
+
+
+@dataclass
+class RecordingCheck(Check):
+    id: int = field(default=0)
+    interval: float = field(default=0.2)
+
+    async def probe(self) -> CheckResult:
+        return CheckResult()
+
+
+class RecordingManager:
+    """
+    Subset of `CheckManager` used by the coordinator, recording when checks run.
+    """
+
+    def __init__(self, postgres, ticks):
+        self.postgres = postgres
+        self.scheduler = Scheduler()
+        self.ticks = ticks
+        self._jobs = {}
+
+    async def _tick(self, check_id):
+        self.ticks[check_id].append(time.time())
+
+    async def schedule_many(self, check_type, check_ids, checks, delays=None):
+        for check_id, check, delay in zip(check_ids, checks, delays):
+            self._jobs[check_id] = self.scheduler.schedule(
+                lambda c=check_id: self._tick(c), check.interval, delay
+            )
+        self.scheduler.start()
+
+    async def unschedule_many(self, check_ids, dues=None):
+        if dues is not None:
+            await self.scheduler.cancel_from(
+                {self._jobs[c]: dues[c] for c in check_ids}
+            )
+        for check_id in check_ids:
+            self.scheduler.cancel(self._jobs.pop(check_id))
+
+
+@pytest.mark.asyncio
+async def test_cluster_handoff():
+    postgres = FakeClusterPostgres(range(1, 41))
+    ticks = collections.defaultdict(list)
+
+    def node(name):
+        return ClusterCoordinator(
+            RecordingManager(postgres, ticks),
+            "test",
+            lambda config: RecordingCheck(**config),
+            node=name,
+            shards=16,
+            lease_ttl=0.5,
+            heartbeat_interval=0.05,
+        )
+
+    first, second = node("first"), node("second")
+    tasks = [asyncio.ensure_future(first.run())]
+    await asyncio.sleep(0.5)
+    assert first.owned == set(range(16))
+
+    # a node joining takes over its shards
+    tasks.append(asyncio.ensure_future(second.run()))
+    await asyncio.sleep(0.5)
+    assert first.owned and second.owned
+    assert first.owned | second.owned == set(range(16))
+    assert not first.owned & second.owned
+
+    # a node leaving hands its shards over
+    tasks[0].cancel()
+    await first.close()
+    await asyncio.sleep(0.5)
+    assert second.owned == set(range(16))
+
+    tasks[1].cancel()
+    await second.close()
+    for task in tasks:
+        await asyncio.gather(task, return_exceptions=True)
+    for manager in (first.manager, second.manager):
+        await manager.scheduler.close()
+
+    # every check ran once per interval, on the same grid across nodes
+    for check_id in range(1, 41):
+        intervals = [b - a for a, b in zip(ticks[check_id], ticks[check_id][1:])]
+        assert len(intervals) >= 5
+        assert all(0.1 < i < 0.3 for i in intervals), (check_id, intervals)
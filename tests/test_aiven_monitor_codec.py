@@ -0,0 +1,63 @@
+import struct
+import subprocess
+import sys
+from dataclasses import asdict
+
+import pytest
+
+from aiven.monitor.codec import decode_event, encode_event
+from aiven.monitor.http.check import HTTPCheckResult
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        HTTPCheckResult(
+            status=200, connected=True, content_verified=True, elapsed=0.25, dns=0.01
+        ),
+        HTTPCheckResult(error="Connection refused: GET http://somewhere/ ☃"),
+    ],
+)
+def test_codec_round_trip(result):
+    json_event = encode_event(42, result)
+    binary_event = encode_event(42, result, binary=True)
+
+    assert len(binary_event) < len(json_event)
+    assert decode_event(json_event) == (42, asdict(result))
+    assert decode_event(binary_event) == (42, asdict(result))
+
+
+def test_codec_slotted_result():
+    result = HTTPCheckResult(status=200)
+    assert not hasattr(result, "__dict__")
+    with pytest.raises(AttributeError):
+        result.unknown = True
+    result.throttled = 0.5
+    assert decode_event(encode_event(1, result, binary=True))[1]["throttled"] == 0.5
+
+
+def test_codec_invalid_binary_event():
+    event = encode_event(1, HTTPCheckResult(), binary=True)
+
+    with pytest.raises(ValueError):
+        decode_event(event[:10])
+
+    with pytest.raises(ValueError):
+        decode_event(event[:2] + struct.pack("!I", 0) + event[6:])
+
+
+def test_codec_decode_builtin_result_types():
+    # consumers decode events without importing the checks publishing them
+    event = encode_event(42, HTTPCheckResult(status=200), binary=True)
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys\n"
+            "from aiven.monitor.codec import decode_event\n"
+            "assert 'aiven.monitor.http.check' not in sys.modules\n"
+            "print(decode_event(bytes.fromhex(sys.argv[1]))[1]['status'])",
+            event.hex(),
+        ]
+    )
+    assert output.strip() == b"200"
@@ -0,0 +1,27 @@
+import pytest
+
+from aiven.monitor.config import load_check_configs
+
+
+def test_load_check_configs_json(tmp_path):
+    path = tmp_path / "checks.json"
+    path.write_text('[{"url": "https://aiven.io/", "regex": "Aiven"}]')
+    assert load_check_configs(str(path)) == [
+        {"url": "https://aiven.io/", "regex": "Aiven"}
+    ]
+
+
+def test_load_check_configs_yaml(tmp_path):
+    pytest.importorskip("yaml")
+    path = tmp_path / "checks.yaml"
+    path.write_text("checks:\n  - url: https://aiven.io/\n    interval: 10\n")
+    assert load_check_configs(str(path)) == [
+        {"url": "https://aiven.io/", "interval": 10}
+    ]
+
+
+def test_load_check_configs_invalid(tmp_path):
+    path = tmp_path / "checks.json"
+    path.write_text('{"url": "https://aiven.io/"}')
+    with pytest.raises(ValueError):
+        load_check_configs(str(path))
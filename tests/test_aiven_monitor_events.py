@@ -0,0 +1,135 @@
+from collections import namedtuple
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from aiven.monitor.changes import Heartbeat
+from aiven.monitor.codec import encode_event
+from aiven.monitor.events import (
+    EVENT_COLUMNS,
+    decode_event_record,
+    error_kind,
+    event_record,
+)
+from aiven.monitor.http.check import HTTPCheck, HTTPCheckResult
+
+Message = namedtuple("Message", ["topic", "partition", "offset", "timestamp", "value"])
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        HTTPCheckResult(status=200, connected=True, content_verified=True),
+        HTTPCheckResult(status=503, connected=True),
+        HTTPCheckResult(connected=False),
+        HTTPCheckResult(error="timeout", error_type="TimeoutError"),
+        HTTPCheckResult(error="timeout"),
+    ],
+)
+def test_events_error_kind(result):
+    assert error_kind(asdict(result)) == result.error_kind()
+
+
+def test_events_record():
+    now = datetime.now(tz=timezone.utc)
+    result = asdict(
+        HTTPCheckResult(status=200, connected=True, elapsed=0.25, bytes_read=11)
+    )
+    result.pop("timestamp")
+    record = event_record(now, 42, result, 1, 1000)
+    assert len(record) == len(EVENT_COLUMNS)
+    assert dict(zip(EVENT_COLUMNS, record)) == {
+        "timestamp": now,
+        "check_id": 42,
+        "source_partition": 1,
+        "source_offset": 1000,
+        "status": 200,
+        "elapsed": 0.25,
+        "connected": True,
+        "content_verified": False,
+        "error_code": None,
+        "heartbeat": False,
+        "extra": {"bytes_read": 11, "body_truncated": False, "content_cached": False},
+    }
+
+    heartbeat = asdict(
+        Heartbeat(error="timeout", count=3, failing=True, last={"error": "timeout"})
+    )
+    heartbeat.pop("timestamp")
+    record = dict(zip(EVENT_COLUMNS, event_record(now, 42, heartbeat, heartbeat=True)))
+    assert record["heartbeat"] is True
+    assert record["error_code"] == "error"
+    assert record["extra"] == {
+        "error": "timeout",
+        "count": 3,
+        "failing": True,
+        "last": {"error": "timeout"},
+    }
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_events_decode_heartbeat(binary):
+    # failing heartbeat of a 5xx outage, without an error of its own
+    last = asdict(HTTPCheckResult(status=503, connected=True))
+    heartbeat = Heartbeat(count=3, failing=True, last=last)
+    value = encode_event(42, heartbeat, binary=binary)
+    record = dict(
+        zip(EVENT_COLUMNS, decode_event_record(Message("events", 0, 1, 0, value)))
+    )
+    assert record["heartbeat"] is True
+    assert record["error_code"] == "http_503"
+
+    value = encode_event(42, HTTPCheckResult(status=503), binary=binary)
+    record = dict(
+        zip(EVENT_COLUMNS, decode_event_record(Message("events", 0, 2, 0, value)))
+    )
+    assert record["heartbeat"] is False
+    assert record["error_code"] == "http_503"
+
+
+@pytest.mark.asyncio
+async def test_events_writer(manager, postgres):
+    (check_id,) = await manager.register("http", [HTTPCheck(url="https://aiven.io")])
+    now = datetime.now(tz=timezone.utc)
+    records = [
+        event_record(now, check_id, dict(status=503), 0, 1),
+        event_record(now, check_id, dict(error="timeout"), 0, 2),
+        event_record(now, check_id, dict(status=200, elapsed=0.1), 0, 3),
+    ]
+    assert await manager.events.write(records) == 3
+    assert await manager.events.write(records) == 0
+
+    rows = await postgres.execute(
+        """
+        SELECT failed, error_kind FROM public.event_outcomes
+        WHERE check_id=$1 ORDER BY id
+        """,
+        check_id,
+    )
+    assert [tuple(r) for r in rows] == [
+        (True, "http_503"),
+        (True, "error"),
+        (False, None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_events_writer_partitions_and_rejected(manager, postgres):
+    (check_id,) = await manager.register("http", [HTTPCheck(url="https://aiven.io")])
+    # beyond the partitions created ahead of time by the migrations
+    later = datetime.now(tz=timezone.utc) + timedelta(days=30)
+    records = [
+        event_record(later, check_id, dict(status=200), 0, 1),
+        event_record(later, -1, dict(status=200), 0, 2),
+        event_record(later, check_id, dict(status=200), 0, 3),
+    ]
+    rejected = []
+    assert await manager.events.write(records, rejected) == 2
+    assert [r[1] for r in rejected] == [-1]
+
+    rows = await postgres.execute(
+        "SELECT source_offset FROM public.events WHERE check_id=$1 ORDER BY id",
+        check_id,
+    )
+    assert [r["source_offset"] for r in rows] == [1, 3]
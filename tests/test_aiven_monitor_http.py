@@ -2,9 +2,14 @@ import asyncio
 from dataclasses import asdict
 from typing import Optional
 
+import aiohttp
 import pytest
+from yarl import URL
 
-from aiven.monitor.http.check import HTTPCheck, HTTPCheckResult
+from aiven.monitor.http.assertions import Assertions, PatternSet
+from aiven.monitor.http.check import HTTPCheck, HTTPCheckResult, trace_config
+from aiven.service.http import HTTPManager
+from aiven.service.ratelimit import HostRateLimiter
 
 
 @pytest.mark.asyncio
@@ -31,11 +36,22 @@ async def test_http_check_aiven_io():
     success = results[0]
     isinstance(success.pop("timestamp"), float)
     assert isinstance(success.pop("elapsed"), float)
+    assert 0 < success.pop("bytes_read") <= check.max_body_size
+    assert isinstance(success.pop("body_truncated"), bool)
+    assert isinstance(success.pop("ttfb"), float)
+    assert isinstance(success.pop("transfer"), float)
+    for phase in ("queued", "dns", "connect"):
+        duration = success.pop(phase)
+        assert duration is None or duration >= 0
     assert success == {
         "connected": True,
         "content_verified": True,
         "error": None,
+        "error_type": None,
+        "content_cached": False,
         "status": 200,
+        "throttled": None,
+        "failed_assertions": [],
     }
 
 
@@ -71,6 +87,17 @@ async def test_http_check_simple(aioresponse):
         "content_verified": True,
         "error": None,
         "status": 200,
+        "bytes_read": 11,
+        "body_truncated": False,
+        "error_type": None,
+        "content_cached": False,
+        "queued": None,
+        "dns": None,
+        "connect": None,
+        "ttfb": None,
+        "transfer": None,
+        "throttled": None,
+        "failed_assertions": [],
     }
 
     error = results[1]
@@ -81,4 +108,255 @@ async def test_http_check_simple(aioresponse):
         "content_verified": False,
         "error": "Connection refused: GET http://somewhere/foo/bar",
         "status": None,
+        "bytes_read": 0,
+        "body_truncated": False,
+        "error_type": "ClientConnectionError",
+        "content_cached": False,
+        "queued": None,
+        "dns": None,
+        "connect": None,
+        "ttfb": None,
+        "transfer": None,
+        "throttled": None,
+        "failed_assertions": None,
     }
+
+
+@pytest.mark.asyncio
+async def test_http_check_streaming_content(aioresponse):
+    body = "a" * 10000 + "Hello World" + "b" * 10000
+    url = "http://somewhere/large"
+
+    aioresponse.get(url, status=200, body=body, repeat=True)
+
+    check = HTTPCheck(url=url, regex=r"Hello World", chunk_size=1000)
+    result = await check.probe()
+    assert result.content_verified is True
+    assert result.bytes_read == 11000
+    assert result.body_truncated is True
+    await check.close()
+
+    check = HTTPCheck(url=url, regex=r"Goodbye", max_body_size=5000, chunk_size=1000)
+    result = await check.probe()
+    assert result.content_verified is False
+    assert result.bytes_read == 5000
+    assert result.body_truncated is True
+    await check.close()
+
+    check = HTTPCheck(url=url, regex=r"Goodbye", chunk_size=1000)
+    result = await check.probe()
+    assert result.content_verified is False
+    assert result.bytes_read == len(body)
+    assert result.body_truncated is False
+    await check.close()
+
+    # fingerprinting reads the whole body, the first match does not stop the scan
+    check = HTTPCheck(
+        url=url, regex=r"Hello World", chunk_size=1000, fingerprint_body=True
+    )
+    result = await check.probe()
+    assert result.content_verified is True
+    assert result.bytes_read == len(body)
+    await check.close()
+
+
+@pytest.mark.asyncio
+async def test_http_check_conditional(aioresponse):
+    url = "http://somewhere/static"
+    check = HTTPCheck(url=url, regex=r"Hello World", fingerprint_body=True)
+
+    aioresponse.get(url, status=200, body="Hello World", headers={"ETag": '"v1"'})
+    aioresponse.get(url, status=304)
+    aioresponse.get(url, status=200, body="Goodbye World")
+    aioresponse.get(url, status=200, body="Goodbye World")
+
+    result = await check.probe()
+    assert result.content_verified is True
+    assert result.content_cached is False
+
+    # not modified, verification is reused without reading a body
+    result = await check.probe()
+    request = aioresponse.requests[("GET", URL(url))][1]
+    assert request.kwargs["headers"]["If-None-Match"] == '"v1"'
+    assert result.status == 304
+    assert result.content_verified is True
+    assert result.content_cached is True
+    assert result.bytes_read == 0
+
+    # changed body without validators is verified, then fingerprinted
+    result = await check.probe()
+    assert result.content_verified is False
+    assert result.content_cached is False
+    result = await check.probe()
+    request = aioresponse.requests[("GET", URL(url))][3]
+    assert "If-None-Match" not in request.kwargs["headers"]
+    assert result.content_verified is False
+    assert result.content_cached is True
+    assert result.bytes_read == 13
+    await check.close()
+
+
+@pytest.mark.asyncio
+async def test_http_check_shared_session(aioresponse):
+    results = []
+    http = HTTPManager(trace_configs=[trace_config])
+    checks = [
+        HTTPCheck(url=f"http://somewhere/{i}", regex=r"World", interval=60)
+        for i in range(3)
+    ]
+    session = await http.session()
+
+    async def callback(result):
+        results.append(asdict(result))
+
+    for check in checks:
+        aioresponse.get(check.url, status=200, body="Hello World")
+
+    tasks = [
+        asyncio.create_task(check.start(callback=callback, session=session))
+        for check in checks
+    ]
+    await asyncio.sleep(0.1)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert await http.session() is session
+    await http.close()
+    assert session.closed
+
+    assert len(results) == 3
+    for result in results:
+        assert result["status"] == 200
+        assert result["content_verified"] is True
+
+
+@pytest.mark.asyncio
+async def test_http_check_errors(aioresponse):
+    url = "http://somewhere/slow"
+    check = HTTPCheck(url=url, regex=r"Hello", timeout=1)
+    aioresponse.get(url, exception=asyncio.TimeoutError())
+    aioresponse.get(url, exception=aiohttp.ClientPayloadError("Response truncated"))
+
+    result = await check.probe()
+    assert result.failed
+    assert result.error == "Timed out after 1s: GET http://somewhere/slow"
+    assert result.error_type == "TimeoutError"
+
+    result = await check.probe()
+    assert result.failed
+    assert (result.error, result.error_type) == (
+        "Response truncated",
+        "ClientPayloadError",
+    )
+    await check.close()
+
+
+@pytest.mark.asyncio
+async def test_http_check_rate_limited(aioresponse):
+    limiter = HostRateLimiter(rate=20, burst=1)
+    checks = [HTTPCheck(url=f"http://somewhere/{i}", interval=60) for i in range(3)]
+    for check in checks:
+        aioresponse.get(check.url, status=200, body="Hello World")
+
+    results = await asyncio.gather(
+        *(check.probe(rate_limiter=limiter) for check in checks)
+    )
+    assert [r.status for r in results] == [200, 200, 200]
+    assert [r.throttled for r in results] == pytest.approx([0, 0.05, 0.1], abs=0.01)
+    for check in checks:
+        await check.close()
+
+
+@pytest.mark.asyncio
+async def test_http_check_assertions(aioresponse):
+    url = "http://somewhere/api"
+    body = '{"status": "ok", "data": {"items": [{"id": 7}], "total": 1}}'
+    headers = {"Content-Type": "application/json", "ETag": '"v1"'}
+    check = HTTPCheck(
+        url=url,
+        regex=r'"status"',
+        assertions={
+            "regex": [r'"total": \d+', r"Goodbye"],
+            "headers": {"Content-Type": r"^application/json", "X-Request-Id": None},
+            "json": [
+                {"path": "status", "equals": "ok"},
+                {"path": "data.items.0.id", "gte": 1, "lt": 10},
+                {"path": "data.missing", "exists": False},
+                {"path": "data.total", "gt": 1},
+            ],
+            "max_response_time": 5,
+        },
+    )
+
+    aioresponse.get(url, status=200, body=body, headers=headers)
+    aioresponse.get(url, status=304)
+    aioresponse.get(url, status=200, body="not json", content_type="text/plain")
+
+    result = await check.probe()
+    assert result.content_verified is False
+    assert result.failed_assertions == [
+        "header:X-Request-Id",
+        "regex:Goodbye",
+        "json:data.total",
+    ]
+
+    # not modified, header and body assertions are reused
+    result = await check.probe()
+    assert result.content_cached is True
+    assert result.failed_assertions == [
+        "header:X-Request-Id",
+        "regex:Goodbye",
+        "json:data.total",
+    ]
+
+    result = await check.probe()
+    assert result.content_cached is False
+    assert result.failed_assertions == [
+        "header:Content-Type",
+        "header:X-Request-Id",
+        "regex:\"status\"",
+        "regex:\"total\": \\d+",
+        "regex:Goodbye",
+        "json:status",
+        "json:data.items.0.id",
+        "json:data.missing",
+        "json:data.total",
+    ]
+    await check.close()
+
+    with pytest.raises(ValueError):
+        HTTPCheck(url=url, assertions={"regexes": ["typo"]})
+    with pytest.raises(ValueError):
+        HTTPCheck(url=url, assertions={"json": [{"path": "a", "near": 1}]})
+
+
+def test_http_check_assertions_patterns():
+    # patterns are compiled once and shared across checks
+    first = HTTPCheck(url="http://somewhere/1", assertions={"regex": ["a+", "b"]})
+    second = HTTPCheck(url="http://somewhere/2", assertions={"regex": ["a+", "b"]})
+    assert first._assertions.patterns is second._assertions.patterns
+
+    # overlapping matches, groups and flags are all found in a single scan
+    patterns = PatternSet(["Hello World", "World", "lo", r"(?i)HELLO", r"(\w+) \1"])
+    found = set()
+    patterns.search("Hello World, hey hey", found)
+    assert found == {0, 1, 2, 3, 4}
+
+    found = set()
+    patterns.search("World", found)
+    assert found == {1}
+
+    assertions = Assertions(regexes=["Hello", "World"])
+    scan = assertions.scan(match_window=16)
+    scan.feed(b"Hel")
+    assert not scan.complete
+    scan.feed(b"lo Wor")
+    scan.feed(b"ld")
+    assert scan.complete
+    assert scan.failures() == []
+    assert Assertions.from_config({}) is None
+    # invalid values are rejected with or without a regex
+    for regex in (None, "Hello"):
+        with pytest.raises(ValueError):
+            Assertions.from_config({"max_response_time": 0}, regex)
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from aiven.monitor.aggregate import LatencySketch
+from aiven.monitor.events import event_record
+from aiven.monitor.http.check import HTTPCheck
+from aiven.monitor.maintenance import Maintenance
+
+
+@pytest.mark.asyncio
+async def test_maintenance(manager, postgres):
+    (check_id,) = await manager.register("http", [HTTPCheck(url="https://aiven.io")])
+    maintenance = Maintenance(postgres, partitions_ahead=2, retention=3)
+    today = datetime.now(tz=timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    await maintenance.create_partitions(since=(today - timedelta(5)).date())
+    assert f"events_{(today + timedelta(2)):%Y%m%d}" in {
+        name for name, _ in await maintenance.partitions()
+    }
+    assert not await maintenance.create_partitions()
+
+    expired = today - timedelta(days=5) + timedelta(minutes=1)
+    records = [
+        event_record(
+            expired + timedelta(seconds=10), check_id, dict(elapsed=0.1, status=200)
+        ),
+        event_record(
+            expired + timedelta(seconds=20), check_id, dict(elapsed=0.3, status=503)
+        ),
+        event_record(expired + timedelta(seconds=30), check_id, dict(error="timeout")),
+        event_record(today, check_id, dict(elapsed=0.2, status=200)),
+    ]
+    assert await manager.events.write(records)
+
+    try:
+        dropped = await maintenance.drop_expired_partitions()
+        # partitions are dropped once all their events are past the retention period
+        assert f"events_{today - timedelta(5):%Y%m%d}" in dropped
+        assert f"events_{today - timedelta(4):%Y%m%d}" in dropped
+        assert f"events_{today - timedelta(3):%Y%m%d}" not in dropped
+        events = await postgres.execute("SELECT timestamp FROM public.events")
+        assert [e["timestamp"] for e in events] == [today]
+
+        rollups = await postgres.execute("SELECT * FROM public.rollups")
+        assert len(rollups) == 1
+        rollup = rollups[0]
+        assert rollup["window_start"] == expired
+        assert rollup["window_seconds"] == 60
+        assert (rollup["count"], rollup["errors"]) == (3, 2)
+        assert rollup["latency_sum"] == pytest.approx(0.4)
+        # latencies of events are stored in single precision
+        assert rollup["latency_min"] == pytest.approx(0.1)
+        assert rollup["latency_max"] == pytest.approx(0.3)
+        sketch = LatencySketch()
+        sketch.add(0.1)
+        sketch.add(0.3)
+        assert rollup["sketch"] == sketch.to_dict()
+
+        # minute rollups are merged into hourly rollups once past their retention
+        maintenance.rollup_retention = 1
+        assert await maintenance.downsample_rollups()
+        rollups = await postgres.execute("SELECT * FROM public.rollups")
+        assert [(r["window_seconds"], r["count"]) for r in rollups] == [(3600, 3)]
+        assert rollups[0]["window_start"] == expired.replace(minute=0)
+        assert rollups[0]["sketch"] == sketch.to_dict()
+        assert await maintenance.downsample_rollups() is None
+    finally:
+        await postgres.execute("DELETE FROM public.rollups WHERE TRUE")
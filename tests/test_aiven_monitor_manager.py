@@ -4,7 +4,8 @@ from datetime import datetime, timezone
 
 import pytest
 
-from aiven.monitor.http.check import HTTPCheck
+from aiven.monitor.http.check import HTTPCheck, HTTPCheckResult
+from aiven.monitor.manager import CheckManager
 
 
 @pytest.mark.asyncio
@@ -13,37 +14,104 @@ async def test_checks_manager(manager, postgres):
     start_timestamp = datetime.now(tz=timezone.utc)
     check = HTTPCheck(url="https://aiven.io", interval=60)
 
-    task = asyncio.create_task(manager.monitor("http", check))
-
-    try:
-        await asyncio.wait_for(task, timeout=0.5)
-    except asyncio.TimeoutError:
-        task.cancel()
+    check_id = await manager.monitor("http", check)
+    await asyncio.sleep(0.5)
+    await manager.scheduler.close()
 
     configs = await postgres.execute("SELECT id, type, config FROM public.checks")
     assert len(configs) == 1
 
     config = configs[0]
-    assert config["id"] == 1
+    assert config["id"] == check_id == 1
     assert config["type"] == "http"
     assert config["config"] == asdict(check)
 
     events = await postgres.execute(
-        "SELECT timestamp, result FROM public.events WHERE check_id=$1", config["id"]
+        """
+        SELECT timestamp, status, elapsed, connected, content_verified, error_code,
+               heartbeat, extra
+        FROM public.events WHERE check_id=$1
+        """,
+        config["id"],
     )
     assert len(events) == 1
 
-    event = events[0]
-    assert start_timestamp < event["timestamp"] < datetime.now(tz=timezone.utc)
+    event = dict(events[0])
+    assert start_timestamp < event.pop("timestamp") < datetime.now(tz=timezone.utc)
 
-    result = event["result"]
-    elapsed = result.pop("elapsed")
+    elapsed = event.pop("elapsed")
     test_time = datetime.now(tz=timezone.utc).timestamp() - start_timestamp.timestamp()
     assert elapsed < test_time
 
-    assert result == {
+    # elapsed time is stored in single precision
+    extra = event.pop("extra")
+    phases = [extra.pop(p, None) for p in ("queued", "dns", "connect", "ttfb", "transfer")]
+    assert sum(p or 0.0 for p in phases) <= elapsed + 1e-6
+
+    assert event == {
+        "status": 200,
         "connected": True,
         "content_verified": False,
-        "error": None,
-        "status": 200,
+        "error_code": None,
+        "heartbeat": False,
     }
+    # null fields are omitted
+    assert extra == {"bytes_read": 0, "body_truncated": False, "content_cached": False}
+
+
+@pytest.mark.asyncio
+async def test_checks_manager_shared_producer(kafka, postgres):
+    async with CheckManager(kafka=kafka, postgres=postgres) as manager:
+        producer = await manager.producer()
+        for _ in range(100):
+            await manager.publish_event(1, HTTPCheckResult(status=200))
+        assert await manager.producer() is producer
+    assert manager._producer is None
+
+
+@pytest.mark.asyncio
+async def test_checks_manager_batched_sink(manager, postgres):
+    row = await postgres.execute(
+        "INSERT INTO public.checks (type, config) VALUES ('http', '{}') RETURNING id"
+    )
+    check_id = row[0]["id"]
+
+    for status in range(200, 250):
+        await manager.publish_event(check_id, HTTPCheckResult(status=status))
+    await (await manager.producer()).flush()
+
+    events = []
+    for _ in range(20):
+        events = await postgres.execute(
+            "SELECT status FROM public.events WHERE check_id=$1", check_id
+        )
+        if len(events) == 50:
+            break
+        await asyncio.sleep(manager.sink_batch_timeout / 1000)
+
+    assert sorted(e["status"] for e in events) == list(range(200, 250))
+
+
+@pytest.mark.asyncio
+async def test_checks_manager_register_idempotent(manager, postgres):
+    checks = [HTTPCheck(url=f"http://somewhere/{i}") for i in range(100)]
+
+    check_ids = await manager.register("http", checks)
+    assert len(set(check_ids)) == 100
+
+    duplicate = HTTPCheck(url="http://somewhere/50")
+    assert await manager.register("http", [duplicate, *checks[:10]]) == [
+        check_ids[50],
+        *check_ids[:10],
+    ]
+
+    rows = await postgres.execute("SELECT count(*) AS count FROM public.checks")
+    assert rows[0]["count"] == 100
+
+    # concurrent registrations of the same new checks, eg: nodes starting at once
+    checks = [HTTPCheck(url=f"http://elsewhere/{i}") for i in range(100)]
+    first, second = await asyncio.gather(
+        manager.register("http", checks), manager.register("http", checks)
+    )
+    assert first == second
+    assert None not in first
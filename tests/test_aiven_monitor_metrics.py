@@ -0,0 +1,60 @@
+import aiohttp
+import pytest
+
+from aiven.monitor import metrics
+
+
+def test_metrics_render():
+    registry = metrics.Registry()
+    counter = metrics.Counter(
+        "requests", "Requests made", labelnames=("status",), registry=registry
+    )
+    counter.inc(labels=("ok",))
+    counter.inc(2, labels=("ok",))
+    metrics.Gauge("depth", "Queue depth", callback=lambda: 3, registry=registry)
+    histogram = metrics.Histogram(
+        "latency", "Latency", buckets=(0.1, 1.0), registry=registry
+    )
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    assert registry.render().splitlines() == [
+        "# TYPE requests counter",
+        "# HELP requests Requests made",
+        'requests_total{status="ok"} 3',
+        "# TYPE depth gauge",
+        "# HELP depth Queue depth",
+        "depth 3",
+        "# TYPE latency histogram",
+        "# HELP latency Latency",
+        'latency_bucket{le="0.1"} 1',
+        'latency_bucket{le="1"} 2',
+        'latency_bucket{le="+Inf"} 3',
+        "latency_count 3",
+        "latency_sum 5.55",
+        "# EOF",
+    ]
+
+
+def test_metrics_failing_callback():
+    registry = metrics.Registry()
+    metrics.Gauge("broken", "Broken", callback=lambda: 1 / 0, registry=registry)
+    metrics.Gauge("working", "Working", callback=lambda: 1, registry=registry)
+    assert "working 1" in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_metrics_serve(unused_tcp_port):
+    registry = metrics.Registry()
+    metrics.Gauge("up", "Up", callback=lambda: 1, registry=registry)
+
+    async with metrics.serve("127.0.0.1", unused_tcp_port, registry=registry):
+        async with aiohttp.ClientSession() as session:
+            url = f"http://127.0.0.1:{unused_tcp_port}/metrics"
+            async with session.get(url) as resp:
+                assert resp.status == 200
+                assert resp.headers["Content-Type"] == metrics.CONTENT_TYPE
+                body = await resp.text()
+
+    assert "up 1" in body.splitlines()
+    assert body.endswith("# EOF\n")
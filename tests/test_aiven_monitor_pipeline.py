@@ -0,0 +1,114 @@
+import asyncio
+from collections import namedtuple
+from typing import Dict, List
+
+import pytest
+from aiokafka.structs import TopicPartition
+
+from aiven.monitor.pipeline import PartitionedConsumer
+
+Record = namedtuple("Record", ["topic", "partition", "offset", "value"])
+
+
+class FakeConsumer:
+    def __init__(self, partitions: int, records: int):
+        self.records = {
+            TopicPartition("check.events", p): list(range(records))
+            for p in range(partitions)
+        }
+        self.positions = {tp: 0 for tp in self.records}
+        self.paused = set()
+        self.pauses = 0
+        self.committed: Dict[TopicPartition, int] = {}
+
+    async def getmany(self, timeout_ms: int, max_records: int):
+        messages = {}
+        for tp, offsets in self.records.items():
+            position = self.positions[tp]
+            if tp in self.paused or position >= len(offsets):
+                continue
+            messages[tp] = [
+                Record(tp.topic, tp.partition, o, o)
+                for o in offsets[position : position + 50]
+            ]
+            self.positions[tp] += len(messages[tp])
+        if not messages:
+            await asyncio.sleep(timeout_ms / 1000)
+        return messages
+
+    def pause(self, tp):
+        self.paused.add(tp)
+        self.pauses += 1
+
+    def resume(self, tp):
+        self.paused.discard(tp)
+
+    async def commit(self, offsets):
+        self.committed.update(offsets)
+
+
+@pytest.mark.asyncio
+async def test_partitioned_consumer_ordering_and_backpressure():
+    consumer = FakeConsumer(partitions=4, records=1000)
+    written: Dict[int, List[int]] = {}
+    attempts = 0
+
+    async def write(batch):
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.005)
+        if attempts % 7 == 0:
+            # simulate a transient database failure
+            return False
+        for partition, offset in batch:
+            written.setdefault(partition, []).append(offset)
+        return True
+
+    pipelines = PartitionedConsumer(
+        consumer,
+        lambda msg: (msg.partition, msg.value),
+        write,
+        batch_size=100,
+        batch_timeout=0.01,
+        max_pending=2,
+    )
+    task = asyncio.create_task(pipelines.run())
+    await asyncio.sleep(1.5)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert sorted(written) == [0, 1, 2, 3]
+    for offsets in written.values():
+        assert offsets == list(range(1000))
+    assert set(consumer.committed.values()) == {1000}
+    assert consumer.pauses > 0
+
+
+@pytest.mark.asyncio
+async def test_partitioned_consumer_revoke_timeout():
+    consumer = FakeConsumer(partitions=2, records=100)
+
+    async def write(batch):
+        if batch[0][0] == 1:
+            # a write that never completes, eg: a database that hangs
+            await asyncio.sleep(3600)
+        return True
+
+    pipelines = PartitionedConsumer(
+        consumer,
+        lambda msg: (msg.partition, msg.value),
+        write,
+        batch_size=100,
+        batch_timeout=0.01,
+        drain_timeout=0.1,
+    )
+    task = asyncio.create_task(pipelines.run())
+    await asyncio.sleep(0.1)
+
+    revoked = set(consumer.records)
+    await asyncio.wait_for(pipelines.on_partitions_revoked(revoked), timeout=1)
+    assert pipelines.pipelines == {}
+    assert consumer.committed == {TopicPartition("check.events", 0): 100}
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from aiven.monitor.codec import encode_event
+from aiven.monitor.http.check import HTTPCheckResult
+from aiven.monitor.replay import Replay
+
+
+@pytest.mark.asyncio
+async def test_replay_idempotent(manager, kafka, postgres):
+    row = await postgres.execute(
+        "INSERT INTO public.checks (type, config) VALUES ('http', '{}') RETURNING id"
+    )
+    check_id = row[0]["id"]
+    since = datetime.now(tz=timezone.utc)
+
+    producer = await manager.producer()
+    for status in range(200, 250):
+        await producer.send_and_wait(
+            manager.topic,
+            encode_event(check_id, HTTPCheckResult(status=status)),
+            key=str(check_id).encode("utf-8"),
+        )
+
+    # wait for the live consumer to write the events
+    for _ in range(20):
+        events = await postgres.execute(
+            "SELECT count(*) AS count FROM public.events WHERE check_id=$1", check_id
+        )
+        if events[0]["count"] == 50:
+            break
+        await asyncio.sleep(manager.sink_batch_timeout / 1000)
+
+    replay = Replay(kafka, postgres, topic=manager.topic, since=since, batch_size=20)
+    progress = await replay.run()
+    assert (progress.total, progress.read) == (50, 50)
+    assert (progress.written, progress.duplicates) == (0, 50)
+
+    await postgres.execute("DELETE FROM public.events WHERE check_id=$1", check_id)
+    progress = await replay.run()
+    assert (progress.written, progress.duplicates) == (50, 0)
+
+    events = await postgres.execute(
+        "SELECT status FROM public.events WHERE check_id=$1", check_id
+    )
+    assert sorted(e["status"] for e in events) == list(range(200, 250))
+
+    with pytest.raises(ValueError):
+        Replay(kafka, postgres, start_offset=0, since=since)
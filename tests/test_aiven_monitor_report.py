@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from aiven.monitor.aggregate import Aggregator
+from aiven.monitor.events import event_record
+from aiven.monitor.http.check import HTTPCheck, HTTPCheckResult
+from aiven.monitor.report import Report
+
+
+@pytest.mark.asyncio
+async def test_report(manager, postgres):
+    check_ids = await manager.register(
+        "http",
+        [HTTPCheck(url="https://aiven.io"), HTTPCheck(url="https://google.com")],
+    )
+    now = datetime.now(tz=timezone.utc).replace(second=0, microsecond=0)
+    start = now - timedelta(minutes=10)
+
+    # the first check has rollups for its first minutes, the second only events
+    aggregator = Aggregator(window=60)
+    for i in range(4):
+        aggregator.record(
+            check_ids[0],
+            HTTPCheckResult(
+                timestamp=start.timestamp() + i * 15,
+                connected=True,
+                status=503 if i == 0 else 200,
+                elapsed=0.1,
+            ),
+        )
+    assert await manager._write_rollups(aggregator.flush())
+
+    def event(check_id, timestamp, **result):
+        return event_record(timestamp, check_id, dict(result, connected=True))
+
+    records = [
+        # covered by rollups
+        event(check_ids[0], start + timedelta(seconds=10), status=200, elapsed=5.0),
+        event(check_ids[0], start + timedelta(minutes=5), status=200, elapsed=0.2),
+        event(check_ids[0], start + timedelta(minutes=6), error="timeout"),
+        event(check_ids[1], start + timedelta(minutes=1), status=200, elapsed=0.3),
+        # heartbeats are not counted, out of window events are ignored
+        event(check_ids[1], start + timedelta(minutes=2), count=10, failing=False),
+        event(check_ids[1], start - timedelta(minutes=1), status=200, elapsed=0.3),
+    ]
+    assert await manager.events.write(records)
+
+    report = Report(postgres, start, now, check_ids=check_ids, prefetch=2)
+    first, second = [r async for r in report.checks()]
+
+    assert (first.check_id, first.label) == (check_ids[0], "https://aiven.io")
+    assert (first.count, first.errors) == (6, 2)
+    assert first.availability == pytest.approx(4 / 6)
+    assert first.error_kinds == {"http_503": 1, "error": 1}
+    assert first.sketch.count == 5
+    assert first.latency_mean == pytest.approx(0.12)
+    assert first.latency_min == pytest.approx(0.1)
+    assert first.latency_max == pytest.approx(0.2)
+    assert first.sketch.quantile(0.5) == pytest.approx(0.1, rel=0.01)
+
+    assert (second.count, second.errors, second.error_kinds) == (1, 0, {})
+    assert second.to_dict()["latency_percentiles"]["p99"] == pytest.approx(
+        0.3, rel=0.01
+    )
+
+    with pytest.raises(ValueError):
+        Report(postgres, now, start)
@@ -0,0 +1,140 @@
+import asyncio
+import functools
+
+import pytest
+
+from aiven.monitor.scheduler import Scheduler
+from aiven.service.ratelimit import HostRateLimiter
+
+
+@pytest.mark.asyncio
+async def test_scheduler_fixed_rate():
+    scheduler = Scheduler(max_in_flight=10)
+    ticks = []
+
+    async def job():
+        ticks.append(asyncio.get_event_loop().time())
+        # longer than the interval, every other tick is expected to be missed
+        await asyncio.sleep(0.06)
+
+    scheduler.schedule(job, interval=0.05)
+    scheduler.start()
+    await asyncio.sleep(0.32)
+    await scheduler.close()
+
+    assert 3 <= len(ticks) <= 4
+    for previous, current in zip(ticks, ticks[1:]):
+        assert current - previous == pytest.approx(0.1, abs=0.03)
+    assert scheduler.stats.missed >= 2
+    assert scheduler.stats.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_max_in_flight():
+    scheduler = Scheduler(max_in_flight=2, max_jitter=0.05)
+    running = []
+    peak = 0
+
+    async def job():
+        nonlocal peak
+        running.append(None)
+        peak = max(peak, len(running))
+        await asyncio.sleep(0.02)
+        running.pop()
+
+    job_ids = [scheduler.schedule(job, interval=1) for _ in range(10)]
+    scheduler.start()
+    await asyncio.sleep(0.2)
+
+    assert peak == 2
+    assert scheduler.stats.ticks == 10
+
+    for job_id in job_ids:
+        scheduler.cancel(job_id)
+    assert scheduler.stats.jobs == 0
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_reschedule():
+    scheduler = Scheduler()
+    ticks = []
+
+    async def job():
+        ticks.append(asyncio.get_event_loop().time())
+        # probe faster for a few ticks, then slow down again
+        scheduler.reschedule(job_id, 0.02 if len(ticks) < 4 else 10)
+
+    job_id = scheduler.schedule(job, interval=10, delay=0)
+    scheduler.start()
+    await asyncio.sleep(0.2)
+    await scheduler.close()
+
+    assert len(ticks) == 4
+    for previous, current in zip(ticks, ticks[1:]):
+        assert current - previous == pytest.approx(0.02, abs=0.015)
+    assert scheduler.stats.missed == 0
+    assert scheduler._jobs[job_id].interval == 10
+
+
+@pytest.mark.asyncio
+async def test_scheduler_throttle():
+    scheduler = Scheduler(max_in_flight=1)
+    limiter = HostRateLimiter(rate=10, burst=1)
+    started = {}
+
+    async def job(name):
+        started.setdefault(name, []).append(asyncio.get_event_loop().time())
+
+    start = asyncio.get_event_loop().time()
+    job_ids = []
+    for name in ("a", "b", "c"):
+        job_id = scheduler.schedule(
+            functools.partial(job, name),
+            interval=10,
+            delay=0,
+            throttle=functools.partial(limiter.reserve, "throttled"),
+        )
+        job_ids.append(job_id)
+    scheduler.schedule(functools.partial(job, "other"), interval=10, delay=0)
+    scheduler.start()
+    await asyncio.sleep(0.3)
+    # throttling does not move jobs off their grid, throttled ticks are late instead
+    dues = [scheduler._jobs[job_id].due - start for job_id in job_ids]
+    assert dues == pytest.approx([10, 10, 10], abs=0.01)
+    assert scheduler.stats.late >= 1
+    await scheduler.close()
+
+    # throttled jobs wait for their turn without holding the only slot
+    delays = sorted(started[name][0] - start for name in ("a", "b", "c"))
+    assert delays == pytest.approx([0, 0.1, 0.2], abs=0.03)
+    assert started["other"][0] - start < 0.03
+    assert scheduler.stats.missed == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancel_from():
+    scheduler = Scheduler()
+    ticks = {}
+
+    async def job(name):
+        ticks.setdefault(name, []).append(asyncio.get_event_loop().time())
+
+    start = asyncio.get_event_loop().time()
+    on_grid = scheduler.schedule(functools.partial(job, "a"), interval=0.1, delay=0)
+    off_grid = scheduler.schedule(functools.partial(job, "b"), interval=10, delay=0)
+    scheduler.start()
+    await asyncio.sleep(0.05)
+
+    await scheduler.cancel_from({on_grid: start + 0.25, off_grid: start + 0.25})
+    # returns once the last tick before the cutoff is started, not at the cutoff
+    assert asyncio.get_event_loop().time() - start == pytest.approx(0.2, abs=0.03)
+    assert len(ticks["a"]) == 3
+    assert len(ticks["b"]) == 1
+    assert scheduler.stats.jobs == 0
+    await scheduler.close()
+
+    # jobs of a scheduler that is not running are cancelled right away
+    job_id = scheduler.schedule(functools.partial(job, "c"), interval=0.1)
+    await asyncio.wait_for(scheduler.cancel_from({job_id: start + 10}), timeout=0.1)
+    assert scheduler.stats.jobs == 0
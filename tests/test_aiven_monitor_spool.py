@@ -0,0 +1,162 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+
+from aiven.monitor.codec import decode_event
+from aiven.monitor.http.check import HTTPCheckResult
+from aiven.monitor.manager import CheckManager
+from aiven.monitor.spool import Spool
+
+
+def test_spool_read_commit(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=64)
+    for key in range(10):
+        spool.append(key, f"event-{key}".encode())
+
+    records, cursor = spool.read(4)
+    assert [key for _, key, _ in records] == [0, 1, 2, 3]
+    # reading does not move the cursor until committed
+    assert spool.read(4)[0] == records
+
+    spool.commit(cursor)
+    records, cursor = spool.read(100)
+    assert [key for _, key, _ in records] == list(range(4, 10))
+    assert records[0] == (0, 4, b"event-4")
+
+    spool.append(10, b"rollup-10", kind=1)
+    assert spool.read(100)[0][-1] == (1, 10, b"rollup-10")
+
+
+def test_spool_replay_after_restart(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=64)
+    for key in range(10):
+        spool.append(key, b"event")
+    records, cursor = spool.read(6)
+    spool.commit(cursor)
+    spool.close()
+
+    spool = Spool(str(tmp_path), segment_size=64)
+    records, cursor = spool.read(100)
+    assert [key for _, key, _ in records] == list(range(6, 10))
+
+    spool.commit(cursor)
+    segments = [name for name in os.listdir(tmp_path) if name.endswith(".seg")]
+    assert len(segments) == 1
+
+
+def test_spool_corrupt_tail(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(1, b"event")
+    spool.close()
+    (segment,) = [p for p in tmp_path.iterdir() if p.suffix == ".seg"]
+    with open(segment, "ab") as f:
+        f.write(b"\x00\x00\x00\x10partial")
+
+    spool = Spool(str(tmp_path))
+    spool.append(2, b"event")
+    records, _ = spool.read(100)
+    assert [key for _, key, _ in records] == [1, 2]
+
+
+def test_spool_max_size(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=100, max_size=300)
+    for key in range(100):
+        spool.append(key, b"0123456789")
+
+    assert spool.dropped_segments > 0
+    # checked on every append, not only when a segment is rolled
+    assert spool.size <= 300
+    records, _ = spool.read(1000)
+    assert [key for _, key, _ in records] == list(range(100 - len(records), 100))
+
+
+class FakeProducer:
+    def __init__(self):
+        self.available = False
+        self.sent = []
+        self.keys = []
+
+    async def send(self, topic, key, value):
+        if not self.available:
+            raise ConnectionError("Broker unavailable")
+        self.sent.append(value)
+        self.keys.append((topic, key))
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(None)
+        return future
+
+
+class FakeKafka:
+    def __init__(self):
+        self.producer_ = FakeProducer()
+
+    @asynccontextmanager
+    async def producer(self):
+        yield self.producer_
+
+
+class FakePostgres:
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_checks_manager_spool(tmp_path):
+    kafka = FakeKafka()
+    manager = CheckManager(
+        kafka=kafka,
+        postgres=FakePostgres(),
+        rollup_window=None,
+        spool=Spool(str(tmp_path)),
+        spool_flush_timeout=0.1,
+    )
+
+    # publishing does not block while kafka is unavailable
+    for status in range(200, 210):
+        await asyncio.wait_for(
+            manager.publish_event(1, HTTPCheckResult(status=status)), timeout=0.1
+        )
+    await manager.close()
+    assert kafka.producer_.sent == []
+
+    # undelivered events are replayed by the next manager
+    kafka.producer_.available = True
+    manager = CheckManager(
+        kafka=kafka,
+        postgres=FakePostgres(),
+        rollup_window=None,
+        spool=Spool(str(tmp_path)),
+    )
+    await manager.publish_event(1, HTTPCheckResult(status=210))
+    await asyncio.sleep(0.1)
+    await manager.close()
+
+    statuses = [decode_event(value)[1]["status"] for value in kafka.producer_.sent]
+    assert statuses == list(range(200, 211))
+
+
+@pytest.mark.asyncio
+async def test_checks_manager_spool_rollups(tmp_path):
+    kafka = FakeKafka()
+    manager = CheckManager(
+        kafka=kafka,
+        postgres=FakePostgres(),
+        spool=Spool(str(tmp_path)),
+        spool_flush_timeout=0.1,
+    )
+    await manager.publish_event(7, HTTPCheckResult(status=200, elapsed=0.1))
+    # final rollups are spooled along with events while kafka is unavailable
+    await manager.close()
+    assert kafka.producer_.sent == []
+
+    kafka.producer_.available = True
+    manager = CheckManager(
+        kafka=kafka,
+        postgres=FakePostgres(),
+        rollup_window=None,
+        spool=Spool(str(tmp_path)),
+    )
+    await manager.close()
+    assert kafka.producer_.keys == [("check.events", b"7"), ("check.rollups", b"7")]
@@ -0,0 +1,15 @@
+from aiven.monitor.http.check import HTTPCheck
+from aiven.monitor.workers import shard, shard_checks
+
+
+def test_shard_checks_deterministic():
+    checks = [HTTPCheck(url=f"http://somewhere/{i}") for i in range(100)]
+    shards = shard_checks(checks, 4)
+
+    assert len(shards) == 4
+    assert sorted(c.url for s in shards for c in s) == sorted(c.url for c in checks)
+    assert all(shards)
+
+    for index, checks in enumerate(shards):
+        for check in checks:
+            assert shard(HTTPCheck(url=check.url), 4) == index
@@ -0,0 +1,103 @@
+import asyncio
+import socket
+import types
+
+import pytest
+
+from aiven.service import dns
+from aiven.service.dns import CachingResolver
+
+
+class FakeResolver:
+    calls = 0
+    fail = False
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        FakeResolver.calls += 1
+        await asyncio.sleep(0.01)
+        if FakeResolver.fail:
+            raise OSError(f"Could not resolve {host}")
+        return [
+            dict(hostname=host, host=f"10.0.0.{i}", port=port, family=family)
+            for i in (1, 2)
+        ]
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    monkeypatch.setattr(dns, "ThreadedResolver", FakeResolver)
+    monkeypatch.setattr(FakeResolver, "calls", 0)
+    monkeypatch.setattr(FakeResolver, "fail", False)
+    resolver = CachingResolver(
+        use_aiodns=False, default_ttl=0.2, min_ttl=0.01, refresh_ratio=0.5
+    )
+    yield resolver
+    resolver.clear()
+
+
+@pytest.mark.asyncio
+async def test_resolver_collapses_lookups(resolver):
+    results = await asyncio.gather(
+        *(resolver.resolve("example.com", 443) for _ in range(10))
+    )
+    assert FakeResolver.calls == 1
+    assert resolver.stats.misses == 1
+    assert resolver.stats.coalesced == 9
+    assert all(r["port"] == 443 for result in results for r in result)
+    # addresses are rotated between lookups
+    assert {result[0]["host"] for result in results} == {"10.0.0.1", "10.0.0.2"}
+
+    await resolver.resolve("example.com", 80)
+    assert FakeResolver.calls == 1
+    assert resolver.stats.hits == 1
+    assert resolver.size == 1
+
+
+@pytest.mark.asyncio
+async def test_resolver_refreshes_used_entries(resolver):
+    await resolver.resolve("example.com", 443)
+
+    # refreshed in the background half way through the ttl, as it was used
+    await asyncio.sleep(0.15)
+    assert FakeResolver.calls == 2
+    assert resolver.stats.refreshes == 1
+    await resolver.resolve("example.com", 443)
+    assert resolver.stats.hits == 1
+
+    await asyncio.sleep(0.11)
+    assert FakeResolver.calls == 3
+    # not used since the last refresh, evicted
+    await asyncio.sleep(0.11)
+    assert FakeResolver.calls == 3
+    assert resolver.size == 0
+
+
+@pytest.mark.asyncio
+async def test_resolver_errors_not_cached(resolver):
+    FakeResolver.fail = True
+    with pytest.raises(OSError):
+        await resolver.resolve("example.com", 443)
+    assert resolver.stats.errors == 1
+    assert resolver.size == 0
+
+    FakeResolver.fail = False
+    assert len(await resolver.resolve("example.com", 443)) == 2
+    assert FakeResolver.calls == 2
+
+
+class NXDomainResolver:
+    async def query(self, host, record_type):
+        raise Exception(4, "Domain name not found")
+
+
+@pytest.mark.asyncio
+async def test_resolver_hosts_file(monkeypatch):
+    # dns queries do not read the hosts file, the system resolver does
+    monkeypatch.setattr(
+        dns, "aiodns", types.SimpleNamespace(DNSResolver=NXDomainResolver)
+    )
+    resolver = CachingResolver(use_aiodns=True)
+    addresses = await resolver.resolve("localhost", 80)
+    assert "127.0.0.1" in {a["host"] for a in addresses}
+    assert resolver.stats.errors == 0
+    resolver.clear()